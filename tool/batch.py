@@ -0,0 +1,219 @@
+import os
+import sys
+import math
+import time
+import argparse
+import threading
+
+from io_utils.job_queue import JobQueue, default_worker_id
+from shapefile.reader import read_shapefile_bounds
+from main import build_parser, run_blender
+
+
+# ---------------------------------------------------
+#
+# Batch generation over several nodes sharing a volume (e.g. NFS):
+#
+#   python tool/batch.py coordinator --queue <jobs.sqlite> -i <a.shp> <b.shp> --las <a.las> <b.las> -o <output_folder> --tile_size 1000 -- [pipeline options]
+#   python tool/batch.py worker --queue <jobs.sqlite>                 (any number, on any node)
+#   python tool/batch.py status --queue <jobs.sqlite>
+#
+# ---------------------------------------------------
+
+
+### function: parse_args ###
+def parse_args():
+    argv = sys.argv[1:]
+    options = []
+    if "--" in argv:
+        argv, options = argv[:argv.index("--")], argv[argv.index("--") + 1:]
+
+    parser = argparse.ArgumentParser(description="Tile job queue for multi-node batch generation.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    coordinator = subparsers.add_parser("coordinator", help="Split the inputs into tile jobs.")
+    coordinator.add_argument("--queue", type=str, required=True, help="SQLite file of the queue, on shared storage.")
+    coordinator.add_argument("-i", "--input_shapefiles", type=str, nargs="+", required=True, help="Input shapefiles.")
+    coordinator.add_argument("--las", type=str, nargs="+", required=True,
+                             help="One LAS file (or directory / pattern of LAS tiles) for all the shapefiles, or one per shapefile.")
+    coordinator.add_argument("-o", "--output_folder", type=str, required=True,
+                             help="Folder of the results, one subfolder per shapefile and tile.")
+    coordinator.add_argument("--tile_size", type=float, default=1000.0,
+                             help="Side of the square tiles in shapefile units (default: 1000, 0 for one job per shapefile).")
+
+    worker = subparsers.add_parser("worker", help="Claim and run jobs until the queue is empty.")
+    worker.add_argument("--queue", type=str, required=True, help="SQLite file of the queue, on shared storage.")
+    worker.add_argument("--lease", type=float, default=600.0,
+                        help="Lease of a claimed job in seconds, renewed while the job runs (default: 600).")
+    worker.add_argument("--max_attempts", type=int, default=3,
+                        help="Attempts after which a job is marked as failed (default: 3).")
+    worker.add_argument("--max_jobs", type=int, default=0, help="Stop after this many jobs (default: 0, no limit).")
+    worker.add_argument("--wait", action="store_true",
+                        help="When no job is pending, wait for the running ones (their lease may expire) instead of exiting.")
+
+    status = subparsers.add_parser("status", help="Print the state of the queue.")
+    status.add_argument("--queue", type=str, required=True, help="SQLite file of the queue.")
+    status.add_argument("--reset_failed", action="store_true", help="Put the failed jobs back in the queue.")
+
+    args = parser.parse_args(argv)
+    args.options = options
+    return args
+
+
+### function: plan_tile_jobs ###
+def plan_tile_jobs(shapefiles, las_files, output_folder, tile_size, options):
+    """
+    Splits every shapefile into square tile jobs, using the bounding box of the
+    .shp header only. Tiles are aligned on multiples of tile_size, and a building
+    belongs to the tile containing its centroid. Empty tiles are cheap: their
+    worker exits before loading the point cloud.
+
+    Args:
+        shapefiles (list of str): Input shapefiles.
+        las_files (list of str): One LAS file, or one per shapefile.
+        output_folder (str): Root folder of the results.
+        tile_size (float): Side of the tiles (0: one job per shapefile).
+        options (list of str): Pipeline options given to every job (main.py syntax).
+
+    Returns:
+        list of tuple: (name, params) of the jobs.
+    """
+    if len(las_files) not in (1, len(shapefiles)):
+        raise ValueError("Provide one LAS file, or one per shapefile.")
+
+    jobs = []
+    for n, shapefile_path in enumerate(shapefiles):
+        shapefile_path = os.path.abspath(shapefile_path)
+        las_path = os.path.abspath(las_files[n] if len(las_files) > 1 else las_files[0])
+        stem = os.path.splitext(os.path.basename(shapefile_path))[0]
+
+        params = {'input_shapefile': shapefile_path, 'las': las_path, 'options': options}
+
+        if not tile_size:
+            jobs.append((shapefile_path, dict(params, output_folder=os.path.join(output_folder, stem), bbox=None)))
+            continue
+
+        minx, miny, maxx, maxy = read_shapefile_bounds(shapefile_path)
+        for ix in range(math.floor(minx / tile_size), math.floor(maxx / tile_size) + 1):
+            for iy in range(math.floor(miny / tile_size), math.floor(maxy / tile_size) + 1):
+                bbox = [ix * tile_size, iy * tile_size, (ix + 1) * tile_size, (iy + 1) * tile_size]
+                jobs.append((f"{shapefile_path}#{ix}_{iy}",
+                             dict(params, output_folder=os.path.join(output_folder, stem, f"tile_{ix}_{iy}"), bbox=bbox)))
+
+    return jobs
+
+
+class LeaseKeeper(threading.Thread):
+    """
+    Renews the lease of the running job in the background, with its own connection.
+    """
+
+    def __init__(self, queue_path, job_id, worker_id, lease_seconds):
+        super().__init__(daemon=True)
+        self.queue_path = queue_path
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+
+    def run(self):
+        queue = JobQueue(self.queue_path, self.lease_seconds)
+        try:
+            while not self.stopped.wait(self.lease_seconds / 3):
+                try:
+                    if not queue.renew(self.job_id, self.worker_id):
+                        print(f"⚠ Lease of job {self.job_id} lost, the job may run again elsewhere")
+                        return
+                except Exception as e:
+                    # A transient lock timeout must not stop the renewals
+                    print(f"⚠ Lease renewal failed: {type(e).__name__}: {e}")
+        finally:
+            queue.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+### function: job_args ###
+def job_args(job):
+    """
+    Builds the pipeline arguments of a job. Every job gets its own temporary folder and
+    status file, as several workers can run on the same node.
+    """
+    params = job['params']
+    args = build_parser(require_inputs=False).parse_args(params['options'])
+    args.input_shapefile = params['input_shapefile']
+    args.las = params['las']
+    args.output_folder = params['output_folder']
+    args.bbox = params['bbox']
+
+    args.job_id = job['id']
+    if args.metrics_file:
+        root, ext = os.path.splitext(args.metrics_file)
+        args.metrics_file = f"{root}_{job['id']}{ext}"
+        args.metrics_labels = args.metrics_labels + [f"job={job['id']}"]
+    return args
+
+
+### function: run_worker ###
+def run_worker(args):
+    queue = JobQueue(args.queue, args.lease, args.max_attempts)
+    worker_id = default_worker_id()
+    done = 0
+
+    while not args.max_jobs or done < args.max_jobs:
+        job = queue.claim(worker_id)
+        if job is None:
+            if args.wait and queue.counts()['running']:
+                time.sleep(min(args.lease / 3, 60))
+                continue
+            break
+
+        print(f"--> [{worker_id}] Job {job['name']} (attempt {job['attempts']})")
+        keeper = LeaseKeeper(args.queue, job['id'], worker_id, args.lease)
+        keeper.start()
+        try:
+            exit_code = run_blender(job_args(job))
+            error = None if exit_code == 0 else f"Blender exited with code {exit_code}"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            keeper.stop()
+
+        if error is None:
+            queue.complete(job['id'], worker_id)
+        else:
+            print(f"⚠ Job {job['name']} failed: {error}")
+            queue.fail(job['id'], worker_id, error)
+        done += 1
+
+    print(f"Worker {worker_id} stopped after {done} jobs: {queue.counts()}")
+    queue.close()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.mode == "coordinator":
+        # Validated once here, rather than failing in every worker
+        build_parser(require_inputs=False).parse_args(args.options)
+
+        jobs = plan_tile_jobs(args.input_shapefiles, args.las, os.path.abspath(args.output_folder),
+                              args.tile_size, args.options)
+        queue = JobQueue(args.queue)
+        added = queue.add_jobs(jobs)
+        print(f"{added} new jobs queued ({len(jobs) - added} already present): {queue.counts()}")
+        queue.close()
+
+    elif args.mode == "worker":
+        run_worker(args)
+
+    else:
+        queue = JobQueue(args.queue)
+        if args.reset_failed:
+            print(f"{queue.reset_failed()} failed jobs re-queued")
+        print(queue.counts())
+        for name, attempts, error in queue.failures():
+            print(f"  failed: {name} ({attempts} attempts): {error}")
+        queue.close()
@@ -0,0 +1,169 @@
+import bpy
+import sys
+import os
+import json
+import time
+import argparse
+import numpy as np
+import trimesh
+
+
+# ---------------------------------------------------
+#
+# blender -b --python benchmarks/boolean_backends.py -- -i <shp> --las <las> -o <output_folder> ...
+#
+# Builds every footprint with each boolean backend and compares timings
+# and failure rates per roof type.
+#
+# ---------------------------------------------------
+
+
+#######################################################
+# Adds the root project in the Python path
+#######################################################
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+#######################################################
+
+from shapefile.reader import read_shapefile_polygons
+from shapefile.converter import create_mesh_from_polygon
+from modeling.roofs.flat import create_flat_roof
+from modeling.roofs.gabled import create_gabled_roof
+from modeling.roofs.hip import create_hip_roof
+from modeling.roofs.pyramid import create_pyramid_roof
+from modeling.roofs.gabled_L import create_gabled_L_roof
+import modeling.blender_ops as blender_ops
+import modeling.pointcloud_ops as pointcloud_ops
+
+
+ROOF_BUILDERS = {
+    'flat': lambda obj, poly, idx, r: create_flat_roof(obj, poly['height'], poly['exterior'], round_edges=r, round_method="bevel"),
+    'gabled': lambda obj, poly, idx, r: create_gabled_roof(obj, poly['height'], poly['exterior'], round_edges=r, round_method="bevel"),
+    'gabled-L': lambda obj, poly, idx, r: create_gabled_L_roof(obj, poly['height'], idx, poly['exterior'], round_edges=r, round_method="bevel"),
+    'hip': lambda obj, poly, idx, r: create_hip_roof(obj, poly['height'], idx, poly['exterior'], round_edges=r, round_method="bevel"),
+    'pyramid': lambda obj, poly, idx, r: create_pyramid_roof(obj, poly['height'], idx, poly['exterior'], round_edges=r, round_method="bevel"),
+}
+
+
+### function: parse_args ###
+def parse_args():
+    argv = sys.argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+
+    parser = argparse.ArgumentParser(description="Benchmark of the boolean backends on the roof types.")
+    parser.add_argument("-i", "--input_shapefile", type=str, required=True, help="Path to the input shapefile (.shp).")
+    parser.add_argument("--las", type=str, required=True, help="Las file")
+    parser.add_argument("-o", "--output_folder", type=str, required=True, help="Folder where the report is saved.")
+    parser.add_argument("--backends", nargs="+", default=list(blender_ops.BOOLEAN_BACKENDS),
+                        choices=list(blender_ops.BOOLEAN_BACKENDS), help="Backends to compare.")
+    parser.add_argument("--roof_types", nargs="+", default=None, choices=list(ROOF_BUILDERS),
+                        help="Build every footprint with these roof types (default: the roof of each footprint).")
+    parser.add_argument("--limit", type=int, default=0, help="Maximum number of footprints (default: 0, all).")
+    parser.add_argument("-r", "--round_edges", action="store_true",
+                        help="Round the edges with the bevel method, so that the intersect boolean is benchmarked too.")
+
+    return parser.parse_args(argv)
+
+
+### function: build_once ###
+def build_once(poly, idx, roof_type, round_edges):
+    """
+    Builds a building and checks the result.
+
+    Returns:
+        dict: Time spent and outcome ('ok', 'empty', 'not_watertight' or 'error').
+    """
+    snapshot = blender_ops.snapshot_datablocks()
+    start = time.perf_counter()
+    try:
+        obj = create_mesh_from_polygon(f"Bench_{idx}", poly['exterior'], poly['holes'])
+        blender_ops.flatten_mesh_to_z(obj, poly['z_min'])
+        ROOF_BUILDERS[roof_type](obj, poly, idx, round_edges)
+        seconds = time.perf_counter() - start
+
+        vertices, faces = blender_ops.get_mesh_arrays(obj)
+        if len(faces) == 0:
+            outcome = 'empty'
+        elif not trimesh.Trimesh(vertices, faces, process=True).is_watertight:
+            outcome = 'not_watertight'
+        else:
+            outcome = 'ok'
+    except Exception as e:
+        seconds = time.perf_counter() - start
+        outcome = 'error'
+        print(f"⚠ Building {idx} ({roof_type}): {type(e).__name__}: {e}")
+    finally:
+        blender_ops.free_datablocks_since(snapshot)
+        blender_ops.clean_tmp_folder()
+
+    return {'seconds': seconds, 'outcome': outcome}
+
+
+### function: summarize ###
+def summarize(results):
+    """
+    Aggregates the results per backend and roof type.
+    """
+    report = {}
+    for r in results:
+        group = report.setdefault(r['backend'], {}).setdefault(r['roof'], {'times': [], 'outcomes': {}})
+        group['times'].append(r['seconds'])
+        group['outcomes'][r['outcome']] = group['outcomes'].get(r['outcome'], 0) + 1
+
+    for backend, per_roof in report.items():
+        for roof, group in per_roof.items():
+            times = np.array(group.pop('times'))
+            count = len(times)
+            failures = count - group['outcomes'].get('ok', 0)
+            group.update({
+                'buildings': count,
+                'failure_rate_percent': round(100.0 * failures / count, 2),
+                'mean_seconds': round(float(times.mean()), 4),
+                'median_seconds': round(float(np.median(times)), 4),
+                'total_seconds': round(float(times.sum()), 4),
+            })
+
+    return report
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    polygons, (x_offset, y_offset) = read_shapefile_polygons(args.input_shapefile)
+    if args.limit:
+        polygons = polygons[:args.limit]
+    las_points = pointcloud_ops.load_las_points(args.las, x_offset, y_offset)
+
+    # Heights are computed once, all backends build the same buildings
+    for poly in polygons:
+        z_min, z_max = pointcloud_ops.get_min_max_for_footprint(las_points, poly['exterior'], x_offset, y_offset)
+        poly['z_min'], poly['height'] = z_min, (z_max - z_min) if z_max is not None else None
+    polygons = [p for p in polygons if p['height'] is not None]
+
+    blender_ops.clear_blender_scene()
+
+    results = []
+    for backend in args.backends:
+        # Failures are reported, not hidden by the Blender fallback
+        blender_ops.set_boolean_backend(backend, fallback=False)
+
+        for idx, poly in enumerate(polygons):
+            roof_types = args.roof_types or [poly.get('roof')]
+            for roof_type in roof_types:
+                if roof_type not in ROOF_BUILDERS:
+                    continue
+                result = build_once(poly, idx, roof_type, args.round_edges)
+                results.append(dict(backend=backend, roof=roof_type, index=idx, **result))
+
+    report = summarize(results)
+
+    print("===== Boolean backends =====")
+    for backend, per_roof in report.items():
+        for roof, group in sorted(per_roof.items()):
+            print(f"  {backend:>8} {roof:>9}: n={group['buildings']}, failures={group['failure_rate_percent']}%, "
+                  f"mean={group['mean_seconds']}s, median={group['median_seconds']}s, outcomes={group['outcomes']}")
+
+    os.makedirs(args.output_folder, exist_ok=True)
+    with open(os.path.join(args.output_folder, "boolean_backends.json"), 'w') as f:
+        json.dump({'report': report, 'results': results}, f, indent=2)
@@ -3,6 +3,7 @@ import sys
 import os
 import argparse
 import time
+from contextlib import nullcontext
 
 
 # ---------------------------------------------------
@@ -22,16 +23,49 @@ if project_root not in sys.path:
 
 from shapefile.reader import read_shapefile_polygons
 from shapefile.converter import create_mesh_from_polygon
-from io_utils.exporter import export_mesh_ply
-from io_utils.exporter import apply_global_shift
-from modeling.roofs.flat import create_flat_roof
-from modeling.roofs.gabled import create_gabled_roof
-from modeling.roofs.hip import create_hip_roof
-from modeling.roofs.pyramid import create_pyramid_roof
-from modeling.roofs.gabled_L import create_gabled_L_roof
+from shapefile.preflight import preflight_footprints
+from shapefile.simplify import simplify_footprints, count_vertices, estimate_speedup
+from io_utils.exporter import write_shifted_mesh
+from io_utils.compact import write_compact_mesh
+from io_utils.geopackage import GeoPackageStore, srs_from_prj
+from io_utils.tiles3d import TilesetWriter
+from io_utils.async_writer import AsyncWriter
+from io_utils.metrics import MetricsWriter
+import io_utils.run_summary as run_summary
+from io_utils.worker import RecycleWorker, WorkerRecycler, RECYCLE_EXIT_CODE
+from io_utils.worker import load_checkpoint, save_checkpoint, remove_checkpoint
+from io_utils.resources import get_process_age
+from io_utils.las_catalog import LasCatalog, catalog_hit_rates
+from io_utils.las_records import LasRecords
+from io_utils.scheduling import BuildingSchedule, CostModel, lpt_order
+from io_utils.manifest import MANIFEST_VERSION, footprint_hash, load_manifest, diff_manifest, carry_over_outputs
+from io_utils.manifest import load_journal, recover_manifest, finalize_manifest, indices_to_rebuild
 from io_utils.debug import print_to_terminal
+from io_utils.budget import TimeBudget, DeadlineExceeded, set_deadline
 import modeling.blender_ops as blender_ops
+import modeling.skeleton as skeleton
 import modeling.pointcloud_ops as pointcloud_ops
+from modeling.roof_cache import RoofCache, canonicalize_footprint, roof_cache_key, cache_hit_rates
+from modeling.mesh_qa import check_mesh
+from modeling.prism import footprint_polygon, build_prisms
+
+
+EXPORT_FORMATS = ["ply", "obj", "ply_compact", "glb", "gpkg", "3dtiles"]
+
+# Options changing the outputs: an incremental run with other values regenerates every building
+INCREMENTAL_OPTIONS = ('export_format', 'precision', 'quantization', 'compression', 'round_edges', 'round_method',
+                       'native_lod2', 'boolean_backend', 'simplify', 'simplify_tolerance', 'collinear_tolerance',
+                       'snap_angle', 'classify_roofs', 'classifier_cell_size', 'no_preflight', 'min_area',
+                       'min_edge_length', 'max_vertices', 'qa_fallback', 'qa_volume_range', 'lod1_min_area')
+
+# Roof modules are imported on first use, so that a run only loads the builders it needs
+ROOF_BUILDERS = {
+    'flat': ('modeling.roofs.flat', 'create_flat_roof'),
+    'gabled': ('modeling.roofs.gabled', 'create_gabled_roof'),
+    'gabled-L': ('modeling.roofs.gabled_L', 'create_gabled_L_roof'),
+    'hip': ('modeling.roofs.hip', 'create_hip_roof'),
+    'pyramid': ('modeling.roofs.pyramid', 'create_pyramid_roof'),
+}
 
 
 ### function: parse_args ###
@@ -60,105 +94,701 @@ def parse_args():
     parser.add_argument("-r", "--round_edges", action="store_true",
                         help="Apply rounding (bevel) to roof edges.")
     
-    parser.add_argument("--export_format", type=str, default="ply", choices=["ply", "obj"],
-                        help="File format to export the resulting mesh (default: ply).")
+    parser.add_argument("--export_format", type=str, default="ply", choices=EXPORT_FORMATS,
+                        help="File format to export the resulting mesh (default: ply). "
+                             "'ply_compact' and 'glb' store quantized coordinates relative to the tile origin.")
+
+    parser.add_argument("--quantization", type=str, default="int32", choices=["int32", "float32"],
+                        help="Coordinate type of the 'ply_compact' format (default: int32).")
+
+    parser.add_argument("--precision", type=float, default=0.001,
+                        help="Quantization step of the compact formats (default: 0.001).")
+
+    parser.add_argument("--compression", type=str, default="none", choices=["none", "gzip", "zstd"],
+                        help="Compression of the compact formats (default: none).")
     
     parser.add_argument("--las", type=str,
-                        help="Las file")
+                        help="Las file, directory / glob pattern of LAS tiles read lazily, or point store folder (build_point_store.py).")
+
+    parser.add_argument("--las_cache_mb", type=float, default=2048,
+                        help="Memory budget of the decoded LAS tiles when --las is a directory or a pattern (default: 2048).")
+
+    parser.add_argument("--round_method", type=str, default="fillet2d", choices=["fillet2d", "bevel"],
+                        help="How -r rounds the corners: 2D fillet of the footprint or bevel + 3D boolean (default: fillet2d).")
+
+    parser.add_argument("--boolean_backend", type=str, default="blender", choices=list(blender_ops.BOOLEAN_BACKENDS),
+                        help="Engine of the boolean operations: Blender modifier or manifold3d (default: blender). "
+                             "Failed manifold booleans are retried with Blender.")
+
+    parser.add_argument("--native_lod2", action="store_true",
+                        help="Assemble walls and skeleton roofs (hip, pyramid, gabled-L) in the C++ process.")
+
+    parser.add_argument("--no_flat_fast_path", action="store_true",
+                        help="Build the flat roofs in Blender instead of batched NumPy prisms.")
+    parser.add_argument("--flat_batch_size", type=int, default=1024,
+                        help="Flat roofs extruded together by the fast path (default: 1024).")
+
+    parser.add_argument("--time_budget", type=float, default=0,
+                        help="Time budget of the run in seconds: the buildings are degraded to fit in it (default: 0, none).")
+    parser.add_argument("--building_budget", type=float, default=0,
+                        help="Time budget of a building in seconds (default: 0, none).")
+    parser.add_argument("--deadline_at", type=float, default=None,
+                        help="Deadline of the run (time.time()) shared by the workers of main.py (default: --time_budget after the process start).")
+    parser.add_argument("--lod1_min_area", type=float, default=0,
+                        help="Footprints with a smaller area are built as LOD1 prisms (default: 0, disabled).")
+
+    parser.add_argument("--skeleton_timeout", type=float, default=60.0,
+                        help="Kill the straight-skeleton process after this many seconds and build a flat roof (default: 60, 0 disables).")
+
+    parser.add_argument("--skeleton_memory_mb", type=float, default=4096,
+                        help="Address space limit of the straight-skeleton process in MB (default: 4096, 0 disables).")
+
+    parser.add_argument("--mesh_qa", action="store_true",
+                        help="Check every generated mesh (watertight, winding, volume, self-intersections) and "
+                             "store the QA flags in the run summary.")
+
+    parser.add_argument("--qa_fallback", action="store_true",
+                        help="With --mesh_qa, replace the meshes failing QA with the flat fallback.")
+
+    parser.add_argument("--qa_volume_range", type=float, nargs=2, default=[0.3, 1.1], metavar=("MIN", "MAX"),
+                        help="Accepted volume / (footprint area x height) of a mesh (default: 0.3 1.1).")
+
+    parser.add_argument("--roof_cache", action="store_true",
+                        help="Reuse the roofs of footprints identical up to a translation and a rotation.")
+
+    parser.add_argument("--roof_cache_size", type=int, default=1024,
+                        help="Maximum number of roofs kept in the in-memory cache (default: 1024).")
+
+    parser.add_argument("--roof_cache_dir", type=str, default=None,
+                        help="Folder where the roof cache is also persisted (default: memory only).")
+
+    parser.add_argument("--cache_precision", type=float, default=0.01,
+                        help="Quantization step used to compare footprints and heights (default: 0.01).")
+
+    parser.add_argument("--writer_threads", type=int, default=2,
+                        help="Number of background threads writing meshes to disk (default: 2).")
+
+    parser.add_argument("--writer_queue_size", type=int, default=8,
+                        help="Maximum number of meshes waiting to be written before modeling blocks (default: 8).")
+
+    parser.add_argument("--max_buildings_per_worker", type=int, default=0,
+                        help="Recycle the Blender process after this many buildings (default: 0, never).")
+
+    parser.add_argument("--max_rss_mb", type=float, default=0,
+                        help="Recycle the Blender process when its RSS exceeds this many MB (default: 0, never).")
+
+    parser.add_argument("--checkpoint", type=str, default=None,
+                        help="Checkpoint file used to resume after recycling (default: <output_folder>/.lod2_checkpoint.json).")
+
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume from the checkpoint written by a recycled worker.")
+
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only model the buildings that are new or changed since the previous run in the output folder.")
+    parser.add_argument("--las_fingerprint", action="store_true",
+                        help="With --incremental, also regenerate the buildings whose points (count, heights) changed.")
+
+    parser.add_argument("--schedule", type=str, default=None,
+                        help="Claim table shared by parallel workers (set by main.py --workers).")
+    parser.add_argument("--worker_id", type=str, default=None,
+                        help="Name of this worker in the claim table, its summary and checkpoint files.")
+    parser.add_argument("--cost_model", type=str, default=None,
+                        help="Cost model fitted on a previous run, used to order the claim table and by the time budget "
+                             "(default: built-in priors).")
+
+    parser.add_argument("--classify_roofs", action="store_true",
+                        help="Infer the roof type from the point cloud for footprints without a 'roof' attribute.")
+
+    parser.add_argument("--classifier_workers", type=int, default=1,
+                        help="Number of processes used by the roof classifier (default: 1).")
+
+    parser.add_argument("--classifier_cell_size", type=float, default=0.5,
+                        help="Raster cell size used by the roof classifier (default: 0.5).")
+
+    parser.add_argument("--simplify", action="store_true",
+                        help="Simplify the footprints (collinear vertices, Douglas-Peucker, orthogonal snapping) before modeling.")
+
+    parser.add_argument("--simplify_tolerance", type=float, default=0.05,
+                        help="Douglas-Peucker tolerance of the footprint simplification (default: 0.05).")
+
+    parser.add_argument("--collinear_tolerance", type=float, default=0.01,
+                        help="Distance under which a vertex is removed as collinear (default: 0.01).")
+
+    parser.add_argument("--snap_angle", type=float, default=3.0,
+                        help="Edges within this many degrees of the building axes are snapped (default: 3.0, 0 disables).")
+
+    parser.add_argument("--no_preflight", action="store_true",
+                        help="Disable the footprint validation that routes degenerate footprints to flat roofs.")
+
+    parser.add_argument("--min_area", type=float, default=1.0,
+                        help="Footprints with a smaller area are routed to flat roofs (default: 1.0).")
+
+    parser.add_argument("--min_edge_length", type=float, default=0.001,
+                        help="Footprints with a shorter edge are routed to flat roofs (default: 0.001).")
+
+    parser.add_argument("--max_vertices", type=int, default=1000,
+                        help="Footprints with more vertices are routed to flat roofs (default: 1000, 0 disables).")
+
+    parser.add_argument("--metrics_file", type=str, default=None,
+                        help="Status file kept updated during the run, for monitoring (default: disabled).")
+    parser.add_argument("--metrics_format", type=str, choices=["prometheus", "json"], default=None,
+                        help="Format of the status file (default: json for a .json file, prometheus textfile otherwise).")
+    parser.add_argument("--metrics_interval", type=float, default=5.0,
+                        help="Minimum number of seconds between two updates of the status file (default: 5).")
+    parser.add_argument("--metrics_labels", type=str, nargs="*", default=[], metavar="KEY=VALUE",
+                        help="Labels added to every series of the status file (e.g. job=12).")
+
+    parser.add_argument("--bbox", type=float, nargs=4, default=None, metavar=("MINX", "MINY", "MAXX", "MAXY"),
+                        help="Only process the footprints whose centroid falls in this box (shapefile coordinates).")
+
+    parser.add_argument("--srs_id", type=int, default=None,
+                        help="EPSG code of the 'gpkg' and '3dtiles' outputs (default: detected from the .prj of the shapefile).")
+    parser.add_argument("--gpkg_batch_size", type=int, default=1000,
+                        help="Buildings inserted per transaction in the 'gpkg' output (default: 1000).")
+
+    parser.add_argument("--tile_max_features", type=int, default=256,
+                        help="Maximum number of buildings of a leaf tile of the '3dtiles' output (default: 256).")
+    parser.add_argument("--tile_max_depth", type=int, default=8,
+                        help="Maximum depth of the tile quadtree of the '3dtiles' output (default: 8).")
 
     return parser.parse_args(argv)
 
 
-def export_and_shift_mesh(obj, i, x_offset, y_offset, output_folder, export_format="ply"):
+def get_roof_builder(roof_type):
+    """
+    Returns the function building a roof type, importing its module on first use.
+
+    The builtin __import__ is used (rather than importlib) so that the lazy imports
+    also show up in the `-X importtime` breakdown.
     """
-    Exports a mesh to a temporary PLY, applies a global shift, and re-exports
-    in the desired format.
+    module_name, function_name = ROOF_BUILDERS[roof_type]
+    module = __import__(module_name, fromlist=[function_name])
+    return getattr(module, function_name)
+
+
+def queue_mesh_export(i, vertices, faces, x_offset, y_offset, args, writer, store=None, poly=None, fallback=False):
+    """
+    Queues mesh arrays on the background writer, which serializes them in the
+    requested format.
+
+    With the 'gpkg' and '3dtiles' formats the building is added to the store of the
+    format instead, together with its footprint and attributes.
 
     Args:
-        obj (trimesh.Trimesh): The mesh object to export.
         i (int): Index for output file naming.
+        vertices (np.ndarray): (N, 3) vertices relative to the tile origin.
+        faces (np.ndarray): (M, 3) triangle indices.
         x_offset (float): Offset along X axis.
         y_offset (float): Offset along Y axis.
-        output_folder (str): Directory where the final mesh will be saved.
-        export_format (str): Final export format ("ply" or "obj").
+        args: Parsed command-line arguments (must contain output_folder and the export options).
+        writer (AsyncWriter): Background writer serializing the mesh.
+        store (GeoPackageStore | TilesetWriter, optional): Store of the 'gpkg' or '3dtiles' format.
+        poly (dict, optional): Footprint and attributes of the building ('gpkg' and '3dtiles' formats).
+        fallback (bool): Whether the mesh is the flat fallback of a failed roof.
+
+    Returns:
+        str: Path of the output file.
     """
-    assert export_format in ["ply", "obj"], "Unsupported export format"
+    assert args.export_format in EXPORT_FORMATS, "Unsupported export format"
 
-    tmp_path = f"/tmp/out_{i}.ply"
-    out_path = os.path.join(output_folder, f"out_{i}.{export_format}")
+    if store is not None:
+        out_path = store.path
+        writer.submit(i, store.add_building, i, vertices, faces, x_offset, y_offset, poly, fallback)
+    elif args.export_format in ["ply", "obj"]:
+        out_path = os.path.join(args.output_folder, f"out_{i}.{args.export_format}")
+        writer.submit(i, write_shifted_mesh, out_path, vertices, faces, x_offset, y_offset)
+    else:
+        extension = "glb" if args.export_format == "glb" else "ply"
+        out_path = os.path.join(args.output_folder, f"out_{i}.{extension}")
+        writer.submit(i, write_compact_mesh, out_path, vertices, faces, x_offset, y_offset,
+                      export_format=args.export_format, precision=args.precision,
+                      quantization=args.quantization, compression=args.compression)
 
-    export_mesh_ply(tmp_path, obj, True)
+    return out_path
 
-    apply_global_shift(tmp_path, out_path, x_offset, y_offset)
 
-    blender_ops.clear_blender_scene()
+def export_and_shift_mesh(obj, i, x_offset, y_offset, args, writer, store=None, poly=None, fallback=False):
+    """
+    Extracts the mesh arrays from Blender and queues them on the background writer,
+    which applies the global shift and writes the desired format.
+
+    Args:
+        obj (bpy.types.Object): The mesh object to export.
+        i (int): Index for output file naming.
+        x_offset (float): Offset along X axis.
+        y_offset (float): Offset along Y axis.
+        args: Parsed command-line arguments (must contain output_folder and the export options).
+        writer (AsyncWriter): Background writer serializing the mesh.
+        store (GeoPackageStore | TilesetWriter, optional): Store of the 'gpkg' or '3dtiles' format.
+        poly (dict, optional): Footprint and attributes of the building ('gpkg' and '3dtiles' formats).
+        fallback (bool): Whether the mesh is the flat fallback of a failed roof.
+
+    Returns:
+        tuple: The exported (vertices, faces) arrays.
+    """
+    vertices, faces = blender_ops.get_mesh_arrays(obj)
+    out_path = queue_mesh_export(i, vertices, faces, x_offset, y_offset, args, writer, store, poly, fallback)
+
     blender_ops.clean_tmp_folder()
 
-    print_to_terminal(f"----> Saved mesh to: {out_path}")
+    print_to_terminal(f"----> Queued mesh for: {out_path}")
+
+    return vertices, faces
+
+
+def modeling_variant(args):
+    """
+    Describes the modeling options that change the generated geometry, so that
+    roofs built with different options never share a cache entry.
+    """
+    return f"{'native' if args.native_lod2 else 'blender'}|{args.boolean_backend}|{args.round_method}"
+
+
+def build_flat_fallback(obj_name, base_data, poly, args, round_edges=None):
+    """
+    Rebuilds the flat version of a building from the intermediates cached during
+    the first attempt, without recreating the footprint nor querying the point cloud.
+
+    Args:
+        obj_name (str): Name of the Blender object to create.
+        base_data (dict): Cached 'vertices' and 'faces' of the flattened footprint.
+        poly (dict): Polygon dictionary containing 'exterior' and 'height'.
+        args: Parsed command-line arguments (must contain round_edges and round_method).
+        round_edges (bool, optional): Overrides args.round_edges.
+
+    Returns:
+        bpy.types.Object: The flat-roof mesh object.
+    """
+    if round_edges is None:
+        round_edges = args.round_edges
+    obj = blender_ops.create_mesh_from_arrays(obj_name, base_data['vertices'], base_data['faces'])
+    get_roof_builder('flat')(obj, poly['height'], poly['exterior'], round_edges=round_edges,
+                             round_method=args.round_method)
+    return obj
+
 
+def run_mesh_qa(vertices, faces, poly, idx, args, summary, metrics=None):
+    """
+    Checks a building mesh (see mesh_qa.check_mesh) and records its QA flags in the
+    run summary.
+
+    Returns:
+        str | None: The failure sending the building to the flat fallback (with
+        --qa_fallback), None if the mesh is kept.
+    """
+    with stage_timer(metrics, 'qa'):
+        report = check_mesh(vertices, faces, footprint_area=footprint_polygon(poly['exterior'], poly['holes']).area,
+                            height=poly['height'], volume_range=args.qa_volume_range)
+    run_summary.record_qa(summary, idx, report)
+    if report['passed']:
+        return None
+
+    print(f"⚠ Building {idx}: QA failed ({', '.join(report['issues'])})")
+    if args.qa_fallback:
+        return f"QA failed: {', '.join(report['issues'])}"
+    return None
+
+
+def stage_timer(metrics, name):
+    """
+    Times a pipeline stage when a metrics writer is active.
+    """
+    return metrics.stage(name) if metrics is not None else nullcontext()
+
+
+def process_building(poly, idx, x_offset, y_offset, las_points, args, writer, summary, roof_cache=None, metrics=None,
+                     store=None, budget=None):
+    """
+    Generates and exports the 3D mesh of a single building footprint. If the roof
+    cannot be generated, the flat fallback is built right away from the cached
+    footprint and heights.
+
+    If a roof cache is given, a footprint identical (up to a translation and a rotation)
+    to an already processed one, with the same roof type and height, reuses its mesh.
 
-def process_roofs(polygons_to_process, x_offset, y_offset, las_points, args, force_roof_type=None):
+    With a time budget, the rounding is skipped when the predicted time of the building
+    exceeds its share, the skeleton and boolean steps are cut off at the deadline of
+    the building (flat fallback), and once the run is over time the remaining buildings
+    are built as LOD1 prisms. The quality level reached is stored in poly['quality']
+    (see budget.QUALITY_LEVELS).
+
+    Args:
+        poly (dict): Polygon dictionary containing 'exterior', 'holes' and optionally 'roof'.
+        idx (int): Global index of the building.
+        x_offset (float): Offset in the X direction to apply during export.
+        y_offset (float): Offset in the Y direction to apply during export.
+        las_points: Point cloud data already loaded in memory.
+        args: Parsed command-line arguments (must contain output_folder, export_format, round_edges).
+        writer (AsyncWriter): Background writer used to save the meshes.
+        summary (dict): Run summary collecting the outcome of each building.
+        roof_cache (RoofCache, optional): Cache of the finished roofs.
+        metrics (MetricsWriter, optional): Collects the stage latencies and keeps the status file updated.
+        store (GeoPackageStore | TilesetWriter, optional): Store of the 'gpkg' or '3dtiles' export format.
+        budget (TimeBudget, optional): Time budget, with the share of this building (see TimeBudget.start_building).
+
+    Returns:
+        bool: True if the mesh was queued for export, False if the building failed.
+    """
+    obj_name = f"Building_{idx}"
+    print_to_terminal(f"--> Processing {obj_name}...")
+
+    with stage_timer(metrics, 'footprint'):
+        obj = create_mesh_from_polygon(obj_name, poly['exterior'], poly['holes'])
+
+    with stage_timer(metrics, 'heights'):
+        z_min, z_max = pointcloud_ops.get_min_max_for_footprint(las_points, poly['exterior'], x_offset, y_offset)
+
+    if z_max is not None:
+        print(f"Highest point: {z_max}")
+        print(f"Lowest point: {z_min}")
+    else:
+        print("⚠ No points found in the bounding box.")
+
+    blender_ops.flatten_mesh_to_z(obj, z_min)
+    poly['z_min'], poly['z_max'] = z_min, z_max
+    poly['height'] = z_max - z_min
+
+    # Intermediates reused by the flat fallback
+    base_vertices, base_faces = blender_ops.get_mesh_arrays(obj)
+    base_data = {'vertices': base_vertices, 'faces': base_faces}
+
+    roof_type = poly.get('roof')
+    round_edges = args.round_edges and poly.get('quality') != 'lod1'
+
+    if budget is not None and poly.get('quality') is None:
+        if budget.expired():
+            roof_type, round_edges = 'flat', False
+            poly['quality'] = 'lod1'
+        elif round_edges and budget.over_share(roof_type, count_vertices(poly), len(poly['holes']), True):
+            round_edges = False
+            poly['quality'] = 'unrounded'
+
+    rounding = dict(round_edges=round_edges, round_method=args.round_method)
+    roof_dispatch = {
+        'flat': lambda: get_roof_builder('flat')(obj, poly['height'], poly['exterior'], **rounding),
+        'gabled': lambda: get_roof_builder('gabled')(obj, poly['height'], poly['exterior'], **rounding),
+        'gabled-L': lambda: get_roof_builder('gabled-L')(obj, poly['height'], idx, poly['exterior'], native=args.native_lod2, **rounding),
+        'hip': lambda: get_roof_builder('hip')(obj, poly['height'], idx, poly['exterior'], native=args.native_lod2, **rounding),
+        'pyramid': lambda: get_roof_builder('pyramid')(obj, poly['height'], idx, poly['exterior'], native=args.native_lod2, **rounding),
+    }
+
+    failure = None
+    cut_off = False
+    cache_key = None
+    if roof_cache is not None and roof_type in roof_dispatch:
+        try:
+            frame, shape = canonicalize_footprint(poly['exterior'], poly['holes'], z_min, args.cache_precision)
+            cache_key = roof_cache_key(shape, roof_type, poly['height'], round_edges, args.cache_precision,
+                                       variant=modeling_variant(args))
+        except Exception as e:
+            print(f"⚠ Building {idx}: cannot canonicalize the footprint ({e}), roof cache skipped.")
+
+        cached = roof_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            # The cached roof gets the QA of its footprint and height, like a built one
+            vertices = frame.to_world(cached[0])
+            if args.mesh_qa:
+                failure = run_mesh_qa(vertices, cached[1], poly, idx, args, summary, metrics)
+            if failure is None:
+                with stage_timer(metrics, 'export'):
+                    out_path = queue_mesh_export(idx, vertices, cached[1], x_offset, y_offset, args, writer,
+                                                 store, poly)
+                print_to_terminal(f"----> Roof cache hit, queued mesh for: {out_path}")
+                run_summary.record_outcome(summary, roof_type, 'done')
+                poly.setdefault('quality', 'full')
+                return True
+
+    # A cached roof failing the QA goes straight to the flat fallback
+    if failure is None and roof_type in roof_dispatch:
+        try:
+            # The skeleton and boolean steps check the deadline of the building
+            if budget is not None:
+                set_deadline(budget.building_deadline)
+            with stage_timer(metrics, 'roof'):
+                roof_dispatch[roof_type]()
+            if blender_ops.count_mesh_points(obj) == 0:
+                failure = "empty mesh generated"
+        except Exception as e:
+            failure = f"{type(e).__name__}: {e}"
+            cut_off = isinstance(e, DeadlineExceeded)
+        finally:
+            set_deadline(None)
+    elif failure is None:
+        failure = f"unsupported roof type '{roof_type}'"
+
+    if failure is None and args.mesh_qa:
+        failure = run_mesh_qa(*blender_ops.get_mesh_arrays(obj), poly, idx, args, summary, metrics)
+
+    if failure is None:
+        with stage_timer(metrics, 'export'):
+            vertices, faces = export_and_shift_mesh(obj, idx, x_offset, y_offset, args, writer, store, poly)
+        if cache_key:
+            roof_cache.put(cache_key, frame.to_canonical(vertices), faces)
+        run_summary.record_outcome(summary, roof_type, 'done')
+        poly.setdefault('quality', 'full')
+        return True
+
+    print(f"⚠ Building {idx}: {failure}, falling back to a flat roof.")
+    run_summary.record_outcome(summary, roof_type, 'failed')
+    poly['quality'] = 'fallback'
+
+    if bpy.context.object is not None and bpy.context.object.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    bpy.data.objects.remove(obj, do_unlink=True)
+
+    with stage_timer(metrics, 'fallback'):
+        # Past the deadline the fallback is not rounded either
+        obj = build_flat_fallback(obj_name, base_data, poly, args, round_edges=round_edges and not cut_off)
+    if blender_ops.count_mesh_points(obj) == 0:
+        run_summary.record_failure(summary, idx, 'roof', f"{failure}; flat fallback produced an empty mesh")
+        return False
+
+    with stage_timer(metrics, 'export'):
+        export_and_shift_mesh(obj, idx, x_offset, y_offset, args, writer, store, poly, fallback=True)
+    run_summary.record_outcome(summary, 'flat', 'fallback')
+    return True
+
+
+### function: process_flat_prisms ###
+def process_flat_prisms(polygons, x_offset, y_offset, las_points, args, writer, summary, metrics=None, store=None):
+    """
+    Fast path of the flat roofs without rounding: a flat building is a prism between
+    the lowest and highest points under its footprint, so it is built with NumPy for
+    a whole batch of footprints (see prism.build_prisms) and queued on the writer
+    without creating any Blender object.
+
+    Args:
+        polygons (list): Polygon dictionaries with a 'flat' roof.
+        x_offset (float): Offset in the X direction to apply during export.
+        y_offset (float): Offset in the Y direction to apply during export.
+        las_points: Point cloud data already loaded in memory.
+        args: Parsed command-line arguments (flat_batch_size, mesh_qa and the export options).
+        writer (AsyncWriter): Background writer used to save the meshes.
+        summary (dict): Run summary collecting the outcome of each building.
+        metrics (MetricsWriter, optional): Collects the stage latencies and keeps the status file updated.
+        store (GeoPackageStore | TilesetWriter, optional): Store of the 'gpkg' or '3dtiles' export format.
+
+    Returns:
+        list: The polygons that could not be triangulated, left to the Blender path.
+    """
+    remaining = []
+
+    for start in range(0, len(polygons), args.flat_batch_size):
+        batch = polygons[start:start + args.flat_batch_size]
+        batch_start = time.perf_counter()
+
+        with stage_timer(metrics, 'heights'):
+            for poly in batch:
+                z_min, z_max = pointcloud_ops.get_min_max_for_footprint(las_points, poly['exterior'], x_offset, y_offset)
+                poly['z_min'], poly['z_max'] = z_min, z_max
+                poly['height'] = z_max - z_min
+
+        with stage_timer(metrics, 'flat_prisms'):
+            footprints = [footprint_polygon(poly['exterior'], poly['holes']) for poly in batch]
+            meshes = build_prisms(footprints, [poly['z_min'] for poly in batch], [poly['z_max'] for poly in batch])
+
+        for poly, footprint, (vertices, faces) in zip(batch, footprints, meshes):
+            idx = poly['index']
+            if len(faces) == 0:
+                remaining.append(poly)
+                continue
+
+            if args.mesh_qa:
+                with stage_timer(metrics, 'qa'):
+                    report = check_mesh(vertices, faces, footprint_area=footprint.area, height=poly['height'],
+                                        volume_range=args.qa_volume_range)
+                run_summary.record_qa(summary, idx, report)
+
+            with stage_timer(metrics, 'export'):
+                queue_mesh_export(idx, vertices, faces, x_offset, y_offset, args, writer, store, poly)
+            run_summary.record_outcome(summary, 'flat', 'done')
+            poly.setdefault('quality', 'full')
+
+        # The batch time is shared evenly by its buildings
+        seconds = (time.perf_counter() - batch_start) / len(batch)
+        for poly, (_, faces) in zip(batch, meshes):
+            if len(faces):
+                run_summary.record_timing(summary, poly['index'], seconds, roof='flat', vertices=count_vertices(poly),
+                                          vertices_before=poly.get('vertices_before'), holes=len(poly['holes']),
+                                          round_edges=False, fast_path=True, quality=poly['quality'])
+                run_summary.increment_counter(summary, f"quality_{poly['quality']}")
+        run_summary.increment_counter(summary, 'flat_fast_path', len(batch) - sum(len(faces) == 0 for _, faces in meshes))
+        if metrics is not None:
+            metrics.building_done(len(summary['timings']), summary)
+        print_to_terminal(f"--> {start + len(batch)}/{len(polygons)} flat prisms queued")
+
+    return remaining
+
+
+### function: prepare_incremental_run ###
+def prepare_incremental_run(polygons, x_offset, y_offset, las_points, args, summary, checkpoint=None, schedule=None):
+    """
+    Compares the footprints with the manifest of the previous run in the output folder
+    (hash of the footprint in world coordinates and of its attributes, and with
+    --las_fingerprint the statistics of the points under it). The outputs of the
+    unchanged buildings are renamed to their new index, those of the deleted ones are
+    removed, and the manifest of this run is prepared, to replace the previous one
+    once the run is complete (see manifest.finalize_manifest).
+
+    The comparison and the moves are done once, and journaled in the pending manifest:
+    recycled and parallel workers read the buildings to model from it, and a run that
+    crashed is recovered by the next one (see manifest.recover_manifest).
+
+    Args:
+        polygons (list): Polygon dictionaries with their global 'index'.
+        x_offset (float): Offset in the X direction of the footprints.
+        y_offset (float): Offset in the Y direction of the footprints.
+        las_points: Point cloud data already loaded in memory.
+        args: Parsed command-line arguments.
+        summary (dict): Run summary, receiving the 'incremental' section.
+        checkpoint (dict, optional): Checkpoint of a recycled worker: the outputs were already moved.
+        schedule (BuildingSchedule, optional): Claim table of parallel workers: one of them moves the outputs.
+
+    Returns:
+        list: The polygons to model.
+    """
+    # The outputs are moved once, before any building is written: by the first worker, while
+    # the other parallel workers wait
+    if schedule is None:
+        owner = checkpoint is None
+    else:
+        owner = schedule.claim_task('incremental', args.worker_id) and not schedule.task_done('incremental')
+    if owner:
+        previous = recover_manifest(args.output_folder)
+        if previous is not None:
+            print_to_terminal(f"Recovered the outputs of an interrupted run: {len(previous['buildings'])} kept")
+        else:
+            previous = load_manifest(args.output_folder)
+
+        options = {name: getattr(args, name) for name in INCREMENTAL_OPTIONS}
+        buildings = []
+        for poly in polygons:
+            entry = {'index': poly['index'], 'hash': footprint_hash(poly, x_offset, y_offset)}
+            if args.las_fingerprint:
+                entry['las'] = pointcloud_ops.las_fingerprint(las_points, poly['exterior'], x_offset, y_offset)
+            buildings.append(entry)
+
+        changes = diff_manifest(previous, buildings, options)
+        carried, removed = carry_over_outputs(args.output_folder, changes,
+                                              {'version': MANIFEST_VERSION, 'options': options, 'buildings': buildings})
+        print_to_terminal(f"{carried} output files carried over, {removed} removed")
+        if schedule is not None:
+            schedule.finish_task('incremental')
+    elif schedule is not None:
+        schedule.wait_task('incremental')
+
+    journal = load_journal(args.output_folder)
+    if journal is None:
+        sys.exit(f"No incremental run in progress in {args.output_folder}: start it again without --resume.")
+
+    stats = journal['stats']
+    if not checkpoint:
+        run_summary.update_section(summary, 'incremental', stats)
+
+    print_to_terminal(f"{stats['unchanged']} unchanged buildings, {stats['regenerated']} to regenerate, "
+                      f"{stats['removed']} removed" + (" (options changed)" if stats['options_changed'] else ""))
+    regenerate = set(journal['regenerate'])
+    return [poly for poly in polygons if poly['index'] in regenerate]
+
+
+### function: remaining_buildings ###
+def remaining_buildings(summary, total, schedule=None):
+    """
+    Buildings left to this worker, for the share of the time budget: its part of the
+    buildings not done in the claim table of parallel workers, otherwise the buildings
+    of the run without a timing record yet (fast path and recycled workers included).
+    """
+    if schedule is not None:
+        not_done, workers = schedule.remaining()
+        return -(-not_done // max(workers, 1))
+    return max(total - len(summary['timings']), 1)
+
+
+### function: claimed_positions ###
+def claimed_positions(schedule, worker_id, polygons_to_process):
+    """
+    Yields the positions of the buildings claimed from the shared schedule until none is pending.
+    """
+    positions = {poly['index']: position for position, poly in enumerate(polygons_to_process)}
+    while claimed := schedule.claim(worker_id):
+        for idx in claimed:
+            yield positions[idx]
+
+
+def process_roofs(polygons_to_process, x_offset, y_offset, las_points, args, writer, summary, start=0, recycler=None,
+                  roof_cache=None, metrics=None, store=None, schedule=None, budget=None):
     """
     Processes a list of building footprints and generates corresponding 3D roof meshes.
 
+    The datablocks created by each building are tracked and freed once the building
+    is done, so the memory of a long run stays constant.
+
     Args:
         polygons_to_process (list): List of polygon dictionaries, each containing 'exterior', 'holes', and optionally 'roof' and 'index'.
         x_offset (float): Offset in the X direction to apply during export.
         y_offset (float): Offset in the Y direction to apply during export.
         las_points: Point cloud data already loaded in memory.
         args: Parsed command-line arguments (must contain output_folder, export_format, round_edges).
-        force_roof_type (str, optional): If provided, overrides the 'roof' attribute in the polygon and applies this roof type to all buildings.
+        writer (AsyncWriter): Background writer used to save the meshes.
+        summary (dict): Run summary collecting the outcome of each building.
+        start (int): Position in polygons_to_process where processing starts (used when resuming).
+        recycler (WorkerRecycler, optional): If provided, raises RecycleWorker when the worker has to be replaced.
+        roof_cache (RoofCache, optional): Cache of the finished roofs.
+        metrics (MetricsWriter, optional): Collects the stage latencies and keeps the status file updated.
+        store (GeoPackageStore | TilesetWriter, optional): Store of the 'gpkg' or '3dtiles' export format.
+        schedule (BuildingSchedule, optional): Claim table shared with the other workers; the buildings
+            are claimed from it, most expensive first, instead of being processed in list order.
+        budget (TimeBudget, optional): Time budget of the run, shared among the remaining buildings.
 
     Returns:
-        list: List of indices corresponding to buildings that failed the process (e.g. due to empty meshes or unsupported roof types).
+        list: List of indices corresponding to buildings for which not even the flat fallback could be generated.
     """
     failed_indices = []
 
-    for i, poly in enumerate(polygons_to_process):
-        idx = poly['index'] if 'index' in poly else i  # useful for second pass
-        obj_name = f"Building_{idx}"
-        print_to_terminal(f"--> Processing {obj_name}...")
-
-        obj = create_mesh_from_polygon(obj_name, poly['exterior'], poly['holes'])
+    if schedule is None:
+        positions = range(start, len(polygons_to_process))
+    else:
+        positions = claimed_positions(schedule, args.worker_id, polygons_to_process)
 
-        tmp_path_bbox = f"/tmp/bbox_mask_{idx}.ply"
-        export_mesh_ply(tmp_path_bbox, obj, True)
+    processed = start
+    for position in positions:
+        poly = polygons_to_process[position]
+        idx = poly['index'] if 'index' in poly else position
 
-        z_min, z_max = pointcloud_ops.get_min_max_las(las_points, tmp_path_bbox, x_offset, y_offset, idx)
+        building_start = time.perf_counter()
+        if budget is not None:
+            budget.start_building(remaining_buildings(summary, budget.buildings, schedule))
+        snapshot = blender_ops.snapshot_datablocks()
+        try:
+            if not process_building(poly, idx, x_offset, y_offset, las_points, args, writer, summary, roof_cache,
+                                    metrics, store, budget):
+                failed_indices.append(idx)
+                if store is not None:
+                    store.skip_building(idx)
+        finally:
+            with stage_timer(metrics, 'cleanup'):
+                freed = blender_ops.free_datablocks_since(snapshot)
+            print(f"Freed {freed} datablocks of building {idx}")
 
-        if z_max is not None:
-            print(f"Highest point: {z_max}")
-            print(f"Lowest point: {z_min}")
-        else:
-            print("⚠ No points found in the bounding box.")
-
-        blender_ops.flatten_mesh_to_z(obj, z_min)
-        poly['height'] = z_max - z_min
-
-        roof_dispatch = {
-            'flat': lambda: create_flat_roof(obj, poly['height'], poly['exterior'], round_edges=args.round_edges),
-            'gabled': lambda: create_gabled_roof(obj, poly['height'], poly['exterior'], round_edges=args.round_edges),
-            'gabled-L': lambda: create_gabled_L_roof(obj, poly['height'], idx, poly['exterior'], round_edges=args.round_edges),
-            'hip': lambda: create_hip_roof(obj, poly['height'], idx, poly['exterior'], round_edges=args.round_edges),
-            'pyramid': lambda: create_pyramid_roof(obj, poly['height'], idx, poly['exterior'], round_edges=args.round_edges),
-        }
-
-        roof_type = force_roof_type if force_roof_type else poly.get('roof')
-        if roof_type in roof_dispatch:
-            roof_dispatch[roof_type]()
-        else:
-            print(f"⚠ Unsupported roof type '{roof_type}' for building {idx}")
-            failed_indices.append(idx)
-            bpy.data.objects.remove(obj, do_unlink=True)
-            continue
+        # The features of what was actually built, for the cost model
+        quality = poly.get('quality')
+        run_summary.record_timing(summary, idx, time.perf_counter() - building_start,
+                                  roof='flat' if quality == 'lod1' else poly.get('roof'), vertices=count_vertices(poly),
+                                  vertices_before=poly.get('vertices_before'), holes=len(poly['holes']),
+                                  round_edges=args.round_edges and quality not in ('unrounded', 'lod1'),
+                                  quality=quality)
+        run_summary.increment_counter(summary, f"quality_{quality}")
+        if schedule is not None:
+            schedule.complete(idx)
 
-        if blender_ops.count_mesh_points(obj) == 0:
-            print(f"⚠ Empty mesh generated for building {idx}, it will be reprocessed.")
-            failed_indices.append(idx)
-            bpy.data.objects.remove(obj, do_unlink=True)
-            continue
+        processed += 1
+        if metrics is not None:
+            metrics.building_done(len(summary['timings']), summary)
 
-        export_and_shift_mesh(obj, idx, x_offset, y_offset, args.output_folder, args.export_format)
+        if recycler is not None:
+            reason = recycler.building_done()
+            if reason and processed < len(polygons_to_process):
+                raise RecycleWorker(reason, processed)
 
     return failed_indices
 
@@ -198,26 +828,247 @@ def process_roofs(polygons_to_process, x_offset, y_offset, las_points, args, for
 if __name__ == "__main__":
     args = parse_args()
 
-    # Get start Time
+    # Get start Time, and the time Blender took to reach this script
     start = time.perf_counter()
+    boot_seconds = get_process_age()
 
     # Read Shapefile Polygons
     print_to_terminal("Read Shapefile...")
-    polygons, (x_offset, y_offset) = read_shapefile_polygons(args.input_shapefile)
+    polygons, (x_offset, y_offset) = read_shapefile_polygons(args.input_shapefile, args.bbox)
+
+    # Parallel workers write their own summary and checkpoint, merged by main.py
+    summary_name = f"run_summary_{args.worker_id}.json" if args.worker_id else "run_summary.json"
+
+    if not polygons:
+        print_to_terminal("No footprint to process.")
+        run_summary.save_run_summary(run_summary.create_run_summary(), args.output_folder, summary_name)
+        sys.exit(0)
 
     print ("--> Read LAS...")
-    las_points = pointcloud_ops.load_las_points(args.las, x_offset, y_offset)
+    las_points = pointcloud_ops.load_las_points(args.las, x_offset, y_offset, int(args.las_cache_mb * 1024 ** 2))
+
+    # Only the points under the footprints of the tile are kept in memory
+    if args.bbox and isinstance(las_points, LasRecords):
+        las_points = las_points.crop(*pointcloud_ops.footprints_bounds(polygons, x_offset, y_offset))
 
     for i, poly in enumerate(polygons):
         poly['index'] = i  # Save global indices
 
-    failed_idxs = process_roofs(polygons, x_offset, y_offset, las_points, args)
+    # With LAS tiles, neighbouring footprints are processed together so that their tiles stay cached
+    if isinstance(las_points, LasCatalog):
+        polygons = las_points.order_footprints(polygons, x_offset, y_offset)
 
-    if failed_idxs:
-        print_to_terminal(f"\n---> Retry su {len(failed_idxs)} edifici con tetto flat")
-        retry_polygons = [polygons[i] for i in failed_idxs]
-        process_roofs(retry_polygons, x_offset, y_offset, las_points, args, force_roof_type='flat')
-    
-    # Get end Time and print execution time
-    end = time.perf_counter()
-    print_to_terminal(f"Execution time: {end - start:.4f} seconds")
\ No newline at end of file
+    checkpoint_name = f".lod2_checkpoint_{args.worker_id}.json" if args.worker_id else ".lod2_checkpoint.json"
+    checkpoint_path = args.checkpoint or os.path.join(args.output_folder, checkpoint_name)
+    checkpoint = load_checkpoint(checkpoint_path) if args.resume else None
+
+    if checkpoint:
+        summary, position = checkpoint['summary'], checkpoint['position']
+        print_to_terminal(f"Resuming from position {position}...")
+    else:
+        remove_checkpoint(checkpoint_path)
+        summary = run_summary.create_run_summary()
+        run_summary.increment_counter(summary, 'buildings', len(polygons))
+        position = 0
+
+    schedule = BuildingSchedule(args.schedule) if args.schedule else None
+
+    # Only the new and changed buildings are modeled, the outputs of the others are kept
+    if args.incremental:
+        if args.export_format in ("gpkg", "3dtiles"):
+            sys.exit(f"--incremental is not supported with the '{args.export_format}' export format.")
+        print_to_terminal("Compare with the previous run...")
+        polygons = prepare_incremental_run(polygons, x_offset, y_offset, las_points, args, summary, checkpoint, schedule)
+
+    # Infer the missing roof types before validating the footprints
+    if args.classify_roofs:
+        print_to_terminal("Classify missing roof types...")
+        from modeling.roof_classifier import classify_missing_roofs
+
+        classifier_stats = classify_missing_roofs(polygons, las_points, x_offset, y_offset,
+                                                  cell_size=args.classifier_cell_size,
+                                                  workers=args.classifier_workers)
+        if not checkpoint:
+            run_summary.update_section(summary, 'classifier', classifier_stats)
+
+    # Remove the vertices that only inflate skeleton, boolean and triangle costs
+    if args.simplify:
+        print_to_terminal("Simplify footprints...")
+        simplify_stats = simplify_footprints(polygons, tolerance=args.simplify_tolerance,
+                                             collinear_tolerance=args.collinear_tolerance,
+                                             snap_angle_deg=args.snap_angle)
+        if not checkpoint:
+            run_summary.update_section(summary, 'simplify', simplify_stats)
+
+    # Validate all the footprints once, before any roof generation
+    if not args.no_preflight:
+        print_to_terminal("Preflight footprints...")
+        preflight_stats = preflight_footprints(polygons, min_area=args.min_area,
+                                               min_edge_length=args.min_edge_length,
+                                               max_vertices=args.max_vertices)
+        if not checkpoint:
+            run_summary.update_section(summary, 'preflight', preflight_stats)
+
+    # Footprints too small for a meaningful roof are built as LOD1 prisms
+    if args.lod1_min_area > 0:
+        lod1 = 0
+        for poly in polygons:
+            if footprint_polygon(poly['exterior'], poly['holes']).area < args.lod1_min_area:
+                poly['roof'], poly['quality'] = 'flat', 'lod1'
+                lod1 += 1
+        print_to_terminal(f"{lod1} footprints below {args.lod1_min_area} m2 built as LOD1 prisms")
+
+    # Flat roofs without rounding skip Blender: they are extruded in batches before the other roofs
+    flat_polygons = []
+    if not args.no_flat_fast_path:
+        flat_polygons = [poly for poly in polygons if poly.get('roof') == 'flat'
+                         and (not args.round_edges or poly.get('quality') == 'lod1')]
+        flat_ids = {id(poly) for poly in flat_polygons}
+        polygons = [poly for poly in polygons if id(poly) not in flat_ids]
+
+    # Shared claim table: filled once in LPT order (longest predicted time first) by the first
+    # worker, then every worker claims the next pending buildings when it is free
+    if schedule is not None:
+        cost_model = CostModel.load(args.cost_model)
+        costs = {poly['index']: cost_model.predict(poly.get('roof'), count_vertices(poly), len(poly['holes']),
+                                                   args.round_edges) for poly in polygons}
+        schedule.add(lpt_order(costs))
+        released = schedule.release(args.worker_id)
+        if released:
+            print_to_terminal(f"Released {released} buildings claimed by the previous {args.worker_id} worker")
+
+    # Remove the objects of the startup scene, then every building frees its own datablocks
+    blender_ops.clear_blender_scene()
+    blender_ops.set_boolean_backend(args.boolean_backend)
+    skeleton.set_skeleton_limits(args.skeleton_timeout, args.skeleton_memory_mb)
+
+    # The deadline of the run is kept in the summary, so that recycled workers share it. Without the
+    # deadline of main.py, it counts from the process start: the boot and the setup are part of the run
+    budget = None
+    if args.time_budget or args.building_budget:
+        deadline = summary['sections'].get('budget', {}).get('deadline_at', args.deadline_at)
+        if deadline is None and args.time_budget:
+            deadline = time.time() - (time.perf_counter() - start) - (boot_seconds or 0) + args.time_budget
+        budget = TimeBudget(args.time_budget, args.building_budget, CostModel.load(args.cost_model),
+                            deadline=deadline,
+                            buildings=len(polygons) + len(flat_polygons))
+        if not checkpoint:
+            run_summary.update_section(summary, 'budget', {'run_seconds': args.time_budget,
+                                                           'building_seconds': args.building_budget,
+                                                           'deadline_at': budget.deadline})
+
+    recycler = WorkerRecycler(args.max_buildings_per_worker, args.max_rss_mb)
+    recycle = None
+
+    roof_cache = RoofCache(args.roof_cache_size, args.roof_cache_dir) if args.roof_cache else None
+
+    metrics = None
+    if args.metrics_file:
+        metrics = MetricsWriter(args.metrics_file, args.metrics_format, args.metrics_interval,
+                                labels=dict(label.split("=", 1) for label in args.metrics_labels))
+        metrics.restore(checkpoint.get('metrics') if checkpoint else None)
+        # Every building gets one timing record, fast path included: it counts the progress of the run
+        metrics.processed, metrics.total = len(summary['timings']), len(polygons) + len(flat_polygons)
+        metrics.write(summary)
+
+    # Startup costs are accumulated over the recycled workers
+    run_summary.increment_counter(summary, 'startup_workers')
+    if boot_seconds is not None:
+        run_summary.increment_counter(summary, 'startup_boot_seconds', round(boot_seconds, 3))
+    run_summary.increment_counter(summary, 'startup_setup_seconds', round(time.perf_counter() - start, 3))
+
+    # Single GeoPackage or tileset per output folder, appended by the recycled workers
+    store = None
+    if args.export_format == "gpkg":
+        store = GeoPackageStore(os.path.join(args.output_folder, "buildings.gpkg"),
+                                srs_from_prj(args.input_shapefile, args.srs_id), batch_size=args.gpkg_batch_size,
+                                precision=args.precision, quantization=args.quantization, compression=args.compression)
+    elif args.export_format == "3dtiles":
+        store = TilesetWriter(os.path.join(args.output_folder, "3dtiles"), polygons + flat_polygons, x_offset, y_offset,
+                              srs_from_prj(args.input_shapefile, args.srs_id), max_features=args.tile_max_features,
+                              max_depth=args.tile_max_depth, resume=bool(checkpoint))
+
+    writer = AsyncWriter(num_threads=args.writer_threads, max_queue_size=args.writer_queue_size)
+    try:
+        # Done once per run: by the first worker (not the recycled ones), or the worker claiming it
+        if flat_polygons and not checkpoint and (schedule is None or schedule.claim_task('flat_prisms', args.worker_id)):
+            print_to_terminal(f"Extrude {len(flat_polygons)} flat roofs...")
+            remaining = process_flat_prisms(flat_polygons, x_offset, y_offset, las_points, args, writer, summary,
+                                            metrics=metrics, store=store)
+            process_roofs(remaining, x_offset, y_offset, las_points, args, writer, summary, roof_cache=roof_cache,
+                          metrics=metrics, store=store, budget=budget)
+            if schedule is not None:
+                schedule.finish_task('flat_prisms')
+
+        process_roofs(polygons, x_offset, y_offset, las_points, args, writer, summary,
+                      start=position, recycler=recycler, roof_cache=roof_cache, metrics=metrics, store=store,
+                      schedule=schedule, budget=budget)
+        remove_checkpoint(checkpoint_path)
+    except RecycleWorker as e:
+        print_to_terminal(f"Recycling worker: {e.reason}")
+        recycle = {'position': e.position}
+    finally:
+        # Flush pending meshes before reporting
+        print_to_terminal("Waiting for pending meshes to be written...")
+        export_failures = writer.close()
+        run_summary.increment_counter(summary, 'meshes_written', writer.written)
+        for idx, error in export_failures:
+            run_summary.record_failure(summary, idx, 'export', error)
+        if store is not None:
+            store.close()
+            run_summary.increment_counter(summary, f'{args.export_format}_buildings', store.written)
+
+        for key, value in blender_ops.BOOLEAN_STATS.items():
+            run_summary.increment_counter(summary, f'booleans_{key}', value)
+        for key, value in skeleton.SKELETON_STATS.items():
+            run_summary.increment_counter(summary, f'skeleton_{key}', round(value, 3))
+
+        # Cache counters accumulate over recycled workers
+        if roof_cache is not None:
+            for key, value in roof_cache.stats.items():
+                run_summary.increment_counter(summary, f'roof_cache_{key}', value)
+        if isinstance(las_points, LasCatalog):
+            for key, value in las_points.stats.items():
+                run_summary.increment_counter(summary, f'las_cache_{key}', value)
+
+        # Get end Time and accumulate the execution time of every worker
+        end = time.perf_counter()
+        summary['execution_time'] = (summary['execution_time'] or 0) + (end - start)
+
+    if recycle:
+        recycle['summary'] = summary
+        if metrics is not None:
+            recycle['metrics'] = metrics.state()
+            metrics.write(summary, status='recycling')
+        save_checkpoint(checkpoint_path, recycle)
+        sys.exit(RECYCLE_EXIT_CODE)
+
+    # The remaining tiles and tileset.json are written once every worker is done
+    if args.export_format == "3dtiles":
+        store.finalize()
+
+    if args.simplify:
+        run_summary.update_section(summary, 'simplify', estimate_speedup(summary['timings']))
+
+    if args.roof_cache:
+        cache_counters = {key[len('roof_cache_'):]: value for key, value in summary['counters'].items()
+                          if key.startswith('roof_cache_')}
+        run_summary.update_section(summary, 'roof_cache', cache_hit_rates(cache_counters))
+
+    if isinstance(las_points, LasCatalog):
+        las_counters = {key[len('las_cache_'):]: value for key, value in summary['counters'].items()
+                        if key.startswith('las_cache_')}
+        run_summary.update_section(summary, 'las_catalog', catalog_hit_rates(las_counters, len(las_points.paths)))
+
+    if budget is not None and budget.deadline is not None:
+        run_summary.update_section(summary, 'budget', {'overrun_seconds': round(max(time.time() - budget.deadline, 0.0), 3)})
+
+    # Parallel workers: main.py finalizes the manifest once all of them are done
+    if args.incremental and schedule is None:
+        finalize_manifest(args.output_folder, indices_to_rebuild(summary))
+
+    if metrics is not None:
+        metrics.write(summary, status='finished')
+
+    run_summary.print_run_summary(summary, print_fn=print_to_terminal)
+    run_summary.save_run_summary(summary, args.output_folder, summary_name)
@@ -0,0 +1,35 @@
+import time
+import argparse
+
+from io_utils.point_store import convert_las_to_point_store
+
+
+# ---------------------------------------------------
+#
+# One-time conversion of a point cloud into a memory-mapped point store:
+#
+#   python tool/build_point_store.py --las <las_path | las_folder | 'pattern/*.laz'> -o <store_folder> [--cell_size 5]
+#
+# The store folder is then given to --las of main.py instead of the LAS files.
+#
+# ---------------------------------------------------
+
+
+### function: parse_args ###
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert LAS files into a Morton-ordered point store opened with mmap.")
+    parser.add_argument("--las", type=str, required=True,
+                        help="LAS file, or directory / glob pattern of LAS tiles.")
+    parser.add_argument("-o", "--output_folder", type=str, required=True,
+                        help="Folder of the point store.")
+    parser.add_argument("--cell_size", type=float, default=5.0,
+                        help="Side of the index cells, about the size of a footprint (default: 5).")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    start = time.perf_counter()
+    count = convert_las_to_point_store(args.las, args.output_folder, args.cell_size)
+    print(f"{count} points written to {args.output_folder} in {time.perf_counter() - start:.1f} s")
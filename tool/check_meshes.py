@@ -0,0 +1,123 @@
+import os
+import re
+import sys
+import glob
+import gzip
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from modeling.mesh_qa import check_mesh, DEFAULT_VOLUME_RANGE
+
+
+# ---------------------------------------------------
+#
+# QA of the meshes of a finished run, on a process pool:
+#
+#   python tool/check_meshes.py -o <output_folder> [--workers 8] [--volume_range 0.3 1.1]
+#
+# Reads the out_<index>.{ply,obj,glb}[.gz] files (or buildings.gpkg) and writes
+# qa_report.json in the output folder. The footprint area and the height are
+# taken from the meshes themselves.
+#
+# ---------------------------------------------------
+
+
+MESH_PATTERN = re.compile(r"out_(\d+)\.(ply|obj|glb)(\.gz)?$")
+
+
+### function: parse_args ###
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check the meshes of a finished run on a process pool.")
+    parser.add_argument("-o", "--output_folder", type=str, required=True,
+                        help="Output folder of the run.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Number of processes (default: number of CPUs).")
+    parser.add_argument("--volume_range", type=float, nargs=2, default=list(DEFAULT_VOLUME_RANGE), metavar=("MIN", "MAX"),
+                        help="Accepted volume / (footprint area x height) of a mesh (default: 0.3 1.1).")
+    parser.add_argument("--no_self_intersections", action="store_true",
+                        help="Skip the self-intersection test, the slowest one.")
+    return parser.parse_args()
+
+
+### function: load_mesh_file ###
+def load_mesh_file(path):
+    """
+    Loads the vertices and triangles of an exported mesh (compact PLY included).
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith(".gz"):
+        data = gzip.decompress(data)
+
+    if path.endswith((".ply", ".ply.gz")) and b"comment scale" in data[:data.find(b"end_header")]:
+        from io_utils.compact import decode_compact_ply
+        return decode_compact_ply(data)
+
+    import io
+    import trimesh
+
+    file_type = MESH_PATTERN.search(os.path.basename(path)).group(2)
+    mesh = trimesh.load(io.BytesIO(data), file_type=file_type, force='mesh', process=False)
+    return mesh.vertices, mesh.faces
+
+
+### function: _check_file ###
+def _check_file(job):
+    idx, path, options = job
+    try:
+        return dict(index=idx, **check_mesh(*load_mesh_file(path), **options))
+    except Exception as e:
+        return {'index': idx, 'issues': ['unreadable'], 'passed': False, 'error': f"{type(e).__name__}: {e}"}
+
+
+### function: _check_building ###
+def _check_building(job):
+    building, options = job
+    return dict(index=building['index'], **check_mesh(building['vertices'], building['faces'], **options))
+
+
+### function: check_output_folder ###
+def check_output_folder(output_folder, workers, options):
+    """
+    Runs the QA of every mesh of an output folder on a process pool.
+
+    Returns:
+        list of dict: Report of every building, sorted by index.
+    """
+    gpkg_path = os.path.join(output_folder, "buildings.gpkg")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if os.path.exists(gpkg_path):
+            from io_utils.geopackage import query_buildings
+            buildings = query_buildings(gpkg_path, (-float('inf'), -float('inf'), float('inf'), float('inf')))
+            reports = list(executor.map(_check_building, [(b, options) for b in buildings], chunksize=64))
+        else:
+            jobs = [(int(match.group(1)), path, options) for path in glob.glob(os.path.join(output_folder, "out_*"))
+                    if (match := MESH_PATTERN.search(os.path.basename(path)))]
+            reports = list(executor.map(_check_file, jobs, chunksize=64))
+
+    return sorted(reports, key=lambda report: report['index'])
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    options = {'volume_range': tuple(args.volume_range), 'self_intersections': not args.no_self_intersections}
+
+    start = time.perf_counter()
+    reports = check_output_folder(args.output_folder, args.workers, options)
+    if not reports:
+        sys.exit(f"No mesh found in {args.output_folder}")
+
+    issues = {}
+    for report in reports:
+        for issue in report['issues']:
+            issues[issue] = issues.get(issue, 0) + 1
+    failed = sum(not report['passed'] for report in reports)
+
+    path = os.path.join(args.output_folder, "qa_report.json")
+    with open(path, 'w') as f:
+        json.dump({'checked': len(reports), 'failed': failed, 'issues': issues, 'buildings': reports}, f, indent=2)
+
+    print(f"{len(reports)} meshes checked in {time.perf_counter() - start:.1f} s, {failed} failed {issues}")
+    print(f"QA report saved to: {path}")
@@ -8,7 +8,14 @@
 #include <CGAL/extrude_skeleton.h>
 #include <CGAL/Surface_mesh.h>
 #include <CGAL/IO/polygon_mesh_io.h>
+#include <CGAL/IO/polygon_soup_io.h>
 #include <cstdlib>
+#include <cstring>
+#include <algorithm>
+#include <limits>
+#include <cmath>
+#include <map>
+#include <tuple>
 
 typedef CGAL::Exact_predicates_inexact_constructions_kernel     K;
 typedef K::Point_2                                              Point2;
@@ -17,6 +24,8 @@ typedef CGAL::Polygon_2<K>                                      Polygon_2;
 typedef CGAL::Polygon_with_holes_2<K>                           Polygon_with_holes;
 
 typedef CGAL::Surface_mesh<Point3>                             Mesh;
+typedef K::Vector_3                                             Vector3;
+typedef std::vector<std::size_t>                                Face;
 
 
 /**
@@ -111,8 +120,284 @@ void scale_mesh(Mesh& mesh, double sx, double sy, double sz) {
     }
 }
 
+/**
+ * @brief Builds the polygon with holes passed to the straight skeleton.
+ *
+ * @param exterior Points of the exterior ring (counterclockwise).
+ * @param holes Points of each hole (clockwise).
+ *
+ * @return The polygon with holes.
+ */
+Polygon_with_holes make_polygon(const std::vector<Point2>& exterior,
+                                const std::vector<std::vector<Point2>>& holes)
+{
+    Polygon_2 outer;
+    for (const auto& p : exterior)
+        outer.push_back( p );
+
+    assert(outer.is_counterclockwise_oriented());
+    Polygon_with_holes poly( outer );
+
+    for (size_t i = 0; i < holes.size(); ++i) {
+        Polygon_2 hole;
+        for (const auto& p : holes[i])
+            hole.push_back( p );
+        assert(hole.is_clockwise_oriented());
+        poly.add_hole( hole );
+    }
+
+    return poly;
+}
+
+
+/**
+ * @brief Computes the (non normalized) normal of a mesh face with Newell's method.
+ */
+Vector3 face_normal(const Mesh& mesh, Mesh::Face_index f) {
+    double nx = 0, ny = 0, nz = 0;
+    std::vector<Point3> pts;
+    for (auto v : CGAL::vertices_around_face(mesh.halfedge(f), mesh))
+        pts.push_back(mesh.point(v));
+
+    for (size_t i = 0; i < pts.size(); ++i) {
+        const Point3& a = pts[i];
+        const Point3& b = pts[(i + 1) % pts.size()];
+        nx += (a.y() - b.y()) * (a.z() + b.z());
+        ny += (a.z() - b.z()) * (a.x() + b.x());
+        nz += (a.x() - b.x()) * (a.y() + b.y());
+    }
+    return Vector3(nx, ny, nz);
+}
+
+
+/**
+ * @brief Checks whether a face belongs to the bottom of the skeleton mesh (downward, at base height).
+ */
+bool is_bottom_face(const Mesh& mesh, Mesh::Face_index f, double base_z) {
+    if (face_normal(mesh, f).z() >= 0) return false;
+    for (auto v : CGAL::vertices_around_face(mesh.halfedge(f), mesh))
+        if (mesh.point(v).z() > base_z) return false;
+    return true;
+}
+
+
+/**
+ * @brief Collapses all the vertices above the base of the roof to their center (pyramid roofs).
+ *
+ * @param mesh The skeleton mesh (modified in-place, faces may become degenerate).
+ */
+void collapse_top_vertices(Mesh& mesh) {
+    double min_z = std::numeric_limits<double>::max();
+    for (auto v : mesh.vertices())
+        min_z = std::min(min_z, mesh.point(v).z());
+
+    double cx = 0, cy = 0, cz = 0;
+    std::size_t count = 0;
+    for (auto v : mesh.vertices()) {
+        const Point3& p = mesh.point(v);
+        if (p.z() > min_z) {
+            cx += p.x(); cy += p.y(); cz += p.z();
+            ++count;
+        }
+    }
+    if (count == 0) return;
+
+    Point3 center(cx / count, cy / count, cz / count);
+    for (auto v : mesh.vertices())
+        if (mesh.point(v).z() > min_z)
+            mesh.point(v) = center;
+}
+
+
+/**
+ * @brief Turns the hipped ends of the roof into vertical gables (gabled-L roofs).
+ *
+ * For each triangular roof face, the highest vertex is moved along the ridge edge
+ * leaving it until it lies on the vertical plane through the two lower vertices.
+ *
+ * @param mesh The skeleton mesh (modified in-place).
+ */
+void align_top_vertices_to_planes(Mesh& mesh) {
+    for (auto f : mesh.faces()) {
+        if (face_normal(mesh, f).z() <= 0) continue;
+
+        std::vector<Mesh::Vertex_index> verts;
+        for (auto v : CGAL::vertices_around_face(mesh.halfedge(f), mesh))
+            verts.push_back(v);
+        if (verts.size() != 3) continue;
+
+        std::sort(verts.begin(), verts.end(), [&](Mesh::Vertex_index a, Mesh::Vertex_index b) {
+            return mesh.point(a).z() > mesh.point(b).z();
+        });
+        const Point3 top = mesh.point(verts[0]);
+        const Point3 base1 = mesh.point(verts[1]);
+        const Point3 base2 = mesh.point(verts[2]);
+
+        // Vertical plane through the two lower vertices
+        Vector3 base_dir(base2.x() - base1.x(), base2.y() - base1.y(), 0.0);
+        Vector3 normal(base_dir.y(), -base_dir.x(), 0.0);
+        if (normal.squared_length() == 0) continue;
+
+        // Ridge edge: the highest neighbour outside the face
+        bool found = false;
+        Point3 other;
+        for (auto n : CGAL::vertices_around_target(mesh.halfedge(verts[0]), mesh)) {
+            if (n == verts[1] || n == verts[2]) continue;
+            if (!found || mesh.point(n).z() > other.z()) {
+                other = mesh.point(n);
+                found = true;
+            }
+        }
+        if (!found) continue;
+
+        Vector3 dir = other - top;
+        double denom = normal * dir;
+        if (std::abs(denom) < 1e-12) continue;
+
+        double t = (normal * (base1 - top)) / denom;
+        mesh.point(verts[0]) = top + t * dir;
+    }
+}
+
+
+/**
+ * @brief Assembles the closed LOD2 building: bottom, walls and roof as a polygon soup.
+ *
+ * The roof (upward faces of the skeleton) is lifted on top of walls extruded from
+ * the footprint rings, and the skeleton bottom is moved to the ground. Vertices with
+ * identical coordinates are shared, so the result is a closed mesh.
+ *
+ * @param skeleton The roof mesh produced by the straight skeleton (base at z = 0).
+ * @param exterior Points of the exterior ring.
+ * @param holes Points of each hole.
+ * @param ground_z Height of the ground.
+ * @param height Total height of the building (walls + roof).
+ * @param points Output vertices.
+ * @param polygons Output faces.
+ *
+ * @return The height of the walls.
+ */
+double assemble_lod2(const Mesh& skeleton,
+                     const std::vector<Point2>& exterior,
+                     const std::vector<std::vector<Point2>>& holes,
+                     double ground_z, double height,
+                     std::vector<Point3>& points, std::vector<Face>& polygons)
+{
+    std::map<std::tuple<double, double, double>, std::size_t> index_of;
+    auto vertex_id = [&](double x, double y, double z) {
+        auto key = std::make_tuple(x, y, z);
+        auto it = index_of.find(key);
+        if (it != index_of.end()) return it->second;
+        points.emplace_back(x, y, z);
+        index_of[key] = points.size() - 1;
+        return points.size() - 1;
+    };
+    auto add_face = [&](Face face) {
+        // Drop repeated vertices (collapsed pyramid tops) and degenerate faces
+        Face clean;
+        for (std::size_t id : face)
+            if (clean.empty() || clean.back() != id) clean.push_back(id);
+        while (clean.size() > 1 && clean.front() == clean.back()) clean.pop_back();
+        if (clean.size() >= 3) polygons.push_back(clean);
+    };
+
+    double roof_min = std::numeric_limits<double>::max();
+    double roof_max = std::numeric_limits<double>::lowest();
+    for (auto v : skeleton.vertices()) {
+        roof_min = std::min(roof_min, skeleton.point(v).z());
+        roof_max = std::max(roof_max, skeleton.point(v).z());
+    }
+
+    double wall_height = height - (roof_max - roof_min);
+    if (wall_height < 0) wall_height = 1.0;
+    double wall_top = ground_z + wall_height;
+
+    // Roof on top of the walls, bottom on the ground
+    for (auto f : skeleton.faces()) {
+        bool bottom = is_bottom_face(skeleton, f, roof_min);
+        Face face;
+        for (auto v : CGAL::vertices_around_face(skeleton.halfedge(f), skeleton)) {
+            const Point3& p = skeleton.point(v);
+            face.push_back(bottom ? vertex_id(p.x(), p.y(), ground_z)
+                                  : vertex_id(p.x(), p.y(), wall_top + p.z() - roof_min));
+        }
+        add_face(face);
+    }
+
+    // Walls, outward oriented for both the exterior (CCW) and the holes (CW)
+    std::vector<const std::vector<Point2>*> rings = { &exterior };
+    for (const auto& hole : holes) rings.push_back(&hole);
+
+    for (const auto* ring : rings) {
+        for (size_t i = 0; i < ring->size(); ++i) {
+            const Point2& a = (*ring)[i];
+            const Point2& b = (*ring)[(i + 1) % ring->size()];
+            add_face({ vertex_id(a.x(), a.y(), ground_z), vertex_id(b.x(), b.y(), ground_z),
+                       vertex_id(b.x(), b.y(), wall_top), vertex_id(a.x(), a.y(), wall_top) });
+        }
+    }
+
+    return wall_height;
+}
+
+
+/**
+ * @brief Native LOD2 mode: writes the complete closed building instead of the roof only.
+ *
+ * Use: extrude_skeleton --lod2 <input.txt> <output.ply> <max_height> <ground_z> <height> <roof>
+ * where roof is one of hip, pyramid, gabled-L. The wall height is printed on stdout.
+ */
+int run_lod2(int argc, char** argv) {
+    if (argc < 8) {
+        std::cerr << "Use: " << argv[0] << " --lod2 <input.txt> <output.ply> <max_height> <ground_z> <height> <hip|pyramid|gabled-L>" << std::endl;
+        return EXIT_FAILURE;
+    }
+
+    const char* input_path = argv[2];
+    const char* output_path = argv[3];
+    double max_height = std::atof(argv[4]);
+    double ground_z = std::atof(argv[5]);
+    double height = std::atof(argv[6]);
+    std::string roof = argv[7];
+
+    std::vector<Point2> exterior;
+    std::vector<std::vector<Point2>> holes;
+    if (!read_polygon_data(input_path, exterior, holes)) {
+        std::cerr << "Error loading polygons." << std::endl;
+        return EXIT_FAILURE;
+    }
+
+    Mesh sm;
+    if (!CGAL::extrude_skeleton(make_polygon(exterior, holes), sm, CGAL::parameters::maximum_height(max_height))) {
+        std::cerr << "Error computing the skeleton." << std::endl;
+        return EXIT_FAILURE;
+    }
+    scale_mesh(sm, 1.0, 1.0, 0.5);
+
+    if (roof == "pyramid")
+        collapse_top_vertices(sm);
+    else if (roof == "gabled-L")
+        align_top_vertices_to_planes(sm);
+
+    std::vector<Point3> points;
+    std::vector<Face> polygons;
+    double wall_height = assemble_lod2(sm, exterior, holes, ground_z, height, points, polygons);
+
+    if (!CGAL::IO::write_polygon_soup(output_path, points, polygons, CGAL::parameters::stream_precision(17))) {
+        std::cerr << "Error writing: " << output_path << std::endl;
+        return EXIT_FAILURE;
+    }
+
+    std::cout << "WALL_HEIGHT " << wall_height << std::endl;
+    return 0;
+}
+
+
 // --- esempio di uso ---
 int main(int argc, char** argv) {
+    if (argc > 1 && std::strcmp(argv[1], "--lod2") == 0)
+        return run_lod2(argc, argv);
+
     if (argc < 4) {
         std::cerr << "Use: " << argv[0] << " <input.txt> <output.ply> <max_height>" << std::endl;
         return EXIT_FAILURE;
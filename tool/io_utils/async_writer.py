@@ -0,0 +1,89 @@
+import atexit
+import queue
+import threading
+import traceback
+
+
+_STOP = object()
+
+
+class AsyncWriter:
+    """
+    Writes meshes in background threads while Blender keeps modeling.
+
+    Jobs are fed through a bounded queue: when all the threads are busy and the
+    queue is full, submit() blocks until a slot is free (backpressure), so the
+    number of meshes kept in memory stays bounded.
+    """
+
+    def __init__(self, num_threads=2, max_queue_size=8):
+        """
+        Args:
+            num_threads (int): Number of writer threads.
+            max_queue_size (int): Maximum number of pending jobs before submit() blocks.
+        """
+        self._queue = queue.Queue(maxsize=max(1, max_queue_size))
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.written = 0
+        self.failures = []  # list of (index, error)
+
+        self._threads = []
+        for n in range(max(1, num_threads)):
+            thread = threading.Thread(target=self._worker, name=f"mesh-writer-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        # Pending jobs are flushed even if the script exits without calling close()
+        atexit.register(self.close)
+
+    def submit(self, idx, write_fn, *args, **kwargs):
+        """
+        Queues a write job. Blocks while the queue is full.
+
+        Args:
+            idx (int): Index of the building, used to report failures.
+            write_fn (callable): Function performing serialization and writing.
+            *args, **kwargs: Arguments passed to write_fn.
+        """
+        if self._closed:
+            raise RuntimeError("AsyncWriter is closed.")
+        self._queue.put((idx, write_fn, args, kwargs))
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is _STOP:
+                    return
+
+                idx, write_fn, args, kwargs = job
+                try:
+                    write_fn(*args, **kwargs)
+                    with self._lock:
+                        self.written += 1
+                except Exception as e:
+                    traceback.print_exc()
+                    with self._lock:
+                        self.failures.append((idx, f"{type(e).__name__}: {e}"))
+            finally:
+                self._queue.task_done()
+
+    def close(self):
+        """
+        Waits for all queued jobs to be written and stops the threads.
+
+        Returns:
+            list: Failures as (index, error) tuples.
+        """
+        if self._closed:
+            return self.failures
+
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+        return self.failures
@@ -0,0 +1,104 @@
+import time
+
+
+# Quality level a building ended with, from the best to the coarsest
+QUALITY_LEVELS = ('full', 'unrounded', 'fallback', 'lod1')
+
+# Deadline (time.time()) of the roof being built, checked before the skeleton and boolean steps
+DEADLINE = {'at': None}
+
+
+class DeadlineExceeded(RuntimeError):
+    """
+    Raised when the time budget of a building or of the run is exhausted before an
+    expensive step, so that the building gets the flat fallback.
+    """
+
+
+### function: set_deadline ###
+def set_deadline(at):
+    """
+    Sets the deadline of the current roof (None removes it).
+    """
+    DEADLINE['at'] = at
+
+
+### function: remaining_seconds ###
+def remaining_seconds():
+    """
+    Returns:
+        float | None: Seconds left before the deadline, None without deadline.
+    """
+    if DEADLINE['at'] is None:
+        return None
+    return DEADLINE['at'] - time.time()
+
+
+### function: check_deadline ###
+def check_deadline(step):
+    """
+    Raises DeadlineExceeded if the deadline passed before starting a step.
+    """
+    remaining = remaining_seconds()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded(f"time budget exhausted before {step}")
+
+
+class TimeBudget:
+    """
+    Time budget of a run: a deadline for the whole run and a maximum time per
+    building. The share of a building is what is left of the run divided by the
+    buildings left (capped by the per-building budget); the predicted cost of an
+    expensive option is compared against it.
+
+    Args:
+        run_seconds (float): Budget of the run (0: none).
+        building_seconds (float): Budget of a building (0: none).
+        cost_model (CostModel): Predicts the time of a building.
+        deadline (float, optional): Deadline of the run (time.time()) kept over recycled workers.
+        buildings (int): Buildings of the run modeled by this worker, fast path included.
+    """
+
+    def __init__(self, run_seconds=0.0, building_seconds=0.0, cost_model=None, deadline=None, buildings=0):
+        if deadline is None and run_seconds:
+            deadline = time.time() + run_seconds
+        self.deadline = deadline
+        self.buildings = buildings
+        self.building_seconds = building_seconds
+        self.cost_model = cost_model
+        self.share = None
+        self.building_deadline = None
+
+    def expired(self):
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def start_building(self, remaining_buildings):
+        """
+        Computes the share and the deadline of the next building.
+
+        Args:
+            remaining_buildings (int): Buildings left to this worker, the next one included.
+
+        Returns:
+            float | None: Deadline of the building (time.time()), None without budget.
+        """
+        now = time.time()
+        shares, ends = [], []
+        if self.building_seconds:
+            shares.append(self.building_seconds)
+            ends.append(now + self.building_seconds)
+        if self.deadline is not None:
+            shares.append(max(self.deadline - now, 0.0) / max(remaining_buildings, 1))
+            ends.append(self.deadline)
+
+        self.share = min(shares) if shares else None
+        self.building_deadline = min(ends) if ends else None
+        return self.building_deadline
+
+    def over_share(self, roof, vertices, holes, round_edges):
+        """
+        Whether the predicted time of a building exceeds its share.
+        """
+        if self.share is None or self.cost_model is None:
+            return False
+        return self.cost_model.predict(roof, vertices, holes, round_edges) > self.share
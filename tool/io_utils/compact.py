@@ -0,0 +1,278 @@
+import gzip
+import json
+import struct
+import numpy as np
+
+
+COMPRESSION_SUFFIX = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+
+### function: _part1by2 ###
+def _part1by2(n):
+    # Spreads the lower 21 bits of n so that there are two zero bits between each bit
+    n = n & 0x1fffff
+    n = (n | (n << 32)) & 0x1f00000000ffff
+    n = (n | (n << 16)) & 0x1f0000ff0000ff
+    n = (n | (n << 8)) & 0x100f00f00f00f00f
+    n = (n | (n << 4)) & 0x10c30c30c30c30c3
+    n = (n | (n << 2)) & 0x1249249249249249
+    return n
+
+
+### function: morton_codes_3d ###
+def morton_codes_3d(points):
+    """
+    Computes 3D Morton (Z-order) codes of a set of points, normalized to their bounding box.
+
+    Args:
+        points (np.ndarray): (N, 3) array.
+
+    Returns:
+        np.ndarray: (N,) uint64 codes.
+    """
+    mins = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - mins, 1e-12)
+    cells = ((points - mins) / extent * (2 ** 21 - 1)).astype(np.uint64)
+    return _part1by2(cells[:, 0]) | (_part1by2(cells[:, 1]) << np.uint64(1)) | (_part1by2(cells[:, 2]) << np.uint64(2))
+
+
+### function: quantize_mesh ###
+def quantize_mesh(vertices, faces, precision=0.001):
+    """
+    Quantizes the vertices on a grid of the given precision, merges the vertices
+    falling on the same grid point, drops the degenerate triangles and reorders
+    the mesh for cache locality (triangles sorted along a Z-order curve,
+    vertices numbered by first use).
+
+    Args:
+        vertices (np.ndarray): (N, 3) vertices relative to the stored offset.
+        faces (np.ndarray): (M, 3) triangle indices.
+        precision (float): Size of the quantization grid.
+
+    Returns:
+        tuple: ((K, 3) int64 quantized vertices, (L, 3) int64 triangle indices).
+    """
+    quantized = np.rint(np.asarray(vertices, dtype=np.float64) / precision).astype(np.int64)
+    unique, inverse = np.unique(quantized, axis=0, return_inverse=True)
+    faces = inverse.reshape(-1)[np.asarray(faces, dtype=np.int64)]
+
+    # Triangles collapsed by the quantization
+    degenerate = (faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | (faces[:, 0] == faces[:, 2])
+    faces = faces[~degenerate]
+    if len(faces) == 0:
+        return unique[:0], faces
+
+    # Spatially coherent triangle order
+    centroids = unique[faces].mean(axis=1)
+    faces = faces[np.argsort(morton_codes_3d(centroids), kind='stable')]
+
+    # Vertices numbered in order of first use
+    first_use, order = np.unique(faces.reshape(-1), return_index=True)
+    used_in_order = first_use[np.argsort(order)]
+    remap = np.full(len(unique), -1, dtype=np.int64)
+    remap[used_in_order] = np.arange(len(used_in_order))
+
+    return unique[used_in_order], remap[faces]
+
+
+### function: encode_compact_ply ###
+def encode_compact_ply(vertices, faces, offset, precision=0.001, quantization='int32'):
+    """
+    Encodes a mesh as a compact binary PLY. Coordinates are stored relative to a
+    double-precision offset written in the header, either as int32 grid indices
+    (world = offset + value * scale) or as float32 values.
+
+    Args:
+        vertices (np.ndarray): (N, 3) vertices relative to the offset.
+        faces (np.ndarray): (M, 3) triangle indices.
+        offset (tuple): (x, y, z) double-precision offset.
+        precision (float): Quantization step.
+        quantization (str): 'int32' or 'float32'.
+
+    Returns:
+        bytes: The PLY file content.
+    """
+    q_vertices, q_faces = quantize_mesh(vertices, faces, precision)
+
+    if quantization == 'int32':
+        vertex_data = q_vertices.astype('<i4')
+        vertex_type, scale = 'int', precision
+    else:
+        vertex_data = (q_vertices * precision).astype('<f4')
+        vertex_type, scale = 'float', 1.0
+
+    header = "\n".join([
+        "ply",
+        "format binary_little_endian 1.0",
+        f"comment offset {offset[0]!r} {offset[1]!r} {offset[2]!r}",
+        f"comment scale {scale!r}",
+        f"element vertex {len(vertex_data)}",
+        f"property {vertex_type} x",
+        f"property {vertex_type} y",
+        f"property {vertex_type} z",
+        f"element face {len(q_faces)}",
+        "property list uchar int vertex_indices",
+        "end_header",
+    ]) + "\n"
+
+    face_data = np.empty(len(q_faces), dtype=[('n', 'u1'), ('v', '<i4', (3,))])
+    face_data['n'] = 3
+    face_data['v'] = q_faces
+
+    return header.encode('ascii') + vertex_data.tobytes() + face_data.tobytes()
+
+
+### function: decode_compact_ply ###
+def decode_compact_ply(data):
+    """
+    Decodes a PLY written by encode_compact_ply.
+
+    Args:
+        data (bytes): The PLY file content.
+
+    Returns:
+        tuple: ((N, 3) float64 world vertices, (M, 3) int64 triangles).
+    """
+    end = data.index(b"end_header\n") + len(b"end_header\n")
+    offset, scale, counts, vertex_type = (0.0, 0.0, 0.0), 1.0, {}, 'float'
+    for line in data[:end].decode('ascii').splitlines():
+        parts = line.split()
+        if parts[:2] == ['comment', 'offset']:
+            offset = tuple(float(v) for v in parts[2:5])
+        elif parts[:2] == ['comment', 'scale']:
+            scale = float(parts[2])
+        elif parts[0] == 'element':
+            counts[parts[1]] = int(parts[2])
+        elif parts[0] == 'property' and parts[-1] == 'x':
+            vertex_type = parts[1]
+
+    n_vertices, n_faces = counts['vertex'], counts['face']
+    vertex_data = np.frombuffer(data, dtype='<i4' if vertex_type == 'int' else '<f4', count=n_vertices * 3, offset=end)
+    vertices = vertex_data.reshape(-1, 3).astype(np.float64) * scale + np.asarray(offset)
+
+    face_data = np.frombuffer(data, dtype=[('n', 'u1'), ('v', '<i4', (3,))], count=n_faces, offset=end + vertex_data.nbytes)
+    return vertices, face_data['v'].astype(np.int64)
+
+
+### function: _pad4 ###
+def _pad4(data, pad_byte=b'\x00'):
+    return data + pad_byte * (-len(data) % 4)
+
+
+### function: pack_glb ###
+def pack_glb(gltf, binary):
+    """
+    Packs a glTF JSON document and its binary buffer into a GLB container.
+
+    Args:
+        gltf (dict): The glTF JSON document (buffers[0] refers to the binary chunk).
+        binary (bytes): Content of the binary chunk.
+
+    Returns:
+        bytes: The GLB file content.
+    """
+    json_chunk = _pad4(json.dumps(gltf, separators=(',', ':')).encode('utf-8'), b' ')
+    bin_chunk = _pad4(binary)
+
+    total_length = 12 + 8 + len(json_chunk) + 8 + len(bin_chunk)
+    return b''.join([
+        struct.pack('<III', 0x46546C67, 2, total_length),
+        struct.pack('<II', len(json_chunk), 0x4E4F534A), json_chunk,
+        struct.pack('<II', len(bin_chunk), 0x004E4942), bin_chunk,
+    ])
+
+
+### function: encode_glb ###
+def encode_glb(vertices, faces, offset, precision=0.001):
+    """
+    Encodes a mesh as GLB. Positions are float32 relative to the offset, which is
+    stored (in double precision) as the translation of the node. Coordinates are
+    converted from Z-up to the glTF Y-up convention.
+
+    Args:
+        vertices (np.ndarray): (N, 3) vertices relative to the offset.
+        faces (np.ndarray): (M, 3) triangle indices.
+        offset (tuple): (x, y, z) double-precision offset.
+        precision (float): Quantization step used to merge vertices.
+
+    Returns:
+        bytes: The GLB file content.
+    """
+    q_vertices, q_faces = quantize_mesh(vertices, faces, precision)
+
+    zup = q_vertices * precision
+    positions = np.column_stack([zup[:, 0], zup[:, 2], -zup[:, 1]]).astype('<f4')
+    indices = q_faces.astype('<u4').reshape(-1)
+
+    positions_bytes = _pad4(positions.tobytes())
+    indices_bytes = indices.tobytes()
+
+    gltf = {
+        'asset': {'version': '2.0', 'generator': '3dom-lod2-generator'},
+        'scene': 0,
+        'scenes': [{'nodes': [0]}],
+        'nodes': [{'mesh': 0, 'translation': [float(offset[0]), float(offset[2]), -float(offset[1])]}],
+        'meshes': [{'primitives': [{'attributes': {'POSITION': 0}, 'indices': 1, 'mode': 4}]}],
+        'buffers': [{'byteLength': len(positions_bytes) + len(indices_bytes)}],
+        'bufferViews': [
+            {'buffer': 0, 'byteOffset': 0, 'byteLength': len(positions_bytes), 'target': 34962},
+            {'buffer': 0, 'byteOffset': len(positions_bytes), 'byteLength': len(indices_bytes), 'target': 34963},
+        ],
+        'accessors': [
+            {'bufferView': 0, 'componentType': 5126, 'count': len(positions), 'type': 'VEC3',
+             'min': positions.min(axis=0).tolist() if len(positions) else [0, 0, 0],
+             'max': positions.max(axis=0).tolist() if len(positions) else [0, 0, 0]},
+            {'bufferView': 1, 'componentType': 5125, 'count': len(indices), 'type': 'SCALAR'},
+        ],
+    }
+
+    return pack_glb(gltf, positions_bytes + indices_bytes)
+
+
+### function: compress_bytes ###
+def compress_bytes(data, compression='none'):
+    """
+    Compresses a byte string with gzip or zstd (requires the 'zstandard' package).
+    """
+    if compression == 'gzip':
+        return gzip.compress(data, compresslevel=6)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd compression requires the 'zstandard' package.") from e
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return data
+
+
+### function: write_compact_mesh ###
+def write_compact_mesh(output_path, vertices, faces, x_offset, y_offset, export_format='ply_compact',
+                       precision=0.001, quantization='int32', compression='none'):
+    """
+    Serializes a mesh in a compact format (quantized binary PLY or GLB) and writes it,
+    optionally compressed. The vertices are kept relative to the tile origin
+    (x_offset, y_offset, 0), which is stored in the file.
+
+    Args:
+        output_path (str): Path of the output file (without compression suffix).
+        vertices (np.ndarray): (N, 3) vertices relative to the tile origin.
+        faces (np.ndarray): (M, 3) triangle indices.
+        x_offset (float): X of the tile origin.
+        y_offset (float): Y of the tile origin.
+        export_format (str): 'ply_compact' or 'glb'.
+        precision (float): Quantization step.
+        quantization (str): 'int32' or 'float32' (PLY only).
+        compression (str): 'none', 'gzip' or 'zstd'.
+    """
+    offset = (float(x_offset), float(y_offset), 0.0)
+
+    if export_format == 'glb':
+        data = encode_glb(vertices, faces, offset, precision)
+    else:
+        data = encode_compact_ply(vertices, faces, offset, precision, quantization)
+
+    output_path += COMPRESSION_SUFFIX[compression]
+    with open(output_path, 'wb') as f:
+        f.write(compress_bytes(data, compression))
+
+    print(f"Compact mesh saved to: {output_path}")
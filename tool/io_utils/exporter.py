@@ -2,7 +2,6 @@ import bpy
 import bmesh
 import os
 import sys
-import trimesh
 import numpy as np
 
 
@@ -79,6 +78,8 @@ def apply_global_shift(input_path: str, output_path: str, x_offset: float, y_off
     if not os.path.exists(input_path):
         raise FileNotFoundError(f"Input file does not exist: {input_path}")
 
+    import trimesh
+
     mesh = trimesh.load(input_path, force='mesh')
 
     if not isinstance(mesh, trimesh.Trimesh):
@@ -88,4 +89,29 @@ def apply_global_shift(input_path: str, output_path: str, x_offset: float, y_off
     mesh.apply_translation(shift_vector)
 
     mesh.export(output_path)
-    print(f"Shifted mesh saved to: {output_path}")
\ No newline at end of file
+    print(f"Shifted mesh saved to: {output_path}")
+
+
+### function: write_shifted_mesh ###
+def write_shifted_mesh(output_path: str, vertices: np.ndarray, faces: np.ndarray, x_offset: float, y_offset: float) -> None:
+    """
+    Applies a global translation to mesh arrays and saves the result. Unlike
+    apply_global_shift, it does not need an intermediate file nor Blender,
+    so it can run in a background thread.
+
+    Args:
+        output_path (str): Path to the output file (.ply, .obj, etc.).
+        vertices (np.ndarray): (N, 3) array of vertex coordinates.
+        faces (np.ndarray): (M, 3) array of triangle vertex indices.
+        x_offset (float): Translation along the X axis.
+        y_offset (float): Translation along the Y axis.
+    """
+    import trimesh
+
+    mesh = trimesh.Trimesh(vertices=np.asarray(vertices, dtype=np.float64), faces=faces, process=True)
+
+    shift_vector = np.array([x_offset, y_offset, 0.0])
+    mesh.apply_translation(shift_vector)
+
+    mesh.export(output_path)
+    print(f"Shifted mesh saved to: {output_path}")
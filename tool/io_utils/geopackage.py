@@ -0,0 +1,390 @@
+import os
+import struct
+import sqlite3
+import threading
+import numpy as np
+
+from io_utils.compact import encode_compact_ply, decode_compact_ply, compress_bytes
+
+
+GPKG_APPLICATION_ID = 0x47504B47  # 'GPKG'
+GPKG_USER_VERSION = 10400  # GeoPackage 1.4
+
+WGS84_WKT = ('GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,AUTHORITY["EPSG","7030"]],'
+             'AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,AUTHORITY["EPSG","8901"]],'
+             'UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","4326"]]')
+
+# srs_id of a CRS read from a .prj without EPSG code
+CUSTOM_SRS_ID = 100000
+
+CORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS gpkg_spatial_ref_sys (
+    srs_name TEXT NOT NULL,
+    srs_id INTEGER PRIMARY KEY,
+    organization TEXT NOT NULL,
+    organization_coordsys_id INTEGER NOT NULL,
+    definition TEXT NOT NULL,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS gpkg_contents (
+    table_name TEXT NOT NULL PRIMARY KEY,
+    data_type TEXT NOT NULL,
+    identifier TEXT UNIQUE,
+    description TEXT DEFAULT '',
+    last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+    min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE,
+    srs_id INTEGER,
+    CONSTRAINT fk_gc_r_srs_id FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys(srs_id)
+);
+CREATE TABLE IF NOT EXISTS gpkg_geometry_columns (
+    table_name TEXT NOT NULL,
+    column_name TEXT NOT NULL,
+    geometry_type_name TEXT NOT NULL,
+    srs_id INTEGER NOT NULL,
+    z TINYINT NOT NULL,
+    m TINYINT NOT NULL,
+    CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name),
+    CONSTRAINT fk_gc_tn FOREIGN KEY (table_name) REFERENCES gpkg_contents(table_name),
+    CONSTRAINT fk_gc_srs FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys (srs_id)
+);
+CREATE TABLE IF NOT EXISTS gpkg_extensions (
+    table_name TEXT,
+    column_name TEXT,
+    extension_name TEXT NOT NULL,
+    definition TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    CONSTRAINT ge_tce UNIQUE (table_name, column_name, extension_name)
+);
+"""
+
+BUILDINGS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS "{t}" (
+    fid INTEGER PRIMARY KEY AUTOINCREMENT,
+    geom POLYGON,
+    building_index INTEGER UNIQUE NOT NULL,
+    roof TEXT,
+    fallback BOOLEAN NOT NULL,
+    z_min DOUBLE,
+    z_max DOUBLE,
+    height DOUBLE,
+    mesh_encoding TEXT NOT NULL,
+    mesh BLOB NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS "rtree_{t}_geom" USING rtree(id, minx, maxx, miny, maxy);
+"""
+
+# Triggers of the GeoPackage R-tree extension (they call the ST_* functions registered below)
+RTREE_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS "rtree_{t}_geom_insert" AFTER INSERT ON "{t}"
+WHEN (new.geom NOT NULL AND NOT ST_IsEmpty(NEW.geom))
+BEGIN
+  INSERT OR REPLACE INTO "rtree_{t}_geom" VALUES (NEW.fid, ST_MinX(NEW.geom), ST_MaxX(NEW.geom), ST_MinY(NEW.geom), ST_MaxY(NEW.geom));
+END;
+CREATE TRIGGER IF NOT EXISTS "rtree_{t}_geom_update1" AFTER UPDATE OF geom ON "{t}"
+WHEN OLD.fid = NEW.fid AND (NEW.geom NOTNULL AND NOT ST_IsEmpty(NEW.geom))
+BEGIN
+  INSERT OR REPLACE INTO "rtree_{t}_geom" VALUES (NEW.fid, ST_MinX(NEW.geom), ST_MaxX(NEW.geom), ST_MinY(NEW.geom), ST_MaxY(NEW.geom));
+END;
+CREATE TRIGGER IF NOT EXISTS "rtree_{t}_geom_update2" AFTER UPDATE OF geom ON "{t}"
+WHEN OLD.fid = NEW.fid AND (NEW.geom IS NULL OR ST_IsEmpty(NEW.geom))
+BEGIN
+  DELETE FROM "rtree_{t}_geom" WHERE id = OLD.fid;
+END;
+CREATE TRIGGER IF NOT EXISTS "rtree_{t}_geom_update3" AFTER UPDATE ON "{t}"
+WHEN OLD.fid != NEW.fid AND (NEW.geom NOTNULL AND NOT ST_IsEmpty(NEW.geom))
+BEGIN
+  DELETE FROM "rtree_{t}_geom" WHERE id = OLD.fid;
+  INSERT OR REPLACE INTO "rtree_{t}_geom" VALUES (NEW.fid, ST_MinX(NEW.geom), ST_MaxX(NEW.geom), ST_MinY(NEW.geom), ST_MaxY(NEW.geom));
+END;
+CREATE TRIGGER IF NOT EXISTS "rtree_{t}_geom_update4" AFTER UPDATE ON "{t}"
+WHEN OLD.fid != NEW.fid AND (NEW.geom IS NULL OR ST_IsEmpty(NEW.geom))
+BEGIN
+  DELETE FROM "rtree_{t}_geom" WHERE id IN (OLD.fid, NEW.fid);
+END;
+CREATE TRIGGER IF NOT EXISTS "rtree_{t}_geom_delete" AFTER DELETE ON "{t}"
+WHEN old.geom NOT NULL
+BEGIN
+  DELETE FROM "rtree_{t}_geom" WHERE id = OLD.fid;
+END;
+"""
+
+
+### function: _envelope ###
+def _envelope(blob):
+    """
+    Reads the envelope (minx, maxx, miny, maxy) of a GeoPackage geometry blob,
+    None if the blob is empty or has no envelope.
+    """
+    if blob is None or len(blob) < 8 or blob[:2] != b'GP':
+        return None
+    flags = blob[3]
+    if flags & 0x10 or (flags >> 1) & 0x07 == 0:
+        return None
+    return struct.unpack('<4d' if flags & 0x01 else '>4d', blob[8:40])
+
+
+### function: register_st_functions ###
+def register_st_functions(conn):
+    """
+    Registers the ST_* functions called by the R-tree triggers. Only geometries
+    with an envelope (as written by encode_polygon) are supported.
+    """
+    conn.create_function("ST_IsEmpty", 1, lambda blob: int(_envelope(blob) is None), deterministic=True)
+    for i, name in enumerate(("ST_MinX", "ST_MaxX", "ST_MinY", "ST_MaxY")):
+        conn.create_function(name, 1, lambda blob, i=i: (_envelope(blob) or (None,) * 4)[i], deterministic=True)
+
+
+### function: encode_polygon ###
+def encode_polygon(rings, srs_id):
+    """
+    Encodes a polygon as a GeoPackage geometry blob: header with the XY envelope,
+    followed by little-endian WKB.
+
+    Args:
+        rings (list of np.ndarray): Exterior ring then holes, (N, 2) world coordinates.
+        srs_id (int): Spatial reference of the geometry.
+
+    Returns:
+        bytes: The geometry blob.
+    """
+    closed = []
+    for ring in rings:
+        ring = np.asarray(ring, dtype='<f8')[:, :2]
+        if not np.array_equal(ring[0], ring[-1]):
+            ring = np.vstack([ring, ring[:1]])
+        closed.append(ring)
+
+    points = np.concatenate(closed)
+    (minx, miny), (maxx, maxy) = points.min(axis=0), points.max(axis=0)
+
+    header = b'GP' + bytes([0, 0x03]) + struct.pack('<i4d', srs_id, minx, maxx, miny, maxy)
+    wkb = [struct.pack('<BII', 1, 3, len(closed))]
+    for ring in closed:
+        wkb.append(struct.pack('<I', len(ring)))
+        wkb.append(np.ascontiguousarray(ring).tobytes())
+
+    return header + b''.join(wkb)
+
+
+### function: srs_from_prj ###
+def srs_from_prj(shapefile_path, srs_id=None):
+    """
+    Describes the spatial reference of a shapefile from its .prj file.
+
+    Args:
+        shapefile_path (str): Path to the .shp file.
+        srs_id (int, optional): EPSG code forced by the user.
+
+    Returns:
+        tuple: (srs_id, organization, definition). srs_id is -1 (undefined cartesian)
+        without .prj nor srs_id; the EPSG code is detected with pyproj when available.
+    """
+    prj_path = os.path.splitext(shapefile_path)[0] + ".prj"
+    wkt = None
+    if os.path.isfile(prj_path):
+        with open(prj_path) as f:
+            wkt = f.read().strip()
+
+    if srs_id is None and wkt:
+        try:
+            from pyproj import CRS
+            srs_id = CRS.from_wkt(wkt).to_epsg()
+        except Exception:
+            srs_id = None
+        if srs_id is None:
+            return CUSTOM_SRS_ID, 'NONE', wkt
+
+    if srs_id is None:
+        return -1, 'NONE', 'undefined'
+    return srs_id, 'EPSG', wkt or 'undefined'
+
+
+class GeoPackageStore:
+    """
+    Writes the generated buildings into a GeoPackage feature table: footprint polygon,
+    attributes (roof type, fallback flag, z_min, z_max, height) and the mesh as a
+    quantized binary PLY blob, optionally compressed.
+
+    The footprints are indexed by the GeoPackage R-tree extension, so that the buildings
+    of a bounding box are fetched without scanning the table. Rows are buffered and
+    inserted in batches, one transaction per batch. add_building can be called from the
+    writer threads: encoding runs in parallel, inserts are serialized by a lock.
+
+    A building written again (same index, e.g. by a resumed worker) replaces the
+    previous row.
+
+    Args:
+        path (str): Path of the .gpkg file (created if needed, appended otherwise).
+        srs (tuple): (srs_id, organization, definition), see srs_from_prj.
+        table (str): Name of the feature table.
+        batch_size (int): Number of buildings per insert transaction.
+        precision (float): Quantization step of the mesh coordinates.
+        quantization (str): 'int32' or 'float32'.
+        compression (str): 'none', 'gzip' or 'zstd'.
+    """
+
+    def __init__(self, path, srs=(-1, 'NONE', 'undefined'), table="buildings", batch_size=1000,
+                 precision=0.001, quantization='int32', compression='none'):
+        self.path = path
+        self.srs_id = srs[0]
+        self.table = table
+        self.batch_size = batch_size
+        self.precision = precision
+        self.quantization = quantization
+        self.compression = compression
+        self.mesh_encoding = "ply_compact" + ("" if compression == 'none' else f"+{compression}")
+
+        self.pending = []
+        self.written = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        register_st_functions(self.conn)
+        # REPLACE has to fire the delete trigger, so that the R-tree does not keep stale entries
+        self.conn.execute("PRAGMA recursive_triggers = ON")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self._create_schema(srs)
+
+    def _create_schema(self, srs):
+        srs_id, organization, definition = srs
+        t = self.table
+
+        self.conn.execute("BEGIN")
+        self.conn.execute(f"PRAGMA application_id = {GPKG_APPLICATION_ID}")
+        self.conn.execute(f"PRAGMA user_version = {GPKG_USER_VERSION}")
+        for statement in (CORE_SCHEMA + BUILDINGS_SCHEMA.format(t=t)).split(";"):
+            if statement.strip():
+                self.conn.execute(statement)
+        for trigger in RTREE_TRIGGERS.format(t=t).split("END;"):
+            if trigger.strip():
+                self.conn.execute(trigger + "END;")
+
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)", [
+                ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", "undefined cartesian coordinate reference system"),
+                ("Undefined geographic SRS", 0, "NONE", 0, "undefined", "undefined geographic coordinate reference system"),
+                ("WGS 84 geodetic", 4326, "EPSG", 4326, WGS84_WKT, "longitude/latitude coordinates in decimal degrees on the WGS 84 spheroid"),
+                (f"{organization}:{srs_id}", srs_id, organization, srs_id, definition, None),
+            ])
+        self.conn.execute("INSERT OR IGNORE INTO gpkg_contents (table_name, data_type, identifier, srs_id) "
+                          "VALUES (?, 'features', ?, ?)", (t, t, srs_id))
+        self.conn.execute("INSERT OR IGNORE INTO gpkg_geometry_columns VALUES (?, 'geom', 'POLYGON', ?, 0, 0)", (t, srs_id))
+        self.conn.execute("INSERT OR IGNORE INTO gpkg_extensions VALUES (?, 'geom', 'gpkg_rtree_index', "
+                          "'http://www.geopackage.org/spec120/#extension_rtree', 'write-only')", (t,))
+        self.conn.execute("COMMIT")
+
+    def add_building(self, idx, vertices, faces, x_offset, y_offset, poly, fallback=False):
+        """
+        Encodes a building and queues it for the next batch insert.
+
+        Args:
+            idx (int): Global index of the building.
+            vertices (np.ndarray): (N, 3) mesh vertices relative to the tile origin.
+            faces (np.ndarray): (M, 3) triangle indices.
+            x_offset (float): X of the tile origin.
+            y_offset (float): Y of the tile origin.
+            poly (dict): Footprint ('exterior', 'holes', shifted) with 'roof', 'z_min', 'z_max' and 'height'.
+            fallback (bool): Whether the building is the flat fallback of a failed roof.
+        """
+        shift = np.array([x_offset, y_offset])
+        rings = [np.asarray(ring, dtype=np.float64)[:, :2] + shift for ring in [poly['exterior']] + list(poly['holes'])]
+        geom = encode_polygon(rings, self.srs_id)
+
+        ply = encode_compact_ply(vertices, faces, (float(x_offset), float(y_offset), 0.0), self.precision, self.quantization)
+        mesh = compress_bytes(ply, self.compression)
+
+        row = (geom, int(idx), poly.get('roof'), int(bool(fallback)),
+               _as_float(poly.get('z_min')), _as_float(poly.get('z_max')), _as_float(poly.get('height')),
+               self.mesh_encoding, mesh)
+
+        with self.lock:
+            self.pending.append(row)
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+
+        print(f"Building {idx} queued in: {self.path}")
+
+    def _flush(self):
+        if not self.pending:
+            return
+        self.conn.execute("BEGIN")
+        self.conn.executemany(
+            f'INSERT OR REPLACE INTO "{self.table}" (geom, building_index, roof, fallback, z_min, z_max, height, '
+            'mesh_encoding, mesh) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', self.pending)
+        self.conn.execute("COMMIT")
+        self.written += len(self.pending)
+        self.pending = []
+
+    def skip_building(self, idx):
+        """
+        Nothing to record: the table only holds the generated buildings.
+        """
+        pass
+
+    def close(self):
+        """
+        Inserts the remaining buildings and updates the extent of the table.
+        """
+        with self.lock:
+            self._flush()
+            t = self.table
+            self.conn.execute("BEGIN")
+            self.conn.execute(
+                f'UPDATE gpkg_contents SET last_change = strftime(\'%Y-%m-%dT%H:%M:%fZ\', \'now\'), '
+                f'(min_x, max_x, min_y, max_y) = (SELECT MIN(minx), MAX(maxx), MIN(miny), MAX(maxy) FROM "rtree_{t}_geom") '
+                'WHERE table_name = ?', (t,))
+            self.conn.execute("COMMIT")
+            self.conn.close()
+
+
+### function: _as_float ###
+def _as_float(value):
+    return None if value is None else float(value)
+
+
+### function: query_buildings ###
+def query_buildings(path, bbox, table="buildings", with_mesh=True):
+    """
+    Fetches the buildings whose footprint intersects a bounding box, through the R-tree.
+
+    Args:
+        path (str): Path of the .gpkg file.
+        bbox (tuple): (minx, miny, maxx, maxy).
+        table (str): Name of the feature table.
+        with_mesh (bool): Decode the meshes ('vertices' and 'faces' in world coordinates).
+
+    Returns:
+        list of dict: The attributes of the buildings (and their meshes).
+    """
+    minx, miny, maxx, maxy = bbox
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute(
+            f'SELECT b.building_index, b.roof, b.fallback, b.z_min, b.z_max, b.height, b.mesh_encoding, b.mesh '
+            f'FROM "{table}" b JOIN "rtree_{table}_geom" r ON b.fid = r.id '
+            'WHERE r.maxx >= ? AND r.minx <= ? AND r.maxy >= ? AND r.miny <= ?',
+            (minx, maxx, miny, maxy)).fetchall()
+    finally:
+        conn.close()
+
+    buildings = []
+    for index, roof, fallback, z_min, z_max, height, encoding, mesh in rows:
+        building = {'index': index, 'roof': roof, 'fallback': bool(fallback),
+                    'z_min': z_min, 'z_max': z_max, 'height': height}
+        if with_mesh:
+            building['vertices'], building['faces'] = decode_compact_ply(_decompress(mesh, encoding))
+        buildings.append(building)
+
+    return buildings
+
+
+### function: _decompress ###
+def _decompress(data, encoding):
+    if encoding.endswith("+gzip"):
+        import gzip
+        return gzip.decompress(data)
+    if encoding.endswith("+zstd"):
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
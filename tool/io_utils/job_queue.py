@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+
+
+JOB_STATUSES = ('pending', 'running', 'done', 'failed')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+### function: default_worker_id ###
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """
+    Job queue stored in a single SQLite file on shared storage, so that workers on
+    any node can claim jobs without an external broker.
+
+    A claimed job is leased to its worker until `lease_until`; the worker renews the
+    lease while it runs. Jobs whose lease expired (crashed worker, lost node) go back
+    to 'pending' at the next claim, until `max_attempts` is reached.
+
+    Every change is a short IMMEDIATE transaction in rollback-journal mode: WAL needs
+    shared memory and does not work over NFS, and the file locks of the NFS server
+    (NFSv4 or lockd on NFSv3) serialize the writers.
+
+    Args:
+        path (str): Path of the SQLite file.
+        lease_seconds (float): Duration of a lease.
+        max_attempts (int): Number of claims after which a job is marked as failed.
+        timeout (float): Seconds to wait for the database lock.
+    """
+
+    def __init__(self, path, lease_seconds=600.0, max_attempts=3, timeout=60.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.executescript(SCHEMA)
+
+    def _transaction(self):
+        return _Transaction(self.conn)
+
+    def close(self):
+        self.conn.close()
+
+    def add_jobs(self, jobs):
+        """
+        Adds jobs to the queue. Jobs already present (same name) are left untouched,
+        so that the coordinator can be run again safely.
+
+        Args:
+            jobs (list of tuple): (name, params) pairs, params being JSON serializable.
+
+        Returns:
+            int: Number of jobs added.
+        """
+        now = time.time()
+        with self._transaction() as cur:
+            before = cur.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+            cur.executemany(
+                "INSERT OR IGNORE INTO jobs (name, params, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                [(name, json.dumps(params), now, now) for name, params in jobs])
+            after = cur.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        return after - before
+
+    def _requeue_expired(self, cur, now):
+        cur.execute("UPDATE jobs SET status = 'failed', worker = NULL, error = 'lease expired', updated_at = ? "
+                    "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                    (now, now, self.max_attempts))
+        cur.execute("UPDATE jobs SET status = 'pending', worker = NULL, updated_at = ? "
+                    "WHERE status = 'running' AND lease_until < ?",
+                    (now, now))
+
+    def claim(self, worker_id):
+        """
+        Claims the oldest pending job, after re-queueing the expired leases.
+
+        Args:
+            worker_id (str): Identifier of the worker (host and pid).
+
+        Returns:
+            dict | None: The job (id, name, params, attempts), None if no job is pending.
+        """
+        now = time.time()
+        with self._transaction() as cur:
+            self._requeue_expired(cur, now)
+            row = cur.execute("SELECT id, name, params, attempts FROM jobs WHERE status = 'pending' "
+                              "ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            cur.execute("UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                        "updated_at = ? WHERE id = ?",
+                        (worker_id, now + self.lease_seconds, now, row['id']))
+
+        return {'id': row['id'], 'name': row['name'], 'params': json.loads(row['params']),
+                'attempts': row['attempts'] + 1}
+
+    def renew(self, job_id, worker_id):
+        """
+        Extends the lease of a running job.
+
+        Returns:
+            bool: False if the job is no longer leased to this worker.
+        """
+        now = time.time()
+        with self._transaction() as cur:
+            cur.execute("UPDATE jobs SET lease_until = ?, updated_at = ? "
+                        "WHERE id = ? AND worker = ? AND status = 'running'",
+                        (now + self.lease_seconds, now, job_id, worker_id))
+            return cur.rowcount == 1
+
+    def complete(self, job_id, worker_id):
+        """
+        Marks a job as done.
+
+        Returns:
+            bool: False if the lease was lost in the meantime (the job may run again elsewhere).
+        """
+        with self._transaction() as cur:
+            cur.execute("UPDATE jobs SET status = 'done', lease_until = NULL, error = NULL, updated_at = ? "
+                        "WHERE id = ? AND worker = ? AND status = 'running'",
+                        (time.time(), job_id, worker_id))
+            return cur.rowcount == 1
+
+    def fail(self, job_id, worker_id, error):
+        """
+        Releases a job that failed: it is retried until max_attempts, then marked as failed.
+
+        Returns:
+            bool: False if the lease was lost in the meantime.
+        """
+        with self._transaction() as cur:
+            cur.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                        "worker = NULL, lease_until = NULL, error = ?, updated_at = ? "
+                        "WHERE id = ? AND worker = ? AND status = 'running'",
+                        (self.max_attempts, str(error), time.time(), job_id, worker_id))
+            return cur.rowcount == 1
+
+    def reset_failed(self):
+        """
+        Puts the failed jobs back in the queue with a fresh attempt count.
+
+        Returns:
+            int: Number of jobs re-queued.
+        """
+        with self._transaction() as cur:
+            cur.execute("UPDATE jobs SET status = 'pending', attempts = 0, updated_at = ? WHERE status = 'failed'",
+                        (time.time(),))
+            return cur.rowcount
+
+    def counts(self):
+        """
+        Returns:
+            dict: Number of jobs per status.
+        """
+        rows = self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def failures(self):
+        """
+        Returns:
+            list of tuple: (name, attempts, error) of the failed jobs.
+        """
+        return [tuple(row) for row in self.conn.execute(
+            "SELECT name, attempts, error FROM jobs WHERE status = 'failed' ORDER BY id").fetchall()]
+
+
+class _Transaction:
+    """
+    IMMEDIATE transaction: the write lock is taken at the start, so that two workers
+    never claim the same job.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.cur = self.conn.cursor()
+        self.cur.execute("BEGIN IMMEDIATE")
+        return self.cur
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cur.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        self.cur.close()
+        return False
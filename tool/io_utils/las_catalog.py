@@ -0,0 +1,231 @@
+import os
+import glob
+from collections import OrderedDict
+
+import numpy as np
+
+from io_utils.las_records import LasRecords
+
+
+LAS_EXTENSIONS = (".las", ".laz")
+
+
+### function: is_las_catalog ###
+def is_las_catalog(las_path):
+    """
+    Whether --las designates several files (a directory or a glob pattern) rather than a single LAS file.
+    """
+    return os.path.isdir(las_path) or glob.has_magic(las_path)
+
+
+### function: find_las_files ###
+def find_las_files(las_path):
+    """
+    Lists the LAS/LAZ files of a directory or matching a glob pattern.
+
+    Args:
+        las_path (str): Directory or glob pattern (e.g. "/data/tiles/*.laz").
+
+    Returns:
+        list of str: Sorted paths of the files.
+    """
+    pattern = os.path.join(las_path, "*") if os.path.isdir(las_path) else las_path
+    paths = sorted(p for p in glob.glob(pattern) if p.lower().endswith(LAS_EXTENSIONS))
+    if not paths:
+        raise FileNotFoundError(f"No LAS/LAZ file found in {las_path}")
+    return paths
+
+
+### function: interleave_bits ###
+def interleave_bits(ix, iy, bits=16):
+    """
+    Interleaves the bits of integer cell coordinates into Morton (Z-order) codes.
+
+    Args:
+        ix (np.ndarray): (N,) column of the cells.
+        iy (np.ndarray): (N,) row of the cells.
+        bits (int): Bits per axis (at most 32).
+
+    Returns:
+        np.ndarray: (N,) uint64 codes.
+    """
+    ix, iy = np.asarray(ix, dtype=np.uint64), np.asarray(iy, dtype=np.uint64)
+    codes = np.zeros(len(ix), dtype=np.uint64)
+    for bit in range(bits):
+        mask = np.uint64(1 << bit)
+        codes |= ((ix & mask) << np.uint64(bit)) | ((iy & mask) << np.uint64(bit + 1))
+    return codes
+
+
+### function: morton_codes ###
+def morton_codes(xy, bounds, bits=16):
+    """
+    Computes the Morton (Z-order) codes of 2D points: sorting by code keeps
+    points that are close in space close in the sequence.
+
+    Args:
+        xy (np.ndarray): (N, 2) coordinates.
+        bounds (tuple): (minx, miny, maxx, maxy) of the grid.
+        bits (int): Bits per axis (at most 32).
+
+    Returns:
+        np.ndarray: (N,) uint64 codes.
+    """
+    minx, miny, maxx, maxy = bounds
+    scale = (2 ** bits - 1) / np.maximum([maxx - minx, maxy - miny], 1e-9)
+    cells = np.clip((np.asarray(xy, dtype=np.float64) - (minx, miny)) * scale, 0, 2 ** bits - 1).astype(np.uint64)
+    return interleave_bits(cells[:, 0], cells[:, 1], bits)
+
+
+### function: catalog_hit_rates ###
+def catalog_hit_rates(counters, tiles):
+    """
+    Computes the hit rate of the tile cache from the accumulated catalog counters.
+
+    Args:
+        counters (dict): Values of 'hits', 'misses', 'evictions' and 'bytes_read'.
+        tiles (int): Number of tiles of the catalog.
+
+    Returns:
+        dict: Lookups, hit rate (in percent) and decoded volume.
+    """
+    lookups = counters.get('hits', 0) + counters.get('misses', 0)
+    section = {
+        'tiles': tiles,
+        'lookups': lookups,
+        'tiles_decoded': counters.get('misses', 0),
+        'evictions': counters.get('evictions', 0),
+        'decoded_mb': round(counters.get('bytes_read', 0) / 1024 ** 2, 1),
+    }
+    if lookups:
+        section['hit_rate_percent'] = round(100.0 * counters.get('hits', 0) / lookups, 2)
+    return section
+
+
+class LasCatalog:
+    """
+    Point cloud split in many LAS/LAZ tiles, queried by bounding box.
+
+    Only the headers are read when the catalog is opened; the points of a tile are
+    decoded the first time a query overlaps it (as raw integer records, see
+    LasRecords) and kept in an LRU cache bounded by a memory budget. Footprints processed in spatial order (see order_footprints)
+    reuse the tiles already in memory, so that every tile is decoded about once.
+
+    Used wherever the single-file (N, 3) array is: pointcloud_ops.points_in_bbox
+    dispatches the queries to points_in_bbox.
+
+    Args:
+        las_path (str): Directory or glob pattern of the tiles.
+        memory_budget (int): Maximum bytes of decoded points kept in memory.
+    """
+
+    def __init__(self, las_path, memory_budget=2 * 1024 ** 3):
+        import laspy  # heavy, only needed once the footprints are read
+
+        self.memory_budget = memory_budget
+        self.paths = find_las_files(las_path)
+
+        bounds = []
+        for path in self.paths:
+            with laspy.open(path) as reader:
+                header = reader.header
+                bounds.append((header.mins[0], header.mins[1], header.maxs[0], header.maxs[1]))
+        self.bounds = np.array(bounds, dtype=np.float64)
+
+        self.cache = OrderedDict()
+        self.cached_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes_read': 0}
+
+        print(f"LAS catalog: {len(self.paths)} tiles, budget {memory_budget / 1024 ** 2:.0f} MB")
+
+    def tiles_in_bbox(self, minx, miny, maxx, maxy):
+        """
+        Returns:
+            np.ndarray: Indices of the tiles whose header bounds overlap the box.
+        """
+        b = self.bounds
+        return np.flatnonzero((b[:, 0] <= maxx) & (b[:, 2] >= minx) & (b[:, 1] <= maxy) & (b[:, 3] >= miny))
+
+    def _tile_points(self, tile):
+        points = self.cache.get(tile)
+        if points is not None:
+            self.cache.move_to_end(tile)
+            self.stats['hits'] += 1
+            return points
+
+        import laspy
+
+        points = LasRecords.from_las(laspy.read(self.paths[tile]))
+        self.stats['misses'] += 1
+        self.stats['bytes_read'] += points.nbytes
+
+        # The tile just decoded is always kept, even if it alone exceeds the budget
+        while self.cache and self.cached_bytes + points.nbytes > self.memory_budget:
+            _, evicted = self.cache.popitem(last=False)
+            self.cached_bytes -= evicted.nbytes
+            self.stats['evictions'] += 1
+
+        self.cache[tile] = points
+        self.cached_bytes += points.nbytes
+        return points
+
+    def points_in_bbox(self, minx, miny, maxx, maxy):
+        """
+        Returns the points of all the overlapping tiles falling inside a 2D bounding box (world coordinates).
+
+        Returns:
+            np.ndarray: (M, 3) array of the points inside the bounding box.
+        """
+        selected = [self._tile_points(tile).points_in_bbox(minx, miny, maxx, maxy)
+                    for tile in self.tiles_in_bbox(minx, miny, maxx, maxy)]
+
+        if not selected:
+            return np.empty((0, 3))
+        return np.concatenate(selected) if len(selected) > 1 else selected[0]
+
+    def z_range_in_bbox(self, minx, miny, maxx, maxy):
+        """
+        Returns:
+            tuple | None: (z_min, z_max) of the points inside the box over all the overlapping tiles.
+        """
+        ranges = [self._tile_points(tile).z_range_in_bbox(minx, miny, maxx, maxy)
+                  for tile in self.tiles_in_bbox(minx, miny, maxx, maxy)]
+        ranges = [r for r in ranges if r is not None]
+        if not ranges:
+            return None
+        return min(r[0] for r in ranges), max(r[1] for r in ranges)
+
+    def order_footprints(self, polygons, x_offset, y_offset):
+        """
+        Sorts the footprints tile by tile (tiles in Morton order of their centers),
+        and in Morton order of their centroids inside a tile.
+
+        Args:
+            polygons (list of dict): Footprints with shifted 'exterior' coordinates.
+            x_offset (float): Offset along X axis.
+            y_offset (float): Offset along Y axis.
+
+        Returns:
+            list of dict: The same footprints, in processing order.
+        """
+        if not polygons:
+            return polygons
+
+        centroids = np.array([np.asarray(p['exterior'], dtype=np.float64)[:, :2].mean(axis=0) for p in polygons])
+        centroids += (x_offset, y_offset)
+        extent = (*self.bounds[:, :2].min(axis=0), *self.bounds[:, 2:].max(axis=0))
+
+        tile_centers = (self.bounds[:, :2] + self.bounds[:, 2:]) / 2
+        tile_rank = np.empty(len(self.paths), dtype=np.int64)
+        tile_rank[np.argsort(morton_codes(tile_centers, extent), kind='stable')] = np.arange(len(self.paths))
+
+        # Footprint centroids outside every tile go last
+        owner = np.full(len(polygons), len(self.paths), dtype=np.int64)
+        for tile in np.argsort(tile_rank)[::-1]:
+            minx, miny, maxx, maxy = self.bounds[tile]
+            inside = ((centroids[:, 0] >= minx) & (centroids[:, 0] <= maxx) &
+                      (centroids[:, 1] >= miny) & (centroids[:, 1] <= maxy))
+            owner[inside] = tile_rank[tile]
+
+        order = np.lexsort((morton_codes(centroids, extent), owner))
+        return [polygons[i] for i in order]
@@ -0,0 +1,295 @@
+import os
+import glob
+import json
+import hashlib
+
+
+MANIFEST_NAME = "manifest.json"
+PENDING_MANIFEST_NAME = ".lod2_manifest_pending.json"
+MANIFEST_VERSION = 1
+
+# Footprint coordinates are compared at the millimetre
+GEOMETRY_DECIMALS = 3
+
+
+### function: _signed_area ###
+def _signed_area(ring):
+    return sum(x0 * y1 - x1 * y0 for (x0, y0, _), (x1, y1, _) in zip(ring, ring[1:] + ring[:1])) / 2.0
+
+
+### function: _normalize_ring ###
+def _normalize_ring(coords, x_offset, y_offset, counterclockwise):
+    """
+    Rounds a ring in world coordinates and makes it independent of how it is stored:
+    no closing or repeated vertex, fixed orientation, starting from its smallest vertex.
+    """
+    ring = []
+    for x, y, *z in coords:
+        point = (round(x + x_offset, GEOMETRY_DECIMALS), round(y + y_offset, GEOMETRY_DECIMALS),
+                 round(z[0] if z else 0.0, GEOMETRY_DECIMALS))
+        if not ring or point != ring[-1]:
+            ring.append(point)
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring.pop()
+    if not ring:
+        return ring
+
+    if (_signed_area(ring) > 0) != counterclockwise:
+        ring.reverse()
+    start = ring.index(min(ring))
+    return ring[start:] + ring[:start]
+
+
+### function: footprint_hash ###
+def footprint_hash(poly, x_offset, y_offset, attributes=('roof', 'height')):
+    """
+    Hash of a footprint and its attributes, identical for the same building in two
+    versions of the dataset even if the offsets, the ring orientation or the starting
+    vertex differ.
+
+    Args:
+        poly (dict): Polygon dictionary with 'exterior', 'holes' and the attributes (coordinates shifted by the offsets).
+        x_offset, y_offset (float): Offsets of the shapefile, to hash world coordinates.
+        attributes (tuple): Attributes of the footprint taken into account.
+
+    Returns:
+        str: Hexadecimal SHA-1.
+    """
+    exterior = _normalize_ring(poly['exterior'], x_offset, y_offset, counterclockwise=True)
+    holes = sorted(_normalize_ring(hole, x_offset, y_offset, counterclockwise=False) for hole in poly['holes'])
+    values = [None if poly.get(name) is None else str(poly.get(name)) for name in attributes]
+    return hashlib.sha1(json.dumps([exterior, holes, values]).encode()).hexdigest()
+
+
+### function: load_manifest ###
+def load_manifest(output_folder, filename=MANIFEST_NAME):
+    """
+    Returns:
+        dict | None: The manifest of the previous run, None if missing or of another version.
+    """
+    path = os.path.join(output_folder, filename)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+
+### function: save_manifest ###
+def save_manifest(output_folder, manifest, filename=MANIFEST_NAME):
+    os.makedirs(output_folder, exist_ok=True)
+    path = os.path.join(output_folder, filename)
+    with open(path + ".tmp", 'w') as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+### function: diff_manifest ###
+def diff_manifest(previous, buildings, options):
+    """
+    Matches the buildings of the new run with those of the previous manifest by
+    footprint hash (and point cloud fingerprint, when both runs have one).
+
+    Args:
+        previous (dict | None): Manifest of the previous run.
+        buildings (list of dict): 'index', 'hash' and optionally 'las' of every new building.
+        options (dict): Options changing the outputs; if they differ, every building is regenerated.
+
+    Returns:
+        dict: 'carried' (list of (new index, old index)), 'regenerate' (set of new indices),
+        'removed' (list of old indices not carried) and the statistics of the run summary ('stats').
+    """
+    old_buildings = previous['buildings'] if previous else []
+    comparable = previous is not None and previous.get('options') == options
+
+    by_hash = {}
+    if comparable:
+        for entry in old_buildings:
+            by_hash.setdefault(entry['hash'], []).append(entry)
+
+    carried, regenerate, las_changed = [], set(), 0
+    for entry in buildings:
+        candidates = by_hash.get(entry['hash'])
+        if not candidates:
+            regenerate.add(entry['index'])
+            continue
+        old = candidates[0]
+        if entry.get('las') is not None and old.get('las') is not None and old['las'] != entry['las']:
+            las_changed += 1
+            regenerate.add(entry['index'])
+            continue
+        candidates.pop(0)
+        carried.append((entry['index'], old['index']))
+
+    carried_old = {old for _, old in carried}
+    removed = [entry['index'] for entry in old_buildings if entry['index'] not in carried_old]
+
+    stats = {
+        'previous_buildings': len(old_buildings),
+        'options_changed': previous is not None and not comparable,
+        'unchanged': len(carried),
+        'regenerated': len(regenerate),
+        'las_changed': las_changed,
+        'removed': len(removed),
+    }
+    return {'carried': carried, 'regenerate': regenerate, 'removed': removed, 'stats': stats}
+
+
+### function: _output_files ###
+def _output_files(output_folder, idx):
+    # out_<index>.<extension>[.<compression>]: the dot keeps out_1 from matching out_12
+    return glob.glob(os.path.join(output_folder, f"out_{idx}.*"))
+
+
+### function: _save_journal ###
+def _save_journal(output_folder, journal, phase):
+    journal['phase'] = phase
+    save_manifest(output_folder, journal, PENDING_MANIFEST_NAME)
+
+
+### function: _apply_moves ###
+def _apply_moves(output_folder, journal):
+    """
+    Moves the output files listed in the journal, from the phase it is in. Every phase
+    can be run again after a crash: the carried files are first moved aside, then the
+    stale ones removed, then the carried ones put in place (indices can be swapped
+    between the versions).
+    """
+    if journal['phase'] == 'staging':
+        for source, staged, _ in journal['moves']:
+            source, staged = os.path.join(output_folder, source), os.path.join(output_folder, staged)
+            if os.path.exists(source) and not os.path.exists(staged):
+                os.replace(source, staged)
+        _save_journal(output_folder, journal, 'removing')
+
+    if journal['phase'] == 'removing':
+        for name in journal['removed_files']:
+            if os.path.exists(os.path.join(output_folder, name)):
+                os.remove(os.path.join(output_folder, name))
+        _save_journal(output_folder, journal, 'placing')
+
+    if journal['phase'] == 'placing':
+        for _, staged, target in journal['moves']:
+            staged = os.path.join(output_folder, staged)
+            if os.path.exists(staged):
+                os.replace(staged, os.path.join(output_folder, target))
+        _save_journal(output_folder, journal, 'modeling')
+
+
+### function: carry_over_outputs ###
+def carry_over_outputs(output_folder, changes, manifest):
+    """
+    Renames the outputs of the unchanged buildings to their new index and removes
+    those of the other buildings of the previous run (deleted, or regenerated by this
+    run).
+
+    Before any file is touched, the moves and the manifest of this run are written to
+    the pending manifest (the journal of the run) and manifest.json is removed, so
+    that a crashed run is never compared with outputs it no longer describes (see
+    recover_manifest). Must run before any building of the new run is written.
+
+    Args:
+        output_folder (str): Output folder of the runs.
+        changes (dict): Result of diff_manifest.
+        manifest (dict): Manifest of this run ('version', 'options' and 'buildings').
+
+    Returns:
+        tuple: (files carried over, files removed).
+    """
+    moves = []
+    for new_idx, old_idx in changes['carried']:
+        prefix = os.path.join(output_folder, f"out_{old_idx}")
+        for path in _output_files(output_folder, old_idx):
+            suffix = path[len(prefix):]
+            moves.append((os.path.basename(path), f".carry_{new_idx}{suffix}", f"out_{new_idx}{suffix}"))
+    removed_files = [os.path.basename(path) for old_idx in changes['removed']
+                     for path in _output_files(output_folder, old_idx)]
+
+    journal = dict(manifest, carried=changes['carried'], regenerate=sorted(changes['regenerate']),
+                   stats=changes['stats'], moves=moves, removed_files=removed_files)
+    _save_journal(output_folder, journal, 'staging')
+    if os.path.exists(os.path.join(output_folder, MANIFEST_NAME)):
+        os.remove(os.path.join(output_folder, MANIFEST_NAME))
+
+    _apply_moves(output_folder, journal)
+    return len(moves), len(removed_files)
+
+
+### function: load_journal ###
+def load_journal(output_folder):
+    """
+    Returns:
+        dict | None: The pending manifest of the run in progress, None if there is none.
+    """
+    path = os.path.join(output_folder, PENDING_MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+### function: recover_manifest ###
+def recover_manifest(output_folder):
+    """
+    Recovers the output folder of an incremental run that did not complete (crashed or
+    killed worker): the moves it started are completed, the outputs of the buildings
+    it was regenerating are removed, as they may be partial, and the manifest of the
+    carried buildings replaces the pending one.
+
+    Returns:
+        dict | None: The manifest of the outputs left in the folder, None if no run was interrupted.
+    """
+    journal = load_journal(output_folder)
+    if journal is None:
+        return None
+
+    # A pending manifest without journal (older version) cannot tell which outputs are valid
+    journal.setdefault('phase', 'modeling')
+    journal.setdefault('carried', [])
+    if journal['phase'] != 'modeling':
+        _apply_moves(output_folder, journal)
+
+    carried = {new_idx for new_idx, _ in journal['carried']}
+    for entry in journal['buildings']:
+        if entry['index'] not in carried:
+            for path in _output_files(output_folder, entry['index']):
+                os.remove(path)
+
+    manifest = {'version': journal.get('version', MANIFEST_VERSION), 'options': journal.get('options'),
+                'buildings': [entry for entry in journal['buildings'] if entry['index'] in carried]}
+    save_manifest(output_folder, manifest)
+    os.remove(os.path.join(output_folder, PENDING_MANIFEST_NAME))
+    return manifest
+
+
+### function: indices_to_rebuild ###
+def indices_to_rebuild(summary):
+    """
+    Buildings the next incremental run has to model again: the failed ones and those
+    not built at full quality (degraded by the time budget, or flat fallback).
+    """
+    failed = [failure['index'] for failure in summary['failures']]
+    return failed + [timing['index'] for timing in summary['timings'] if timing.get('quality', 'full') != 'full']
+
+
+### function: finalize_manifest ###
+def finalize_manifest(output_folder, failed_indices=()):
+    """
+    Turns the manifest prepared at the start of the run into the manifest of the
+    output folder, once every worker is done. Failed buildings are left out, so the
+    next run regenerates them (see indices_to_rebuild).
+
+    Returns:
+        str | None: Path of the manifest, None if no incremental run was prepared.
+    """
+    journal = load_journal(output_folder)
+    if journal is None:
+        return None
+
+    failed = set(failed_indices)
+    manifest = {'version': journal['version'], 'options': journal['options'],
+                'buildings': [entry for entry in journal['buildings'] if entry['index'] not in failed]}
+    path = save_manifest(output_folder, manifest)
+    os.remove(os.path.join(output_folder, PENDING_MANIFEST_NAME))
+    return path
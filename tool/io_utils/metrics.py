@@ -0,0 +1,192 @@
+import os
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from io_utils.resources import get_rss_mb
+
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_PREFIX = "lod2"
+
+
+### function: _atomic_write ###
+def _atomic_write(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class MetricsWriter:
+    """
+    Keeps a status file updated during the run, in the Prometheus textfile format
+    (for the node exporter textfile collector) or as JSON.
+
+    The file holds the building outcomes per roof type, the current throughput,
+    the ETA, the stage latency histograms, the RSS and the time of the last
+    progress, so that stalls can be alerted on. It is rewritten atomically at most
+    every `interval` seconds.
+
+    Args:
+        path (str): Path of the status file.
+        fmt (str): 'prometheus' or 'json' (default: inferred from the extension).
+        interval (float): Minimum number of seconds between two writes.
+        window (float): Time window (seconds) of the throughput estimate.
+        labels (dict, optional): Labels added to every series (e.g. the worker or the job), so
+            that the files of concurrent runs collected together do not hold duplicate series.
+    """
+
+    def __init__(self, path, fmt=None, interval=5.0, window=60.0, labels=None):
+        self.path = path
+        self.fmt = fmt or ('json' if path.endswith('.json') else 'prometheus')
+        self.interval = interval
+        self.window = window
+        self.labels = dict(labels or {})
+
+        self.histograms = {}
+        self.progress = deque()
+        self.last_write = 0.0
+        self.last_progress = time.time()
+        self.processed = 0
+        self.total = 0
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+
+    def observe(self, stage, seconds):
+        """
+        Adds a latency sample to the histogram of a stage.
+        """
+        hist = self.histograms.setdefault(stage, {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0})
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                hist['buckets'][i] += 1
+        hist['sum'] += seconds
+        hist['count'] += 1
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager timing a pipeline stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def state(self):
+        """
+        Returns the state to carry over to a recycled worker.
+        """
+        return {'histograms': self.histograms}
+
+    def restore(self, state):
+        self.histograms = state.get('histograms', {}) if state else {}
+
+    def throughput(self):
+        """
+        Buildings per second over the last `window` seconds.
+        """
+        if len(self.progress) < 2:
+            return 0.0
+        (t0, n0), (t1, n1) = self.progress[0], self.progress[-1]
+        return (n1 - n0) / (t1 - t0) if t1 > t0 else 0.0
+
+    def building_done(self, processed, summary):
+        """
+        Registers the progress of the run and rewrites the status file if needed.
+
+        Args:
+            processed (int): Number of buildings processed so far (over the recycled workers),
+                out of the `total` buildings of the run.
+            summary (dict): Run summary with the outcomes per roof type.
+        """
+        now = time.time()
+        self.processed = processed
+        self.last_progress = now
+
+        self.progress.append((now, processed))
+        while len(self.progress) > 2 and now - self.progress[0][0] > self.window:
+            self.progress.popleft()
+
+        if now - self.last_write >= self.interval:
+            self.write(summary)
+
+    def snapshot(self, summary, status='running'):
+        rate = self.throughput()
+        remaining = max(self.total - self.processed, 0)
+
+        return {
+            'status': status,
+            'labels': self.labels,
+            'updated_at': time.time(),
+            'last_progress_at': self.last_progress,
+            'processed': self.processed,
+            'total': self.total,
+            'buildings_per_second': round(rate, 4),
+            'eta_seconds': round(remaining / rate, 1) if rate > 0 else None,
+            'rss_mb': round(get_rss_mb(), 1),
+            'roof_types': summary['roof_types'],
+            'failures': len(summary['failures']),
+            'stage_latency_seconds': {
+                stage: {'buckets': dict(zip([str(b) for b in LATENCY_BUCKETS], hist['buckets'])),
+                        'sum': round(hist['sum'], 6), 'count': hist['count']}
+                for stage, hist in self.histograms.items()
+            },
+        }
+
+    def _labels(self, **labels):
+        labels = dict(self.labels, **labels)
+        return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}" if labels else ""
+
+    def to_prometheus(self, snap):
+        p = METRIC_PREFIX
+        lines = [
+            f"# HELP {p}_buildings_total Buildings by roof type and outcome.",
+            f"# TYPE {p}_buildings_total counter",
+        ]
+        for roof_type, outcomes in sorted(snap['roof_types'].items()):
+            for outcome, value in sorted(outcomes.items()):
+                lines.append(f'{p}_buildings_total{self._labels(roof=roof_type, outcome=outcome)} {value}')
+
+        gauges = [
+            ('processed', "Buildings processed so far.", snap['processed']),
+            ('buildings', "Buildings of the run.", snap['total']),
+            ('failures', "Buildings without any mesh.", snap['failures']),
+            ('buildings_per_second', "Current throughput.", snap['buildings_per_second']),
+            ('eta_seconds', "Estimated time to completion.", snap['eta_seconds'] if snap['eta_seconds'] is not None else 'NaN'),
+            ('rss_bytes', "Resident memory of the Blender worker.", int(snap['rss_mb'] * 1024 * 1024)),
+            ('last_progress_timestamp_seconds', "Time of the last processed building.", round(snap['last_progress_at'], 3)),
+            ('finished', "1 once the run is complete.", int(snap['status'] == 'finished')),
+        ]
+        for name, help_text, value in gauges:
+            lines += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} gauge", f"{p}_{name}{self._labels()} {value}"]
+
+        lines += [
+            f"# HELP {p}_stage_latency_seconds Latency of the pipeline stages.",
+            f"# TYPE {p}_stage_latency_seconds histogram",
+        ]
+        for stage, hist in sorted(self.histograms.items()):
+            for bound, count in zip(LATENCY_BUCKETS, hist['buckets']):
+                lines.append(f'{p}_stage_latency_seconds_bucket{self._labels(stage=stage, le=bound)} {count}')
+            lines.append(f'{p}_stage_latency_seconds_bucket{self._labels(stage=stage, le="+Inf")} {hist["count"]}')
+            lines.append(f'{p}_stage_latency_seconds_sum{self._labels(stage=stage)} {hist["sum"]:.6f}')
+            lines.append(f'{p}_stage_latency_seconds_count{self._labels(stage=stage)} {hist["count"]}')
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, summary, status='running'):
+        """
+        Rewrites the status file atomically.
+        """
+        snap = self.snapshot(summary, status)
+        if self.fmt == 'json':
+            _atomic_write(self.path, json.dumps(snap, indent=2))
+        else:
+            _atomic_write(self.path, self.to_prometheus(snap))
+        self.last_write = time.time()
@@ -0,0 +1,232 @@
+import os
+import json
+import math
+
+import numpy as np
+
+from io_utils.las_catalog import find_las_files, interleave_bits, is_las_catalog
+
+
+POINT_STORE_VERSION = 1
+INDEX_NAME = "index.json"
+COLUMNS = ("x", "y", "z")
+
+
+### function: is_point_store ###
+def is_point_store(path):
+    """
+    Whether a path is a folder written by convert_las_to_point_store.
+    """
+    return os.path.isfile(os.path.join(path, INDEX_NAME))
+
+
+### function: _grid_bits ###
+def _grid_bits(bounds, cell_size):
+    minx, miny, maxx, maxy = bounds
+    cells = max(math.floor((maxx - minx) / cell_size), math.floor((maxy - miny) / cell_size)) + 1
+    bits = max(1, math.ceil(math.log2(cells + 1)))
+    if bits > 32:
+        raise ValueError(f"Cell size {cell_size} too small for the extent of the point cloud")
+    return bits
+
+
+### function: _cell_codes ###
+def _cell_codes(x, y, origin, cell_size, bits):
+    # Points rounded just outside the header bounds go to the border cells
+    ix = np.clip(np.floor((x - origin[0]) / cell_size), 0, 2 ** bits - 1).astype(np.int64)
+    iy = np.clip(np.floor((y - origin[1]) / cell_size), 0, 2 ** bits - 1).astype(np.int64)
+    return interleave_bits(ix, iy, bits)
+
+
+### function: write_point_store ###
+def write_point_store(folder, read_chunks, bounds, cell_size=5.0):
+    """
+    Writes a point cloud as columnar .npy files (x, y, z) sorted by the Morton code
+    of their grid cell, with the index of the cells (cells.npy: sorted codes,
+    offsets.npy: first point of every cell) and index.json, written last.
+
+    The points are read twice (cell counts, then scatter into the memory-mapped
+    columns), so the conversion never holds more than one chunk in memory.
+
+    Args:
+        folder (str): Output folder of the store.
+        read_chunks (callable): Returns an iterator of (x, y, z) arrays (e.g. one per LAS file).
+        bounds (tuple): (minx, miny, maxx, maxy) of all the points.
+        cell_size (float): Side of the grid cells.
+
+    Returns:
+        int: Number of points written.
+    """
+    os.makedirs(folder, exist_ok=True)
+    if is_point_store(folder):
+        os.remove(os.path.join(folder, INDEX_NAME))
+
+    origin = (float(bounds[0]), float(bounds[1]))
+    bits = _grid_bits(bounds, cell_size)
+
+    # Pass 1: number of points per cell
+    codes, counts = [], []
+    for x, y, z in read_chunks():
+        chunk_codes, chunk_counts = np.unique(_cell_codes(x, y, origin, cell_size, bits), return_counts=True)
+        codes.append(chunk_codes)
+        counts.append(chunk_counts)
+
+    codes, counts = np.concatenate(codes), np.concatenate(counts)
+    order = np.argsort(codes, kind='stable')
+    codes, counts = codes[order], counts[order]
+    cells, first = np.unique(codes, return_index=True)
+    cell_counts = np.add.reduceat(counts, first) if len(codes) else counts
+
+    offsets = np.zeros(len(cells) + 1, dtype=np.int64)
+    np.cumsum(cell_counts, out=offsets[1:])
+    total = int(offsets[-1])
+
+    columns = {name: np.lib.format.open_memmap(os.path.join(folder, f"{name}.npy"), mode='w+',
+                                               dtype=np.float64, shape=(total,))
+               for name in COLUMNS}
+
+    # Pass 2: every chunk fills the next free slots of its cells
+    cursor = offsets[:-1].copy()
+    z_min, z_max = np.inf, -np.inf
+    for x, y, z in read_chunks():
+        chunk_codes = _cell_codes(x, y, origin, cell_size, bits)
+        order = np.argsort(chunk_codes, kind='stable')
+        chunk_codes = chunk_codes[order]
+
+        chunk_cells, start, chunk_counts = np.unique(chunk_codes, return_index=True, return_counts=True)
+        cell_ids = np.searchsorted(cells, chunk_cells)
+        dest = np.repeat(cursor[cell_ids] - start, chunk_counts) + np.arange(len(chunk_codes))
+        cursor[cell_ids] += chunk_counts
+
+        for name, values in zip(COLUMNS, (x, y, z)):
+            columns[name][dest] = np.asarray(values, dtype=np.float64)[order]
+        if len(z):
+            z_min, z_max = min(z_min, float(np.min(z))), max(z_max, float(np.max(z)))
+
+    for column in columns.values():
+        column.flush()
+    del columns
+
+    np.save(os.path.join(folder, "cells.npy"), cells)
+    np.save(os.path.join(folder, "offsets.npy"), offsets)
+
+    index = {
+        'version': POINT_STORE_VERSION,
+        'count': total,
+        'cell_size': cell_size,
+        'origin': list(origin),
+        'bits': bits,
+        'bounds': [float(b) for b in bounds],
+        'z_range': [z_min, z_max] if total else None,
+        'cells': len(cells),
+    }
+    with open(os.path.join(folder, INDEX_NAME), 'w') as f:
+        json.dump(index, f, indent=2)
+
+    return total
+
+
+### function: convert_las_to_point_store ###
+def convert_las_to_point_store(las_path, folder, cell_size=5.0):
+    """
+    One-time conversion of a LAS file, or of a directory / glob pattern of LAS
+    tiles, into a point store (see write_point_store).
+
+    Returns:
+        int: Number of points written.
+    """
+    import laspy  # heavy, only needed by the conversion
+
+    paths = find_las_files(las_path) if is_las_catalog(las_path) else [las_path]
+
+    mins, maxs = [], []
+    for path in paths:
+        with laspy.open(path) as reader:
+            mins.append(reader.header.mins[:2])
+            maxs.append(reader.header.maxs[:2])
+    bounds = (*np.min(mins, axis=0), *np.max(maxs, axis=0))
+
+    def read_chunks():
+        for path in paths:
+            print(f"Reading {path}...")
+            las = laspy.read(path)
+            yield las.x, las.y, las.z
+
+    return write_point_store(folder, read_chunks, bounds, cell_size)
+
+
+class PointStore:
+    """
+    Point cloud converted by convert_las_to_point_store, opened with np.load(mmap_mode='r').
+
+    Opening is instant whatever the size of the cloud: only the index is read, and a
+    query touches the pages of the cells under its bounding box. The Morton order
+    keeps neighbouring cells close in the files, and the workers reading the same
+    store share the page cache of the operating system.
+
+    Args:
+        folder (str): Folder of the store.
+    """
+
+    def __init__(self, folder):
+        with open(os.path.join(folder, INDEX_NAME)) as f:
+            self.index = json.load(f)
+        if self.index['version'] != POINT_STORE_VERSION:
+            raise ValueError(f"Unsupported point store version {self.index['version']} in {folder}")
+
+        self.folder = folder
+        self.cell_size = self.index['cell_size']
+        self.origin = self.index['origin']
+        self.bits = self.index['bits']
+        self.columns = [np.load(os.path.join(folder, f"{name}.npy"), mmap_mode='r') for name in COLUMNS]
+        self.cells = np.load(os.path.join(folder, "cells.npy"))
+        self.offsets = np.load(os.path.join(folder, "offsets.npy"))
+
+        print(f"Point store: {self.index['count']} points in {len(self.cells)} cells of {self.cell_size} m")
+
+    def __len__(self):
+        return self.index['count']
+
+    def _cell_runs(self, minx, miny, maxx, maxy):
+        """
+        Returns the (start, end) ranges of the points of the cells overlapping a box,
+        adjacent cells merged into a single run.
+        """
+        limit = 2 ** self.bits - 1
+        ix0, ix1 = (np.floor((np.array([minx, maxx]) - self.origin[0]) / self.cell_size)).astype(np.int64)
+        iy0, iy1 = (np.floor((np.array([miny, maxy]) - self.origin[1]) / self.cell_size)).astype(np.int64)
+        if ix1 < 0 or iy1 < 0 or ix0 > limit or iy0 > limit:
+            return []
+
+        ix, iy = np.meshgrid(np.arange(max(ix0, 0), min(ix1, limit) + 1), np.arange(max(iy0, 0), min(iy1, limit) + 1))
+        codes = np.sort(interleave_bits(ix.ravel(), iy.ravel(), self.bits))
+
+        # Codes and cells are both sorted: the cells found come out in file order
+        pos = np.searchsorted(self.cells, codes)
+        found = pos < len(self.cells)
+        found[found] = self.cells[pos[found]] == codes[found]
+        pos = pos[found]
+        if len(pos) == 0:
+            return []
+
+        # Consecutive cells of the index are contiguous in the columns
+        runs = np.split(pos, np.flatnonzero(np.diff(pos) != 1) + 1)
+        return [(int(self.offsets[run[0]]), int(self.offsets[run[-1] + 1])) for run in runs]
+
+    def points_in_bbox(self, minx, miny, maxx, maxy):
+        """
+        Returns the points falling inside a 2D bounding box (world coordinates).
+
+        Returns:
+            np.ndarray: (M, 3) array of the points inside the bounding box.
+        """
+        runs = self._cell_runs(minx, miny, maxx, maxy)
+        if not runs:
+            return np.empty((0, 3))
+
+        points = np.column_stack([np.concatenate([column[start:end] for start, end in runs]) for column in self.columns])
+        mask = (
+            (points[:, 0] >= minx) & (points[:, 0] <= maxx) &
+            (points[:, 1] >= miny) & (points[:, 1] <= maxy)
+        )
+        return points[mask]
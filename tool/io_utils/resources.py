@@ -0,0 +1,46 @@
+import os
+import sys
+
+
+### function: get_rss_mb ###
+def get_rss_mb():
+    """
+    Returns the resident set size (RSS) of the current process in MB.
+
+    Reads /proc/self/statm when available (current RSS); otherwise falls back
+    to the peak RSS reported by getrusage.
+
+    Returns:
+        float: Resident memory in MB.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource  # not available on Windows
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KB on Linux
+        if sys.platform == "darwin":
+            return max_rss / (1024 * 1024)
+        return max_rss / 1024
+
+
+### function: get_process_age ###
+def get_process_age():
+    """
+    Returns the number of seconds elapsed since the current process started,
+    read from /proc (Linux only).
+
+    Returns:
+        float: Age of the process in seconds, None if it cannot be measured.
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # The command name may contain spaces: fields are counted after its closing parenthesis
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
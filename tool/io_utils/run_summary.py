@@ -0,0 +1,159 @@
+import os
+import json
+import time
+
+
+### function: create_run_summary ###
+def create_run_summary():
+    """
+    Creates an empty run summary used to collect statistics during a pipeline run.
+
+    Returns:
+        dict: The summary, with per roof type outcomes, generic counters and failures.
+    """
+    return {
+        'started_at': time.time(),
+        'execution_time': None,
+        'roof_types': {},
+        'counters': {},
+        'sections': {},
+        'failures': [],
+        'timings': [],
+    }
+
+
+### function: increment_counter ###
+def increment_counter(summary, key, amount=1):
+    """
+    Increments a generic counter of the run summary.
+
+    Args:
+        summary (dict): Run summary created by create_run_summary.
+        key (str): Counter name.
+        amount (int | float): Value to add to the counter.
+    """
+    summary['counters'][key] = summary['counters'].get(key, 0) + amount
+
+
+### function: update_section ###
+def update_section(summary, name, values):
+    """
+    Stores a group of statistics produced by a pipeline stage (e.g. 'preflight').
+
+    Args:
+        summary (dict): Run summary created by create_run_summary.
+        name (str): Name of the section.
+        values (dict): Statistics to merge into the section.
+    """
+    summary['sections'].setdefault(name, {}).update(values)
+
+
+### function: record_outcome ###
+def record_outcome(summary, roof_type, outcome):
+    """
+    Records the outcome of a building for the given roof type.
+
+    Args:
+        summary (dict): Run summary created by create_run_summary.
+        roof_type (str): Roof type the building was processed with.
+        outcome (str): One of 'done', 'failed' or 'fallback'.
+    """
+    per_type = summary['roof_types'].setdefault(str(roof_type), {'done': 0, 'failed': 0, 'fallback': 0})
+    per_type[outcome] = per_type.get(outcome, 0) + 1
+
+
+### function: record_timing ###
+def record_timing(summary, idx, seconds, **features):
+    """
+    Records the processing time of a building together with the features
+    describing it (roof type, vertex count, ...).
+
+    Args:
+        summary (dict): Run summary created by create_run_summary.
+        idx (int): Index of the building.
+        seconds (float): Wall-clock time spent on the building.
+        **features: Additional values stored with the timing.
+    """
+    summary['timings'].append(dict(index=idx, seconds=round(seconds, 6), **features))
+
+
+### function: record_qa ###
+def record_qa(summary, idx, report):
+    """
+    Stores the QA flags of a building and counts the failed checks.
+
+    Args:
+        summary (dict): Run summary created by create_run_summary.
+        idx (int): Index of the building.
+        report (dict): Report returned by mesh_qa.check_mesh.
+    """
+    summary.setdefault('qa', []).append(dict(index=idx, **report))
+    increment_counter(summary, 'qa_checked')
+    if not report['passed']:
+        increment_counter(summary, 'qa_failed')
+    for issue in report['issues']:
+        increment_counter(summary, f'qa_{issue}')
+
+
+### function: record_failure ###
+def record_failure(summary, idx, stage, error):
+    """
+    Stores a failure of a building so that it appears in the final report.
+
+    Args:
+        summary (dict): Run summary created by create_run_summary.
+        idx (int): Index of the building.
+        stage (str): Pipeline stage where the failure happened (e.g. 'roof', 'export').
+        error (str): Description of the error.
+    """
+    summary['failures'].append({'index': idx, 'stage': stage, 'error': str(error)})
+
+
+### function: print_run_summary ###
+def print_run_summary(summary, print_fn=print):
+    """
+    Prints a human readable version of the run summary.
+
+    Args:
+        summary (dict): Run summary created by create_run_summary.
+        print_fn (callable): Function used to print each line.
+    """
+    print_fn("===== Run summary =====")
+    for roof_type, outcomes in sorted(summary['roof_types'].items()):
+        print_fn(f"  {roof_type}: " + ", ".join(f"{k}={v}" for k, v in outcomes.items()))
+
+    for key, value in sorted(summary['counters'].items()):
+        print_fn(f"  {key}: {value}")
+
+    for name, values in summary['sections'].items():
+        print_fn(f"  [{name}] " + ", ".join(f"{k}={v}" for k, v in values.items()))
+
+    if summary['failures']:
+        print_fn(f"  failures: {len(summary['failures'])}")
+        for failure in summary['failures']:
+            print_fn(f"    - Building_{failure['index']} [{failure['stage']}]: {failure['error']}")
+
+    if summary['execution_time'] is not None:
+        print_fn(f"  execution time: {summary['execution_time']:.4f} seconds")
+
+
+### function: save_run_summary ###
+def save_run_summary(summary, output_folder, filename="run_summary.json"):
+    """
+    Saves the run summary as JSON in the output folder.
+
+    Args:
+        summary (dict): Run summary created by create_run_summary.
+        output_folder (str): Folder where the summary will be written.
+        filename (str): Name of the JSON file.
+
+    Returns:
+        str: Path of the written file.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    path = os.path.join(output_folder, filename)
+
+    with open(path, 'w') as f:
+        json.dump(summary, f, indent=2, default=str)
+
+    return path
@@ -0,0 +1,431 @@
+import os
+import json
+import time
+import heapq
+import sqlite3
+
+from io_utils.job_queue import _Transaction
+
+
+SCHEDULE_NAME = ".lod2_schedule.sqlite"
+COST_MODEL_NAME = "cost_model.json"
+
+# Prior seconds per building: base + per vertex + per hole, by roof type, before any calibration
+DEFAULT_COEFFICIENTS = {
+    'flat': [0.05, 0.002, 0.02],
+    'gabled': [0.2, 0.005, 0.05],
+    'hip': [0.5, 0.01, 0.1],
+    'pyramid': [0.5, 0.01, 0.1],
+    'gabled-L': [0.6, 0.01, 0.1],
+}
+DEFAULT_ROUND_FACTOR = 2.0
+
+# Calibrated coefficients are only trusted with enough samples
+MIN_SAMPLES = 8
+
+SCHEDULE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buildings (
+    rank INTEGER PRIMARY KEY,
+    building_index INTEGER UNIQUE NOT NULL,
+    cost REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT
+);
+CREATE INDEX IF NOT EXISTS buildings_status ON buildings (status, rank);
+CREATE TABLE IF NOT EXISTS tasks (
+    name TEXT PRIMARY KEY,
+    worker TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+### function: _solve_least_squares ###
+def _solve_least_squares(rows, targets):
+    """
+    Ordinary least squares through the normal equations (Gaussian elimination with
+    partial pivoting), small enough to stay in pure Python.
+
+    Returns:
+        list: The coefficients, None if the system is singular.
+    """
+    n = len(rows[0])
+    a = [[sum(r[i] * r[j] for r in rows) for j in range(n)] + [sum(r[i] * t for r, t in zip(rows, targets))]
+         for i in range(n)]
+
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        if abs(a[pivot][col]) < 1e-12:
+            return None
+        a[col], a[pivot] = a[pivot], a[col]
+        for r in range(n):
+            if r != col:
+                factor = a[r][col] / a[col][col]
+                a[r] = [x - factor * y for x, y in zip(a[r], a[col])]
+
+    return [a[i][n] / a[i][i] for i in range(n)]
+
+
+class CostModel:
+    """
+    Predicts the processing time of a building from its roof type, vertex and hole
+    counts and rounding: seconds = base + per_vertex * vertices + per_hole * holes,
+    with one set of coefficients per roof type (and per rounding, once calibrated).
+
+    Pure Python, so that main.py can use it outside Blender.
+
+    Args:
+        coefficients (dict): 'roof' or 'roof|round' -> [base, per_vertex, per_hole].
+        round_factor (float): Multiplier of the rounded buildings without calibrated coefficients.
+    """
+
+    def __init__(self, coefficients=None, round_factor=DEFAULT_ROUND_FACTOR):
+        self.coefficients = dict(DEFAULT_COEFFICIENTS)
+        self.coefficients.update(coefficients or {})
+        self.round_factor = round_factor
+
+    def predict(self, roof, vertices, holes, round_edges=False):
+        key = f"{roof}|round" if round_edges else str(roof)
+        factor = 1.0
+        if key not in self.coefficients:
+            key = str(roof) if str(roof) in self.coefficients else 'flat'
+            factor = self.round_factor if round_edges else 1.0
+
+        base, per_vertex, per_hole = self.coefficients[key]
+        return max(base + per_vertex * vertices + per_hole * holes, 1e-4) * factor
+
+    @classmethod
+    def fit(cls, timings, previous=None):
+        """
+        Calibrates the coefficients from the timing records of a run summary
+        ('seconds', 'roof', 'vertices', 'holes', 'round_edges').
+
+        Args:
+            timings (list of dict): Timing records.
+            previous (CostModel, optional): Model whose coefficients are kept for the groups without enough samples.
+
+        Returns:
+            CostModel: The calibrated model.
+        """
+        groups = {}
+        for t in timings:
+            if t.get('vertices') is None:
+                continue
+            key = f"{t.get('roof')}|round" if t.get('round_edges') else str(t.get('roof'))
+            groups.setdefault(key, []).append(t)
+
+        coefficients = dict(previous.coefficients) if previous else {}
+        for key, records in groups.items():
+            if len(records) < MIN_SAMPLES:
+                continue
+            rows = [[1.0, float(t['vertices']), float(t.get('holes') or 0)] for t in records]
+            seconds = [t['seconds'] for t in records]
+
+            # Without holes in the sample the hole term is not identifiable: the prior one is kept
+            if any(r[2] for r in rows):
+                solution = _solve_least_squares(rows, seconds)
+            else:
+                prior = coefficients.get(key) or DEFAULT_COEFFICIENTS.get(key.split('|')[0], DEFAULT_COEFFICIENTS['flat'])
+                solution = _solve_least_squares([r[:2] for r in rows], seconds)
+                solution = solution + [prior[2]] if solution else None
+
+            if solution:
+                coefficients[key] = [max(c, 0.0) for c in solution]
+
+        plain = {k: v for k, v in coefficients.items() if not k.endswith('|round')}
+        rounded = {k: v for k, v in coefficients.items() if k.endswith('|round') and k[:-6] in plain}
+        round_factor = previous.round_factor if previous else DEFAULT_ROUND_FACTOR
+        if rounded:
+            # Mean ratio rounded / plain for an average footprint (10 vertices)
+            ratios = [(sum(v * w for v, w in zip(rounded[k], (1, 10, 0))) /
+                       max(sum(v * w for v, w in zip(plain[k[:-6]], (1, 10, 0))), 1e-6)) for k in rounded]
+            round_factor = sum(ratios) / len(ratios)
+
+        return cls(coefficients, round_factor)
+
+    def to_dict(self):
+        return {'coefficients': self.coefficients, 'round_factor': self.round_factor}
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a saved model, or returns the default priors if the file does not exist.
+        """
+        if not path or not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['coefficients'], data.get('round_factor', DEFAULT_ROUND_FACTOR))
+
+
+### function: lpt_order ###
+def lpt_order(costs):
+    """
+    Longest-processing-time-first order.
+
+    Args:
+        costs (dict): Building index -> predicted seconds.
+
+    Returns:
+        list of tuple: (index, cost), most expensive first (ties by index).
+    """
+    return sorted(costs.items(), key=lambda item: (-item[1], item[0]))
+
+
+### function: list_schedule_makespan ###
+def list_schedule_makespan(durations, workers):
+    """
+    Makespan of a dynamic dispatch: every job, in order, goes to the first free worker.
+    """
+    finish = [0.0] * max(workers, 1)
+    for duration in durations:
+        heapq.heapreplace(finish, finish[0] + duration)
+    return max(finish)
+
+
+### function: static_split_makespan ###
+def static_split_makespan(durations, workers):
+    """
+    Makespan of a static split of the jobs in contiguous chunks of equal count.
+    """
+    chunk = max(-(-len(durations) // max(workers, 1)), 1)
+    return max((sum(durations[i:i + chunk]) for i in range(0, len(durations), chunk)), default=0.0)
+
+
+### function: schedule_report ###
+def schedule_report(timings, dispatch_order, workers, wall_seconds=None):
+    """
+    Compares, with the measured building times, the makespan of the static
+    index-order split, of the dynamic dispatch in index order and of the dynamic
+    longest-processing-time-first dispatch actually used, and the accuracy of the
+    cost model.
+
+    Args:
+        timings (list of dict): Timing records of the run ('index', 'seconds').
+        dispatch_order (list of tuple): (index, predicted cost) in dispatch order.
+        workers (int): Number of parallel workers.
+        wall_seconds (float, optional): Measured wall-clock time of the run.
+
+    Returns:
+        dict: The 'schedule' section of the run summary.
+    """
+    measured = {t['index']: t['seconds'] for t in timings}
+    by_index = [measured[idx] for idx in sorted(measured)]
+    lpt = [measured[idx] for idx, _ in dispatch_order if idx in measured]
+
+    static = static_split_makespan(by_index, workers)
+    dynamic = list_schedule_makespan(by_index, workers)
+    lpt_makespan = list_schedule_makespan(lpt, workers)
+    total = sum(by_index)
+
+    report = {
+        'workers': workers,
+        'buildings': len(by_index),
+        'total_seconds': round(total, 3),
+        'lower_bound_seconds': round(max(total / max(workers, 1), max(by_index, default=0.0)), 3),
+        'static_makespan_seconds': round(static, 3),
+        'dynamic_index_makespan_seconds': round(dynamic, 3),
+        'lpt_makespan_seconds': round(lpt_makespan, 3),
+        'lpt_improvement_percent': round(100.0 * (static - lpt_makespan) / static, 2) if static > 0 else 0.0,
+    }
+    if wall_seconds is not None:
+        report['wall_seconds'] = round(wall_seconds, 3)
+
+    predicted = [(cost, measured[idx]) for idx, cost in dispatch_order if idx in measured]
+    if predicted:
+        report['predicted_total_seconds'] = round(sum(p for p, _ in predicted), 3)
+        report['cost_model_mean_abs_error_seconds'] = round(sum(abs(p - m) for p, m in predicted) / len(predicted), 4)
+
+    return report
+
+
+class BuildingSchedule:
+    """
+    Claim table of the buildings shared by the parallel Blender workers of a run
+    (SQLite file of the output folder).
+
+    Buildings are ranked longest-processing-time-first. A worker claims the next
+    pending buildings until their predicted cost reaches `min_claim_seconds`, so
+    that the expensive buildings are dispatched one at a time and the cheap ones
+    in batches, and marks each of them done when written.
+
+    Like the job queue, the table uses the rollback journal: the output folder may be
+    on NFS (batch generation), where WAL does not work.
+
+    Args:
+        path (str): Path of the SQLite file.
+        timeout (float): Seconds to wait for the database lock.
+    """
+
+    def __init__(self, path, timeout=60.0):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.executescript(SCHEDULE_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, order):
+        """
+        Ranks the buildings. The first worker inserts them, the others (computing the
+        same order) and the recycled ones leave the table untouched.
+
+        Args:
+            order (list of tuple): (index, predicted cost) in dispatch order.
+
+        Returns:
+            int: Number of buildings added.
+        """
+        with _Transaction(self.conn) as cur:
+            if cur.execute("SELECT COUNT(*) FROM buildings").fetchone()[0]:
+                return 0
+            cur.executemany("INSERT INTO buildings (rank, building_index, cost) VALUES (?, ?, ?)",
+                            [(rank, idx, cost) for rank, (idx, cost) in enumerate(order)])
+            return len(order)
+
+    def release(self, worker_id):
+        """
+        Puts back the buildings claimed by a previous incarnation of a worker (recycled or crashed).
+        """
+        with _Transaction(self.conn) as cur:
+            cur.execute("UPDATE buildings SET status = 'pending', worker = NULL WHERE status = 'running' AND worker = ?",
+                        (worker_id,))
+            return cur.rowcount
+
+    def requeue_running(self):
+        """
+        Puts back the buildings left running by workers that stopped without being
+        recycled (crashed Blender). Only called once no worker is running.
+
+        Returns:
+            int: Number of buildings put back.
+        """
+        with _Transaction(self.conn) as cur:
+            cur.execute("UPDATE buildings SET status = 'pending', worker = NULL WHERE status = 'running'")
+            return cur.rowcount
+
+    def reassign_tasks(self, worker_id):
+        """
+        Gives the tasks not finished by their worker to another one. Only called once no worker is running.
+        """
+        with _Transaction(self.conn) as cur:
+            cur.execute("UPDATE tasks SET worker = ? WHERE done = 0", (worker_id,))
+            return cur.rowcount
+
+    def remaining(self):
+        """
+        Returns:
+            tuple: (buildings not done, workers that claimed buildings in the run).
+        """
+        not_done = self.conn.execute("SELECT COUNT(*) FROM buildings WHERE status != 'done'").fetchone()[0]
+        workers = self.conn.execute("SELECT COUNT(DISTINCT worker) FROM buildings").fetchone()[0]
+        return not_done, workers
+
+    def unfinished(self):
+        """
+        Returns:
+            list of int: Indices of the buildings not done, in dispatch order.
+        """
+        return [idx for (idx,) in self.conn.execute("SELECT building_index FROM buildings WHERE status != 'done' "
+                                                    "ORDER BY rank").fetchall()]
+
+    def claim(self, worker_id, min_claim_seconds=1.0, max_claim=256):
+        """
+        Returns:
+            list of int: Indices of the claimed buildings, empty when none is pending.
+        """
+        with _Transaction(self.conn) as cur:
+            rows = cur.execute("SELECT rank, building_index, cost FROM buildings WHERE status = 'pending' "
+                               "ORDER BY rank LIMIT ?", (max_claim,)).fetchall()
+            claimed, total = [], 0.0
+            for rank, idx, cost in rows:
+                claimed.append((rank, idx))
+                total += cost
+                if total >= min_claim_seconds:
+                    break
+            cur.executemany("UPDATE buildings SET status = 'running', worker = ? WHERE rank = ?",
+                            [(worker_id, rank) for rank, _ in claimed])
+        return [idx for _, idx in claimed]
+
+    def claim_task(self, name, worker_id):
+        """
+        Claims a task run by a single worker of the run (e.g. the batch of flat prisms).
+
+        Returns:
+            bool: True if the task belongs to this worker (first claim, or claimed by its previous incarnation).
+        """
+        with _Transaction(self.conn) as cur:
+            cur.execute("INSERT OR IGNORE INTO tasks (name, worker) VALUES (?, ?)", (name, worker_id))
+            return cur.execute("SELECT worker FROM tasks WHERE name = ?", (name,)).fetchone()[0] == worker_id
+
+    def finish_task(self, name):
+        with _Transaction(self.conn) as cur:
+            cur.execute("UPDATE tasks SET done = 1 WHERE name = ?", (name,))
+
+    def task_done(self, name):
+        row = self.conn.execute("SELECT done FROM tasks WHERE name = ?", (name,)).fetchone()
+        return bool(row and row[0])
+
+    def wait_task(self, name, poll_seconds=1.0):
+        """
+        Waits until the worker owning a task has finished it.
+        """
+        while not self.task_done(name):
+            time.sleep(poll_seconds)
+
+    def complete(self, idx):
+        with _Transaction(self.conn) as cur:
+            cur.execute("UPDATE buildings SET status = 'done' WHERE building_index = ?", (idx,))
+
+    def order(self):
+        """
+        Returns:
+            list of tuple: (index, predicted cost) in dispatch order.
+        """
+        return self.conn.execute("SELECT building_index, cost FROM buildings ORDER BY rank").fetchall()
+
+    def counts(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM buildings GROUP BY status").fetchall())
+
+
+### function: merge_worker_summaries ###
+def merge_worker_summaries(summaries, additive_exclude=('buildings',)):
+    """
+    Merges the run summaries of the parallel workers: outcomes, counters, timings,
+    failures and QA records are summed or concatenated; the sections (identical
+    preprocessing in every worker) are taken from the first worker.
+
+    Args:
+        summaries (list of dict): Run summaries of the workers.
+        additive_exclude (tuple): Counters counting the whole input in every worker.
+
+    Returns:
+        dict: The merged run summary.
+    """
+    merged = {'started_at': min(s['started_at'] for s in summaries), 'execution_time': None,
+              'roof_types': {}, 'counters': {}, 'sections': dict(summaries[0]['sections']),
+              'timings': [], 'failures': []}
+
+    for summary in summaries:
+        for roof_type, outcomes in summary['roof_types'].items():
+            per_type = merged['roof_types'].setdefault(roof_type, {})
+            for outcome, count in outcomes.items():
+                per_type[outcome] = per_type.get(outcome, 0) + count
+        for key, value in summary['counters'].items():
+            if key in additive_exclude:
+                merged['counters'][key] = max(merged['counters'].get(key, 0), value)
+            else:
+                merged['counters'][key] = merged['counters'].get(key, 0) + value
+        merged['timings'].extend(summary['timings'])
+        merged['failures'].extend(summary['failures'])
+        if summary.get('qa'):
+            merged.setdefault('qa', []).extend(summary['qa'])
+
+    merged['timings'].sort(key=lambda t: t['index'])
+    merged['execution_time'] = time.time() - merged['started_at']
+    return merged
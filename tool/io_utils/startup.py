@@ -0,0 +1,124 @@
+import os
+import json
+
+
+# Blender options of the fast startup mode: no user preferences nor user add-ons, no audio device
+FAST_STARTUP_OPTIONS = "--factory-startup --noaudio"
+
+IMPORT_LOG_NAME = "import_times.log"
+
+
+### function: blender_startup_options ###
+def blender_startup_options(factory_startup=False, profile_imports=False):
+    """
+    Builds the Blender options and the environment prefix of a worker command.
+
+    With profile_imports, Blender's Python runs with PYTHONPROFILEIMPORTTIME (the
+    environment equivalent of `python -X importtime`), which the embedded interpreter
+    only honours with --python-use-system-env.
+
+    Args:
+        factory_startup (bool): Skip the user preferences, the add-ons and the audio device.
+        profile_imports (bool): Log the time spent importing every module on stderr.
+
+    Returns:
+        tuple: (environment prefix, Blender options), both possibly empty strings.
+    """
+    env, options = "", []
+    if factory_startup:
+        options.append(FAST_STARTUP_OPTIONS)
+    if profile_imports:
+        env = "PYTHONPROFILEIMPORTTIME=1 "
+        options.append("--python-use-system-env")
+    return env, " ".join(options)
+
+
+### function: parse_importtime ###
+def parse_importtime(lines):
+    """
+    Parses the output of `-X importtime`:
+
+        import time: self [us] | cumulative | imported package
+        import time:       357 |      13348 | json
+
+    Nesting is given by the indentation of the package name (two spaces per level).
+
+    Args:
+        lines (iterable of str): Lines of the log; other lines are ignored.
+
+    Returns:
+        list of dict: One entry per imported module, with name, depth, self_us and cumulative_us.
+    """
+    entries = []
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        parts = line.rstrip("\n")[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # header line
+
+        name = parts[2][1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        entries.append({'name': name.strip(), 'depth': depth, 'self_us': self_us, 'cumulative_us': cumulative_us})
+
+    return entries
+
+
+### function: summarize_import_times ###
+def summarize_import_times(entries, top=15):
+    """
+    Aggregates the imported modules into a breakdown of the import time.
+
+    Args:
+        entries (list of dict): Output of parse_importtime (possibly of several workers).
+        top (int): Number of top-level imports and root packages reported.
+
+    Returns:
+        dict: Total import time, slowest top-level imports (cumulative) and root packages (self time).
+    """
+    top_level, packages = {}, {}
+    for entry in entries:
+        if entry['depth'] == 0:
+            top_level[entry['name']] = top_level.get(entry['name'], 0) + entry['cumulative_us']
+        root = entry['name'].split(".")[0]
+        packages[root] = packages.get(root, 0) + entry['self_us']
+
+    def ranked(values):
+        items = sorted(values.items(), key=lambda item: item[1], reverse=True)[:top]
+        return [{'module': name, 'seconds': round(us / 1e6, 4)} for name, us in items]
+
+    return {
+        'modules': len(entries),
+        'total_seconds': round(sum(top_level.values()) / 1e6, 4),
+        'top_level': ranked(top_level),
+        'packages': ranked(packages),
+    }
+
+
+### function: report_import_times ###
+def report_import_times(log_path, output_folder, top=15):
+    """
+    Summarizes an import time log, prints the breakdown and saves it as
+    import_times.json in the output folder.
+
+    Returns:
+        dict: The breakdown, None if the log is missing.
+    """
+    if not os.path.isfile(log_path):
+        return None
+
+    with open(log_path, errors='replace') as f:
+        breakdown = summarize_import_times(parse_importtime(f), top)
+
+    print(f"===== Import time: {breakdown['total_seconds']:.3f}s over {breakdown['modules']} modules =====")
+    for item in breakdown['top_level']:
+        print(f"  {item['seconds']:>8.3f}s  {item['module']}")
+
+    with open(os.path.join(output_folder, "import_times.json"), 'w') as f:
+        json.dump(breakdown, f, indent=2)
+
+    return breakdown
@@ -0,0 +1,427 @@
+import os
+import json
+import glob
+import shutil
+import threading
+import numpy as np
+
+from io_utils.compact import pack_glb, _pad4
+from modeling.prism import footprint_polygon, build_prism
+
+
+TILES_FOLDER = "tiles"
+STAGING_FOLDER = ".staging"
+
+# Geometric error of an LOD1 tile, as a fraction of its side
+LOD1_ERROR_RATIO = 1.0 / 32
+
+
+### function: _to_y_up ###
+def _to_y_up(points):
+    return np.column_stack([points[:, 0], points[:, 2], -points[:, 1]])
+
+
+### function: encode_tile_glb ###
+def encode_tile_glb(vertices, faces, feature_ids, properties):
+    """
+    Encodes the buildings of a tile as a single batched GLB, with the features and
+    their properties described by EXT_mesh_features and EXT_structural_metadata.
+
+    Triangles are unwelded so that every face gets its own normal (flat shading).
+
+    Args:
+        vertices (np.ndarray): (N, 3) Z-up vertices relative to the tileset origin.
+        faces (np.ndarray): (M, 3) triangle indices.
+        feature_ids (np.ndarray): (M,) feature (row of the property table) of every triangle.
+        properties (dict): name -> (component type 'UINT32', 'FLOAT32' or 'STRING', list of values per feature).
+
+    Returns:
+        bytes: The GLB content.
+    """
+    tri = np.asarray(vertices, dtype=np.float64)[np.asarray(faces, dtype=np.int64)]
+    normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+
+    positions = _to_y_up(tri.reshape(-1, 3)).astype('<f4')
+    normals = _to_y_up(np.repeat(normals, 3, axis=0)).astype('<f4')
+    ids = np.repeat(np.asarray(feature_ids, dtype='<f4'), 3)
+
+    chunks, buffer_views = [], []
+
+    def add_view(data, target=None):
+        offset = sum(len(c) for c in chunks)
+        chunks.append(_pad4(data))
+        view = {'buffer': 0, 'byteOffset': offset, 'byteLength': len(data)}
+        if target:
+            view['target'] = target
+        buffer_views.append(view)
+        return len(buffer_views) - 1
+
+    accessors = [
+        {'bufferView': add_view(positions.tobytes(), 34962), 'componentType': 5126, 'count': len(positions),
+         'type': 'VEC3', 'min': positions.min(axis=0).tolist(), 'max': positions.max(axis=0).tolist()},
+        {'bufferView': add_view(normals.tobytes(), 34962), 'componentType': 5126, 'count': len(normals), 'type': 'VEC3'},
+        {'bufferView': add_view(ids.tobytes(), 34962), 'componentType': 5126, 'count': len(ids), 'type': 'SCALAR'},
+    ]
+
+    feature_count = len(next(iter(properties.values()))[1])
+    class_properties, table_properties = {}, {}
+    for name, (component_type, values) in properties.items():
+        if component_type == 'STRING':
+            encoded = [str(v).encode('utf-8') for v in values]
+            offsets = np.concatenate([[0], np.cumsum([len(e) for e in encoded])]).astype('<u4')
+            class_properties[name] = {'type': 'STRING'}
+            table_properties[name] = {'values': add_view(b''.join(encoded)), 'stringOffsets': add_view(offsets.tobytes())}
+        else:
+            dtype = '<u4' if component_type == 'UINT32' else '<f4'
+            class_properties[name] = {'type': 'SCALAR', 'componentType': component_type}
+            table_properties[name] = {'values': add_view(np.asarray(values, dtype=dtype).tobytes())}
+
+    binary = b''.join(chunks)
+    gltf = {
+        'asset': {'version': '2.0', 'generator': '3dom-lod2-generator'},
+        'extensionsUsed': ['EXT_mesh_features', 'EXT_structural_metadata'],
+        'extensions': {'EXT_structural_metadata': {
+            'schema': {'id': 'lod2', 'classes': {'building': {'properties': class_properties}}},
+            'propertyTables': [{'class': 'building', 'count': feature_count, 'properties': table_properties}],
+        }},
+        'scene': 0,
+        'scenes': [{'nodes': [0]}],
+        'nodes': [{'mesh': 0}],
+        'materials': [{'pbrMetallicRoughness': {'baseColorFactor': [0.85, 0.85, 0.82, 1.0], 'metallicFactor': 0.0,
+                                                'roughnessFactor': 1.0}}],
+        'meshes': [{'primitives': [{
+            'attributes': {'POSITION': 0, 'NORMAL': 1, '_FEATURE_ID_0': 2},
+            'material': 0, 'mode': 4,
+            'extensions': {'EXT_mesh_features': {'featureIds': [
+                {'featureCount': feature_count, 'attribute': 0, 'propertyTable': 0}]}},
+        }]}],
+        'buffers': [{'byteLength': len(binary)}],
+        'bufferViews': buffer_views,
+        'accessors': accessors,
+    }
+
+    return pack_glb(gltf, binary)
+
+
+### function: build_quadtree ###
+def build_quadtree(polygons, max_features=256, max_depth=8):
+    """
+    Groups the footprints into a quadtree: a node is split in four until it holds
+    at most max_features buildings (by center of their bounding box).
+
+    Args:
+        polygons (list of dict): Footprints ('exterior' in shifted coordinates, 'index').
+        max_features (int): Maximum number of buildings of a leaf.
+        max_depth (int): Maximum depth of the tree.
+
+    Returns:
+        dict: (level, x, y) -> node dict with 'bounds' (quadtree cell), 'extent' (footprints
+        of its buildings), 'buildings' (leaves only) and 'children'.
+    """
+    bounds = np.array([[*np.min(np.asarray(p['exterior'])[:, :2], axis=0), *np.max(np.asarray(p['exterior'])[:, :2], axis=0)]
+                       for p in polygons])
+    centers = (bounds[:, :2] + bounds[:, 2:]) / 2
+    indices = np.array([p['index'] for p in polygons])
+
+    origin = bounds[:, :2].min(axis=0)
+    size = max(float((bounds[:, 2:].max(axis=0) - origin).max()), 1.0) * (1 + 1e-9)
+
+    nodes = {}
+
+    def split(level, x, y, members):
+        side = size / 2 ** level
+        node = {'bounds': (origin[0] + x * side, origin[1] + y * side, origin[0] + (x + 1) * side, origin[1] + (y + 1) * side),
+                'extent': (*bounds[members, :2].min(axis=0).tolist(), *bounds[members, 2:].max(axis=0).tolist()),
+                'children': [], 'buildings': []}
+        nodes[(level, x, y)] = node
+
+        if len(members) <= max_features or level == max_depth:
+            node['buildings'] = indices[members].tolist()
+            return
+
+        cell = np.floor((centers[members] - origin) / (side / 2)).astype(np.int64) - (2 * x, 2 * y)
+        cell = np.clip(cell, 0, 1)
+        for dx in (0, 1):
+            for dy in (0, 1):
+                child = members[(cell[:, 0] == dx) & (cell[:, 1] == dy)]
+                if len(child):
+                    node['children'].append((level + 1, 2 * x + dx, 2 * y + dy))
+                    split(level + 1, 2 * x + dx, 2 * y + dy, child)
+
+    split(0, 0, 0, np.arange(len(polygons)))
+    return nodes
+
+
+### function: enu_to_ecef_transform ###
+def enu_to_ecef_transform(srs, x, y):
+    """
+    Computes the transform placing the local (projected, Z-up) frame of the tileset
+    at its position on the globe, from the projected axes at the origin (grid
+    convergence and scale factor included). Requires pyproj.
+
+    Args:
+        srs (tuple): (srs_id, organization, definition) of the footprints.
+        x (float): X of the tileset origin.
+        y (float): Y of the tileset origin.
+
+    Returns:
+        list: Column-major 4x4 matrix, None if the CRS is unknown or pyproj is missing.
+    """
+    srs_id, organization, definition = srs
+    try:
+        from pyproj import CRS, Transformer
+        crs = CRS.from_wkt(definition) if definition != 'undefined' else CRS.from_epsg(srs_id)
+        to_ecef = Transformer.from_crs(crs, "EPSG:4978", always_xy=True)
+    except Exception as e:
+        print(f"⚠ Tileset not georeferenced ({type(e).__name__}: {e})")
+        return None
+
+    step = 100.0
+    p0, px, py = (np.array(to_ecef.transform(x + dx, y + dy, 0.0)) for dx, dy in ((0, 0), (step, 0), (0, step)))
+    east, north = (px - p0) / step, (py - p0) / step
+    up = np.cross(east, north)
+    up /= np.linalg.norm(up)
+
+    return [*east, 0.0, *north, 0.0, *up, 0.0, *p0, 1.0]
+
+
+class TilesetWriter:
+    """
+    Writes the buildings as 3D Tiles 1.1: a quadtree of batched GLB tiles described
+    by tileset.json, with one feature per building (building_id, roof, height and
+    fallback properties).
+
+    Leaves hold the LOD2 meshes, coarser levels hold LOD1 prisms of the same footprints
+    (REPLACE refinement). A leaf is written as soon as all of its buildings are done,
+    and a parent as soon as all of its children are written; the meshes of unfinished
+    leaves are staged on disk, so that recycled workers carry on where the previous ones
+    stopped. tileset.json is written by finalize, at the end of the run.
+
+    Args:
+        folder (str): Output folder of the tileset.
+        polygons (list of dict): All the footprints of the run ('exterior', 'holes', 'index').
+        x_offset (float): X of the tileset origin.
+        y_offset (float): Y of the tileset origin.
+        srs (tuple): (srs_id, organization, definition), used to georeference the tileset.
+        max_features (int): Maximum number of buildings of a leaf.
+        max_depth (int): Maximum depth of the quadtree.
+        resume (bool): Keep the tiles and staged meshes of a previous worker.
+    """
+
+    def __init__(self, folder, polygons, x_offset, y_offset, srs=(-1, 'NONE', 'undefined'), max_features=256,
+                 max_depth=8, resume=False):
+        self.folder = folder
+        self.path = os.path.join(folder, "tileset.json")
+        self.x_offset, self.y_offset = x_offset, y_offset
+        self.srs = srs
+        self.footprints = {p['index']: p for p in polygons}
+        self.nodes = build_quadtree(polygons, max_features, max_depth)
+
+        self.leaf_of = {idx: key for key, node in self.nodes.items() for idx in node['buildings']}
+        self.parent_of = {child: key for key, node in self.nodes.items() for child in node['children']}
+
+        self.staging = os.path.join(folder, STAGING_FOLDER)
+        if not resume:
+            shutil.rmtree(os.path.join(folder, TILES_FOLDER), ignore_errors=True)
+            shutil.rmtree(self.staging, ignore_errors=True)
+        os.makedirs(self.staging, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.written = 0
+        self.finished = {key: set() for key, node in self.nodes.items() if not node['children']}
+        for staged in glob.glob(os.path.join(self.staging, "b_*")):
+            idx = int(os.path.basename(staged)[2:].split(".")[0])
+            if idx in self.leaf_of:
+                self.finished[self.leaf_of[idx]].add(idx)
+
+    def _tile_path(self, key):
+        level, x, y = key
+        return os.path.join(self.folder, TILES_FOLDER, str(level), f"{x}_{y}.glb")
+
+    def _meta_path(self, key):
+        return os.path.join(self.staging, "tile_{}_{}_{}.json".format(*key))
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def add_building(self, idx, vertices, faces, x_offset, y_offset, poly, fallback=False):
+        """
+        Stages the mesh of a finished building and writes its tile if it completes it.
+        Same interface as GeoPackageStore.add_building.
+        """
+        tmp_path = os.path.join(self.staging, f"tmp_{idx}.npz")
+        np.savez(tmp_path, vertices=vertices, faces=faces,
+                 heights=np.array([poly.get('z_min') or 0.0, poly.get('z_max') or 0.0]),
+                 roof=str(poly.get('roof')), fallback=bool(fallback))
+        os.replace(tmp_path, os.path.join(self.staging, f"b_{idx}.npz"))
+        self._building_finished(idx)
+
+    def skip_building(self, idx):
+        """
+        Records a building without mesh, so that its tile does not wait for it.
+        """
+        open(os.path.join(self.staging, f"b_{idx}.skip"), 'w').close()
+        self._building_finished(idx)
+
+    def _building_finished(self, idx):
+        key = self.leaf_of.get(idx)
+        if key is None:
+            return
+        with self.lock:
+            self.finished[key].add(idx)
+            if len(self.finished[key]) == len(self.nodes[key]['buildings']) and not os.path.exists(self._meta_path(key)):
+                self._write_leaf(key)
+
+    def _write_leaf(self, key):
+        vertices, faces, feature_ids = [], [], []
+        properties = {'building_id': ('UINT32', []), 'roof': ('STRING', []), 'height': ('FLOAT32', []),
+                      'fallback': ('UINT32', [])}
+        heights, count = {}, 0
+
+        for idx in self.nodes[key]['buildings']:
+            staged = os.path.join(self.staging, f"b_{idx}.npz")
+            if not os.path.exists(staged):
+                continue
+            with np.load(staged) as data:
+                if len(data['faces']) == 0:
+                    continue
+                faces.append(data['faces'] + count)
+                vertices.append(data['vertices'])
+                count += len(data['vertices'])
+                feature_ids.append(np.full(len(data['faces']), len(properties['building_id'][1])))
+                z_min, z_max = data['heights'].tolist()
+                heights[idx] = [z_min, z_max]
+                properties['building_id'][1].append(idx)
+                properties['roof'][1].append(str(data['roof']))
+                properties['height'][1].append(z_max - z_min)
+                properties['fallback'][1].append(int(data['fallback']))
+
+        z_range = None
+        if faces:
+            vertices = np.concatenate(vertices)
+            self._write_atomic(self._tile_path(key), encode_tile_glb(vertices, np.concatenate(faces),
+                                                                     np.concatenate(feature_ids), properties))
+            z_range = [float(vertices[:, 2].min()), float(vertices[:, 2].max())]
+
+        # Heights are kept for the LOD1 parents and the bounding volumes
+        with open(self._meta_path(key), 'w') as f:
+            json.dump({'heights': {str(k): v for k, v in heights.items()}, 'z_range': z_range, 'content': bool(faces)}, f)
+
+        for idx in self.nodes[key]['buildings']:
+            for suffix in ('.npz', '.skip'):
+                if os.path.exists(os.path.join(self.staging, f"b_{idx}{suffix}")):
+                    os.remove(os.path.join(self.staging, f"b_{idx}{suffix}"))
+
+        self.written += len(heights)
+        print(f"Tile {key} written with {len(heights)} buildings")
+        self._write_parent_if_complete(self.parent_of.get(key))
+
+    def _write_parent_if_complete(self, key):
+        if key is None or not all(os.path.exists(self._meta_path(child)) for child in self.nodes[key]['children']):
+            return
+
+        heights, z_ranges = {}, []
+        for child in self.nodes[key]['children']:
+            with open(self._meta_path(child)) as f:
+                meta = json.load(f)
+            heights.update({int(k): v for k, v in meta['heights'].items()})
+            if meta['z_range']:
+                z_ranges.append(meta['z_range'])
+
+        minx, miny, maxx, maxy = self.nodes[key]['bounds']
+        error = (maxx - minx) * LOD1_ERROR_RATIO
+
+        vertices, faces, feature_ids, count = [], [], [], 0
+        properties = {'building_id': ('UINT32', []), 'height': ('FLOAT32', [])}
+        for idx, (z_min, z_max) in sorted(heights.items()):
+            poly = self.footprints[idx]
+            footprint = footprint_polygon(poly['exterior'], poly['holes'])
+            # Buildings smaller than the error of the tile are left to the finer levels
+            if footprint.length / 4 < error:
+                continue
+            footprint = footprint.simplify(error / 4, preserve_topology=True)
+            if footprint.is_empty or footprint.geom_type != 'Polygon':
+                continue
+
+            v, f = build_prism(footprint_polygon(footprint.exterior.coords, [h.coords for h in footprint.interiors]),
+                               z_min, z_max)
+            if len(f) == 0:
+                continue
+            vertices.append(v)
+            faces.append(f + count)
+            count += len(v)
+            feature_ids.append(np.full(len(f), len(properties['building_id'][1])))
+            properties['building_id'][1].append(idx)
+            properties['height'][1].append(z_max - z_min)
+
+        if faces:
+            self._write_atomic(self._tile_path(key), encode_tile_glb(np.concatenate(vertices), np.concatenate(faces),
+                                                                     np.concatenate(feature_ids), properties))
+
+        z_range = [min(r[0] for r in z_ranges), max(r[1] for r in z_ranges)] if z_ranges else None
+        with open(self._meta_path(key), 'w') as f:
+            json.dump({'heights': {str(k): v for k, v in heights.items()}, 'z_range': z_range, 'content': bool(faces)}, f)
+
+        print(f"LOD1 tile {key} written with {len(properties['building_id'][1])} buildings")
+        self._write_parent_if_complete(self.parent_of.get(key))
+
+    def close(self):
+        """
+        Nothing to flush: tiles are written as they complete and the rest is staged.
+        """
+        pass
+
+    def finalize(self):
+        """
+        Writes the tiles still waiting for buildings (skipped or filtered out) and tileset.json.
+        """
+        with self.lock:
+            for key, node in self.nodes.items():
+                if not node['children'] and not os.path.exists(self._meta_path(key)):
+                    self._write_leaf(key)
+
+            root = self._tile_json((0, 0, 0))
+            tileset = {
+                'asset': {'version': '1.1', 'generator': '3dom-lod2-generator'},
+                'geometricError': root['geometricError'] * 2 if root else 0.0,
+                'root': root or {'boundingVolume': {'box': [0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 1]}, 'geometricError': 0.0},
+            }
+            tileset['root']['refine'] = 'REPLACE'
+
+            transform = enu_to_ecef_transform(self.srs, self.x_offset, self.y_offset)
+            if transform is not None:
+                tileset['root']['transform'] = transform
+
+            self._write_atomic(self.path, json.dumps(tileset, indent=1).encode('utf-8'))
+            shutil.rmtree(self.staging, ignore_errors=True)
+
+        print(f"Tileset saved to: {self.path}")
+
+    def _tile_json(self, key):
+        with open(self._meta_path(key)) as f:
+            meta = json.load(f)
+        if meta['z_range'] is None:
+            return None
+
+        node = self.nodes[key]
+        minx, miny, maxx, maxy = node['extent']
+        z_min, z_max = meta['z_range']
+        box = [(minx + maxx) / 2, (miny + maxy) / 2, (z_min + z_max) / 2,
+               (maxx - minx) / 2, 0, 0, 0, (maxy - miny) / 2, 0, 0, 0, max((z_max - z_min) / 2, 0.01)]
+
+        side = node['bounds'][2] - node['bounds'][0]
+        tile = {'boundingVolume': {'box': box},
+                'geometricError': side * LOD1_ERROR_RATIO if node['children'] else 0.0}
+        if meta['content']:
+            level, x, y = key
+            tile['content'] = {'uri': f"{TILES_FOLDER}/{level}/{x}_{y}.glb"}
+
+        children = [child for child in (self._tile_json(c) for c in node['children']) if child]
+        if children:
+            tile['children'] = children
+        return tile
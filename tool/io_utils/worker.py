@@ -0,0 +1,79 @@
+import os
+import json
+
+from io_utils.resources import get_rss_mb
+
+
+# Exit code used by a Blender worker to ask main.py for a fresh process
+RECYCLE_EXIT_CODE = 75
+
+
+class RecycleWorker(Exception):
+    """
+    Raised when the current worker should stop and be replaced by a fresh process.
+    It carries the position where the next worker has to resume.
+    """
+
+    def __init__(self, reason, position):
+        super().__init__(reason)
+        self.reason = reason
+        self.position = position
+
+
+class WorkerRecycler:
+    """
+    Decides when a long-running Blender worker has to be recycled, either after
+    a number of buildings or when its resident memory exceeds a ceiling.
+    """
+
+    def __init__(self, max_buildings=0, max_rss_mb=0):
+        """
+        Args:
+            max_buildings (int): Buildings processed before recycling (0 disables the limit).
+            max_rss_mb (float): RSS ceiling in MB (0 disables the limit).
+        """
+        self.max_buildings = max_buildings
+        self.max_rss_mb = max_rss_mb
+        self.processed = 0
+
+    def building_done(self):
+        """
+        Registers a processed building.
+
+        Returns:
+            str | None: The reason why the worker should be recycled, None otherwise.
+        """
+        self.processed += 1
+
+        if self.max_buildings and self.processed >= self.max_buildings:
+            return f"{self.processed} buildings processed"
+
+        if self.max_rss_mb:
+            rss = get_rss_mb()
+            if rss > self.max_rss_mb:
+                return f"RSS {rss:.0f} MB above {self.max_rss_mb} MB"
+
+        return None
+
+
+### function: load_checkpoint ###
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+### function: save_checkpoint ###
+def save_checkpoint(path, state):
+    # Write and rename, so that a crash never leaves a truncated checkpoint
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, default=str)
+    os.replace(tmp_path, path)
+
+
+### function: remove_checkpoint ###
+def remove_checkpoint(path):
+    if os.path.exists(path):
+        os.remove(path)
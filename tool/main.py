@@ -1,15 +1,40 @@
 import os
+import sys
+import glob
+import json
+import time
+import shlex
+import shutil
+import socket
 import argparse
+import tempfile
+import threading
 
+from io_utils.worker import RECYCLE_EXIT_CODE
+from io_utils.scheduling import SCHEDULE_NAME, COST_MODEL_NAME, BuildingSchedule, CostModel
+from io_utils.scheduling import schedule_report, merge_worker_summaries
+from io_utils.manifest import finalize_manifest, indices_to_rebuild
+import io_utils.run_summary as run_summary
+from io_utils.startup import IMPORT_LOG_NAME, blender_startup_options, report_import_times
 
 
-def parse_args():
+### function: build_parser ###
+def build_parser(require_inputs=True):
+    """
+    Builds the parser of the pipeline options, shared with the batch job workers.
+
+    Args:
+        require_inputs (bool): Whether -i, -o and --las are mandatory (batch jobs fill them in).
+
+    Returns:
+        ArgumentParser: The parser.
+    """
     parser = argparse.ArgumentParser(description="Process 3D buildings from shapefile in Blender.")
 
-    parser.add_argument("-i", "--input_shapefile", type=str, required=True,
+    parser.add_argument("-i", "--input_shapefile", type=str, required=require_inputs,
                         help="Path to the input shapefile.")
 
-    parser.add_argument("-o", "--output_folder", type=str, required=True,
+    parser.add_argument("-o", "--output_folder", type=str, required=require_inputs,
                         help="Folder where the generated meshes will be saved.")
 
     parser.add_argument("-r", "--round_edges", action="store_true",
@@ -21,23 +46,425 @@ def parse_args():
     # parser.add_argument("--height_attr", type=str, default="height",
     #                     help="Attribute name in shapefile defining building height (default: height).")
 
-    parser.add_argument("--export_format", type=str, default="ply", choices=["ply", "obj"],
-                        help="File format to export the resulting mesh (default: ply).")
+    parser.add_argument("--export_format", type=str, default="ply", choices=["ply", "obj", "ply_compact", "glb", "gpkg", "3dtiles"],
+                        help="File format to export the resulting mesh (default: ply). "
+                             "'ply_compact' and 'glb' store quantized coordinates relative to the tile origin, "
+                             "'gpkg' writes all the buildings in a GeoPackage with an R-tree index, "
+                             "'3dtiles' writes a 3D Tiles tileset (LOD2 leaves, LOD1 coarser levels).")
+
+    parser.add_argument("--quantization", type=str, default="int32", choices=["int32", "float32"],
+                        help="Coordinate type of the 'ply_compact' format (default: int32).")
+
+    parser.add_argument("--precision", type=float, default=0.001,
+                        help="Quantization step of the compact formats (default: 0.001).")
+
+    parser.add_argument("--compression", type=str, default="none", choices=["none", "gzip", "zstd"],
+                        help="Compression of the compact formats (default: none).")
     
-    parser.add_argument("--las", type=str,
-                        help="Las file")
+    parser.add_argument("--las", type=str, required=require_inputs,
+                        help="Las file, directory / glob pattern of LAS tiles read lazily, or point store folder (build_point_store.py).")
 
-    return parser.parse_args()
+    parser.add_argument("--las_cache_mb", type=float, default=2048,
+                        help="Memory budget of the decoded LAS tiles when --las is a directory or a pattern (default: 2048).")
 
+    parser.add_argument("--round_method", type=str, default="fillet2d", choices=["fillet2d", "bevel"],
+                        help="How -r rounds the corners: 2D fillet of the footprint or bevel + 3D boolean (default: fillet2d).")
 
-if __name__ == "__main__":
-    args = parse_args()
+    parser.add_argument("--boolean_backend", type=str, default="blender", choices=["blender", "manifold"],
+                        help="Engine of the boolean operations: Blender modifier or manifold3d (default: blender). "
+                             "Failed manifold booleans are retried with Blender.")
+
+    parser.add_argument("--native_lod2", action="store_true",
+                        help="Assemble walls and skeleton roofs (hip, pyramid, gabled-L) in the C++ process.")
+
+    parser.add_argument("--no_flat_fast_path", action="store_true",
+                        help="Build the flat roofs in Blender instead of batched NumPy prisms.")
+
+    parser.add_argument("--flat_batch_size", type=int, default=1024,
+                        help="Flat roofs extruded together by the fast path (default: 1024).")
+
+    parser.add_argument("--skeleton_timeout", type=float, default=60.0,
+                        help="Kill the straight-skeleton process after this many seconds and build a flat roof (default: 60, 0 disables).")
+
+    parser.add_argument("--skeleton_memory_mb", type=float, default=4096,
+                        help="Address space limit of the straight-skeleton process in MB (default: 4096, 0 disables).")
+
+    parser.add_argument("--time_budget", type=float, default=0,
+                        help="Time budget of the run in seconds: the buildings are degraded to fit in it (default: 0, none).")
+
+    parser.add_argument("--building_budget", type=float, default=0,
+                        help="Time budget of a building in seconds (default: 0, none).")
+
+    parser.add_argument("--lod1_min_area", type=float, default=0,
+                        help="Footprints with a smaller area are built as LOD1 prisms (default: 0, disabled).")
+
+    parser.add_argument("--mesh_qa", action="store_true",
+                        help="Check every generated mesh (watertight, winding, volume, self-intersections) and "
+                             "store the QA flags in the run summary.")
+
+    parser.add_argument("--qa_fallback", action="store_true",
+                        help="With --mesh_qa, replace the meshes failing QA with the flat fallback.")
+
+    parser.add_argument("--qa_volume_range", type=float, nargs=2, default=[0.3, 1.1], metavar=("MIN", "MAX"),
+                        help="Accepted volume / (footprint area x height) of a mesh (default: 0.3 1.1).")
+
+    parser.add_argument("--roof_cache", action="store_true",
+                        help="Reuse the roofs of footprints identical up to a translation and a rotation.")
+
+    parser.add_argument("--roof_cache_size", type=int, default=1024,
+                        help="Maximum number of roofs kept in the in-memory cache (default: 1024).")
+
+    parser.add_argument("--roof_cache_dir", type=str, default=None,
+                        help="Folder where the roof cache is also persisted (default: memory only).")
+
+    parser.add_argument("--cache_precision", type=float, default=0.01,
+                        help="Quantization step used to compare footprints and heights (default: 0.01).")
+
+    parser.add_argument("--writer_threads", type=int, default=2,
+                        help="Number of background threads writing meshes to disk (default: 2).")
+
+    parser.add_argument("--writer_queue_size", type=int, default=8,
+                        help="Maximum number of meshes waiting to be written before modeling blocks (default: 8).")
+
+    parser.add_argument("--max_buildings_per_worker", type=int, default=0,
+                        help="Restart Blender after this many buildings to keep memory constant (default: 0, never).")
+
+    parser.add_argument("--max_rss_mb", type=float, default=0,
+                        help="Restart Blender when its RSS exceeds this many MB (default: 0, never).")
+
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only model the buildings that are new or changed since the previous run in the output folder.")
+
+    parser.add_argument("--las_fingerprint", action="store_true",
+                        help="With --incremental, also regenerate the buildings whose points (count, heights) changed.")
+
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of Blender workers run in parallel, fed most expensive building first (default: 1).")
+
+    parser.add_argument("--cost_model", type=str, default=None,
+                        help="Cost model used to order the buildings of parallel workers and by the time budget "
+                             "(default: <output_folder>/cost_model.json, fitted by the previous run, if present).")
+
+    parser.add_argument("--classify_roofs", action="store_true",
+                        help="Infer the roof type from the point cloud for footprints without a 'roof' attribute.")
+
+    parser.add_argument("--classifier_workers", type=int, default=1,
+                        help="Number of processes used by the roof classifier (default: 1).")
+
+    parser.add_argument("--classifier_cell_size", type=float, default=0.5,
+                        help="Raster cell size used by the roof classifier (default: 0.5).")
+
+    parser.add_argument("--simplify", action="store_true",
+                        help="Simplify the footprints (collinear vertices, Douglas-Peucker, orthogonal snapping) before modeling.")
+
+    parser.add_argument("--simplify_tolerance", type=float, default=0.05,
+                        help="Douglas-Peucker tolerance of the footprint simplification (default: 0.05).")
+
+    parser.add_argument("--collinear_tolerance", type=float, default=0.01,
+                        help="Distance under which a vertex is removed as collinear (default: 0.01).")
+
+    parser.add_argument("--snap_angle", type=float, default=3.0,
+                        help="Edges within this many degrees of the building axes are snapped (default: 3.0, 0 disables).")
+
+    parser.add_argument("--no_preflight", action="store_true",
+                        help="Disable the footprint validation that routes degenerate footprints to flat roofs.")
+
+    parser.add_argument("--min_area", type=float, default=1.0,
+                        help="Footprints with a smaller area are routed to flat roofs (default: 1.0).")
+
+    parser.add_argument("--min_edge_length", type=float, default=0.001,
+                        help="Footprints with a shorter edge are routed to flat roofs (default: 0.001).")
+
+    parser.add_argument("--max_vertices", type=int, default=1000,
+                        help="Footprints with more vertices are routed to flat roofs (default: 1000, 0 disables).")
+
+    parser.add_argument("--metrics_file", type=str, default=None,
+                        help="Status file kept updated during the run, for monitoring (default: disabled).")
+    parser.add_argument("--metrics_format", type=str, choices=["prometheus", "json"], default=None,
+                        help="Format of the status file (default: json for a .json file, prometheus textfile otherwise).")
+    parser.add_argument("--metrics_interval", type=float, default=5.0,
+                        help="Minimum number of seconds between two updates of the status file (default: 5).")
+    parser.add_argument("--metrics_labels", type=str, nargs="*", default=[], metavar="KEY=VALUE",
+                        help="Labels added to every series of the status file (e.g. site=north).")
+
+    parser.add_argument("--factory_startup", action="store_true",
+                        help="Start Blender with factory settings: no user preferences, no add-ons, no audio device.")
+    parser.add_argument("--profile_imports", action="store_true",
+                        help="Measure the import time of every module (-X importtime) and report the breakdown.")
+
+    parser.add_argument("--bbox", type=float, nargs=4, default=None, metavar=("MINX", "MINY", "MAXX", "MAXY"),
+                        help="Only process the footprints whose centroid falls in this box (shapefile coordinates).")
+
+    parser.add_argument("--srs_id", type=int, default=None,
+                        help="EPSG code of the 'gpkg' and '3dtiles' outputs (default: detected from the .prj of the shapefile).")
+
+    parser.add_argument("--gpkg_batch_size", type=int, default=1000,
+                        help="Buildings inserted per transaction in the 'gpkg' output (default: 1000).")
+
+    parser.add_argument("--tile_max_features", type=int, default=256,
+                        help="Maximum number of buildings of a leaf tile of the '3dtiles' output (default: 256).")
+
+    parser.add_argument("--tile_max_depth", type=int, default=8,
+                        help="Maximum depth of the tile quadtree of the '3dtiles' output (default: 8).")
 
-    cmd = f"blender -b --python /app/tool/blender_main.py > /dev/null 2>&1 -- -i {args.input_shapefile} -o {args.output_folder} --export_format {args.export_format} --las {args.las}"
+    return parser
+
+
+def parse_args():
+    return build_parser().parse_args()
+
+
+### function: worker_tmp_dir ###
+def worker_tmp_dir(args, worker_id=None):
+    """
+    Private temporary folder of a Blender worker. The C++ executables exchange files with
+    fixed names (hip.ply, input_<index>.txt) there, and the folder is wiped after every
+    building, so concurrent runs on a node (batch jobs, parallel workers) must not share it.
+    """
+    name = f"lod2_{socket.gethostname()}_{os.getpid()}"
+    if getattr(args, 'job_id', None) is not None:
+        name += f"_{args.job_id}"
+    if worker_id:
+        name += f"_{worker_id}"
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+### function: build_blender_command ###
+def build_blender_command(args, worker_id=None, cost_model=None):
+    """
+    Builds the command running blender_main.py with the pipeline options.
+
+    Args:
+        args: Parsed pipeline options.
+        worker_id (str, optional): Name of a parallel worker: it claims its buildings from the
+            shared schedule and gets its own temporary folder.
+        cost_model (str, optional): Cost model ordering the shared schedule and used by the time budget.
+
+    Returns:
+        str: The shell command of a Blender worker.
+    """
+    env, startup_options = blender_startup_options(args.factory_startup, args.profile_imports)
+
+    # The import times are written on stderr, appended over the recycled workers
+    stderr = "2>&1"
+    if args.profile_imports:
+        stderr = f"2>> {shlex.quote(os.path.join(args.output_folder, IMPORT_LOG_NAME))}"
+
+    # The C++ processes of every run and worker exchange their files in separate folders
+    env = f"LOD2_TMP_DIR={shlex.quote(worker_tmp_dir(args, worker_id))} {env}"
+
+    cmd = f"{env}blender -b {startup_options} --python-exit-code 1 --python /app/tool/blender_main.py > /dev/null {stderr} -- -i {shlex.quote(args.input_shapefile)} -o {shlex.quote(args.output_folder)} --export_format {args.export_format} --las {shlex.quote(args.las)}"
+    cmd += f" --las_cache_mb {args.las_cache_mb}"
+    cmd += f" --quantization {args.quantization} --precision {args.precision} --compression {args.compression}"
+    cmd += f" --writer_threads {args.writer_threads} --writer_queue_size {args.writer_queue_size}"
+    if args.export_format == "gpkg":
+        cmd += f" --gpkg_batch_size {args.gpkg_batch_size}"
+    if args.export_format == "3dtiles":
+        cmd += f" --tile_max_features {args.tile_max_features} --tile_max_depth {args.tile_max_depth}"
+    if args.srs_id is not None:
+        cmd += f" --srs_id {args.srs_id}"
     # cmd = f"blender -b --python /app/tool/blender_main.py -- -i {args.input_shapefile} -o {args.output_folder} --export_format {args.export_format} --las {args.las}"
 
     if args.round_edges:
-        cmd += " -r"
-    
-    os.system(cmd)
+        cmd += f" -r --round_method {args.round_method}"
+
+    cmd += f" --max_buildings_per_worker {args.max_buildings_per_worker} --max_rss_mb {args.max_rss_mb}"
+
+    cmd += f" --min_area {args.min_area} --min_edge_length {args.min_edge_length} --max_vertices {args.max_vertices}"
+    if args.no_preflight:
+        cmd += " --no_preflight"
+    if args.simplify:
+        cmd += f" --simplify --simplify_tolerance {args.simplify_tolerance} --collinear_tolerance {args.collinear_tolerance} --snap_angle {args.snap_angle}"
+    if args.classify_roofs:
+        cmd += f" --classify_roofs --classifier_workers {args.classifier_workers} --classifier_cell_size {args.classifier_cell_size}"
+    cmd += f" --boolean_backend {args.boolean_backend}"
+    if args.native_lod2:
+        cmd += " --native_lod2"
+    if args.no_flat_fast_path:
+        cmd += " --no_flat_fast_path"
+    cmd += f" --flat_batch_size {args.flat_batch_size}"
+    cmd += f" --skeleton_timeout {args.skeleton_timeout} --skeleton_memory_mb {args.skeleton_memory_mb}"
+    if args.time_budget or args.building_budget:
+        cmd += f" --time_budget {args.time_budget} --building_budget {args.building_budget}"
+        if args.deadline_at is not None:
+            cmd += f" --deadline_at {args.deadline_at!r}"
+    if args.lod1_min_area:
+        cmd += f" --lod1_min_area {args.lod1_min_area}"
+    if args.mesh_qa:
+        cmd += f" --mesh_qa --qa_volume_range {args.qa_volume_range[0]} {args.qa_volume_range[1]}"
+        if args.qa_fallback:
+            cmd += " --qa_fallback"
+    if args.roof_cache:
+        cmd += f" --roof_cache --roof_cache_size {args.roof_cache_size} --cache_precision {args.cache_precision}"
+        if args.roof_cache_dir:
+            cmd += f" --roof_cache_dir {shlex.quote(args.roof_cache_dir)}"
+    if args.metrics_file:
+        metrics_file = args.metrics_file
+        if worker_id:
+            root, ext = os.path.splitext(metrics_file)
+            metrics_file = f"{root}_{worker_id}{ext}"
+        cmd += f" --metrics_file {shlex.quote(metrics_file)} --metrics_interval {args.metrics_interval}"
+        if args.metrics_format:
+            cmd += f" --metrics_format {args.metrics_format}"
+        # The files of the parallel workers are collected together: every series gets the worker label
+        labels = list(args.metrics_labels) + ([f"worker={worker_id}"] if worker_id else [])
+        if labels:
+            cmd += " --metrics_labels " + " ".join(shlex.quote(label) for label in labels)
+    if args.bbox:
+        cmd += " --bbox " + " ".join(repr(v) for v in args.bbox)
+    if args.incremental:
+        cmd += " --incremental"
+        if args.las_fingerprint:
+            cmd += " --las_fingerprint"
+    if worker_id:
+        cmd += f" --schedule {shlex.quote(os.path.join(args.output_folder, SCHEDULE_NAME))} --worker_id {worker_id}"
+    if cost_model:
+        cmd += f" --cost_model {shlex.quote(cost_model)}"
+
+    return cmd
+
+
+### function: run_worker ###
+def run_worker(cmd):
+    """
+    Runs a Blender worker, restarting it from its checkpoint every time it is recycled.
+
+    Returns:
+        int: Exit code of the last Blender process.
+    """
+    # A recycled worker exits with RECYCLE_EXIT_CODE: start a fresh one that resumes from its checkpoint
+    worker_cmd = cmd
+    while (exit_code := os.waitstatus_to_exitcode(os.system(worker_cmd))) == RECYCLE_EXIT_CODE:
+        print("Restarting Blender worker...")
+        worker_cmd = cmd + " --resume"
+    return exit_code
+
+
+### function: run_blender ###
+def run_blender(args):
+    """
+    Runs the pipeline in Blender, restarting recycled workers until the input is complete.
+
+    Returns:
+        int: Exit code of the last Blender process.
+    """
+    # The time budget bounds the whole run: every worker, recycled and parallel ones included, gets the same deadline
+    args.deadline_at = time.time() + args.time_budget if args.time_budget else None
+
+    if args.workers > 1:
+        return run_parallel(args)
+
+    # The time budget predicts the cost of the buildings with the model of the previous parallel run
+    model_path = os.path.join(args.output_folder, COST_MODEL_NAME)
+    cost_model = args.cost_model or (model_path if os.path.exists(model_path) else None)
+    cmd = build_blender_command(args, cost_model=cost_model)
+
+    import_log = os.path.join(args.output_folder, IMPORT_LOG_NAME)
+    if args.profile_imports:
+        os.makedirs(args.output_folder, exist_ok=True)
+        if os.path.exists(import_log):
+            os.remove(import_log)
+
+    exit_code = run_worker(cmd)
+    shutil.rmtree(worker_tmp_dir(args), ignore_errors=True)
+
+    if args.profile_imports:
+        report_import_times(import_log, args.output_folder)
+
+    return exit_code
+
+
+### function: run_parallel ###
+def run_parallel(args):
+    """
+    Runs several Blender workers on the same input. The buildings are ranked once by
+    predicted cost (longest first) in a claim table shared by the workers, and every
+    worker claims the next ones when it is free, so the few slow buildings start first
+    instead of ending the run on a single busy worker.
+
+    Once done, the summaries of the workers are merged into run_summary.json with a
+    'schedule' section comparing the makespans, and the cost model is fitted again on
+    the measured times for the next run.
+
+    Returns:
+        int: 0 once every building is done, else the highest exit code of the workers.
+    """
+    if args.export_format in ("gpkg", "3dtiles"):
+        raise SystemExit(f"--workers > 1 is not supported with the '{args.export_format}' export format "
+                         "(a single file written by one worker).")
+
+    os.makedirs(args.output_folder, exist_ok=True)
+    schedule_path = os.path.join(args.output_folder, SCHEDULE_NAME)
+    model_path = os.path.join(args.output_folder, COST_MODEL_NAME)
+    cost_model = args.cost_model or (model_path if os.path.exists(model_path) else None)
+
+    for path in [schedule_path, schedule_path + "-journal"] + \
+            glob.glob(os.path.join(args.output_folder, "run_summary_w*.json")):
+        if os.path.exists(path):
+            os.remove(path)
+
+    worker_ids = [f"w{k}" for k in range(args.workers)]
+    exit_codes = {}
+
+    def worker(worker_id):
+        exit_codes[worker_id] = run_worker(build_blender_command(args, worker_id, cost_model))
+        shutil.rmtree(worker_tmp_dir(args, worker_id), ignore_errors=True)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(worker_id,)) for worker_id in worker_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # A crashed worker (not recycled) leaves its claimed buildings running and its tasks unfinished:
+    # one more worker takes them over, and the buildings still not done after it are reported as failures
+    schedule = BuildingSchedule(schedule_path)
+    requeued = schedule.requeue_running()
+    if requeued or schedule.counts().get('pending'):
+        retry_id = f"w{args.workers}"
+        print(f"⚠️ {len(schedule.unfinished())} buildings not done ({requeued} left by crashed workers), "
+              f"running worker {retry_id}")
+        schedule.reassign_tasks(retry_id)
+        worker_ids.append(retry_id)
+        worker(retry_id)
+        schedule.requeue_running()
+    unfinished = schedule.unfinished()
+    wall_seconds = time.perf_counter() - start
+
+    summaries = []
+    for worker_id in worker_ids:
+        path = os.path.join(args.output_folder, f"run_summary_{worker_id}.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                summaries.append(json.load(f))
+        else:
+            print(f"⚠️ Worker {worker_id} did not write its summary (exit code {exit_codes.get(worker_id)})")
+
+    summary = merge_worker_summaries(summaries) if summaries else run_summary.create_run_summary()
+    for idx in unfinished:
+        run_summary.record_failure(summary, idx, 'worker', "not modeled: the workers claiming it crashed")
+    run_summary.update_section(summary, 'schedule', schedule_report(summary['timings'], schedule.order(),
+                                                                     args.workers, wall_seconds))
+    schedule.close()
+
+    if summaries:
+        CostModel.fit(summary['timings'], CostModel.load(cost_model)).save(model_path)
+        print(f"Cost model saved to: {model_path}")
+
+    # The run succeeded when every building is done, even if the retry worker took over from a crashed one
+    if args.incremental and not unfinished:
+        finalize_manifest(args.output_folder, indices_to_rebuild(summary))
+
+    run_summary.print_run_summary(summary)
+    run_summary.save_run_summary(summary, args.output_folder)
+
+    if not unfinished:
+        return 0
+    return max(exit_codes.values(), default=0) or 1
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sys.exit(run_blender(args))
 
@@ -5,8 +5,8 @@ import mathutils
 import numpy as np
 import os
 import shutil
+import tempfile
 import math
-from scipy.spatial import ConvexHull
 import sys
 
 #######################################################
@@ -17,19 +17,38 @@ sys.path.append(parent_dir)
 #######################################################
 
 from modeling.min_bounding_rect import minBoundingRect
+from modeling.manifold_backend import manifold_boolean
+import modeling.rounding as rounding
+from io_utils.budget import check_deadline
+
+
+BOOLEAN_BACKENDS = ('blender', 'manifold')
+
+# Backend used by apply_boolean_difference / apply_boolean_intersect, and how it performed
+BOOLEAN_SETTINGS = {'backend': 'blender', 'fallback': True}
+BOOLEAN_STATS = {'blender': 0, 'manifold': 0, 'manifold_failed': 0}
+
+# Folder of the files exchanged with the C++ process, wiped after every building: set per run
+# and worker by main.py, otherwise private to this Blender process
+TMP_DIR = os.environ.get("LOD2_TMP_DIR") or os.path.join(tempfile.gettempdir(), f"lod2_{os.getpid()}")
+os.makedirs(TMP_DIR, exist_ok=True)
 
 
 ### function: clean_tmp_folder ###
-def clean_tmp_folder(path="/tmp") -> bool:
+def clean_tmp_folder(path=None) -> bool:
     """
     Cleans a directory by removing all its contents (files and subdirectories).
 
     Args:
-        path (str): Path to the directory to clean. Defaults to '/tmp'.
+        path (str): Path to the directory to clean. Defaults to TMP_DIR (private folder or $LOD2_TMP_DIR).
 
     Returns:
         bool: True if cleaning succeeded, False otherwise.
     """
+    path = path or TMP_DIR
+    if os.path.realpath(path) == os.path.realpath(tempfile.gettempdir()):
+        print(f"Refusing to clean the shared temporary directory: {path}")
+        return False
     if not os.path.exists(path) or not os.path.isdir(path):
         print(f"Directory does not exist or is not a directory: {path}")
         return False
@@ -81,6 +100,61 @@ def clear_blender_scene():
 
 
 
+# Datablock collections tracked per building
+TRACKED_DATA_TYPES = (
+    'objects',
+    'meshes',
+    'materials',
+    'textures',
+    'images',
+    'curves',
+    'lights',
+    'cameras',
+    'armatures',
+    'collections',
+)
+
+
+### function: snapshot_datablocks ###
+def snapshot_datablocks():
+    """
+    Takes a snapshot of the datablocks currently present in bpy.data.
+
+    Returns:
+        dict: For each tracked collection, the set of datablock pointers.
+    """
+    return {
+        data_type: {item.as_pointer() for item in getattr(bpy.data, data_type)}
+        for data_type in TRACKED_DATA_TYPES
+    }
+
+
+### function: free_datablocks_since ###
+def free_datablocks_since(snapshot):
+    """
+    Frees exactly the datablocks created after the given snapshot, including the
+    orphan data left by booleans, bevels and joins.
+
+    Args:
+        snapshot (dict): Snapshot returned by snapshot_datablocks.
+
+    Returns:
+        int: Number of freed datablocks.
+    """
+    if bpy.context.object is not None and bpy.context.object.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+    new_ids = []
+    for data_type in TRACKED_DATA_TYPES:
+        known = snapshot[data_type]
+        new_ids.extend(item for item in getattr(bpy.data, data_type) if item.as_pointer() not in known)
+
+    if new_ids:
+        bpy.data.batch_remove(new_ids)
+
+    return len(new_ids)
+
+
 ### function: extrude_faces_z ###
 def extrude_faces_z(obj, height):
     bpy.context.view_layer.objects.active = obj
@@ -131,6 +205,8 @@ def get_convex_hull_2d_numpy(obj=None):
         raise ValueError("Not enough vertices to compute convex hull.")
 
     # Compute convex hull
+    from scipy.spatial import ConvexHull
+
     hull = ConvexHull(verts_np)
     hull_coords = verts_np[hull.vertices]
 
@@ -310,10 +386,117 @@ def merge_close_vertices(obj, distance=0.001):
     obj.select_set(False)
 
 
+### function: set_boolean_backend ###
+def set_boolean_backend(backend, fallback=True):
+    """
+    Selects the engine used by the boolean operations of the run.
+
+    Args:
+        backend (str): 'blender' (Boolean modifier) or 'manifold' (manifold3d on NumPy arrays).
+        fallback (bool): Whether a failed manifold boolean is retried with the Blender modifier.
+    """
+    if backend not in BOOLEAN_BACKENDS:
+        raise ValueError(f"Unsupported boolean backend: {backend}")
+    BOOLEAN_SETTINGS['backend'] = backend
+    BOOLEAN_SETTINGS['fallback'] = fallback
+
+
+### function: replace_mesh_geometry ###
+def replace_mesh_geometry(obj, vertices, faces):
+    """
+    Replaces the geometry of a mesh object with world-space NumPy arrays.
+    """
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    local = (np.asarray(vertices, dtype=np.float64) - matrix[:3, 3]) @ np.linalg.inv(matrix[:3, :3]).T
+
+    mesh = obj.data
+    mesh.clear_geometry()
+    mesh.from_pydata(local.tolist(), [], np.asarray(faces).tolist())
+    mesh.update()
+
+
+### function: round_footprint_2d ###
+def round_footprint_2d(obj, exterior_coords, width=2, segments=4):
+    """
+    Replaces a flat footprint mesh with its version with rounded corners, computed in 2D
+    (same width and segments as the bevel rounding), so that the extruded building is
+    already rounded.
+
+    Returns:
+        bool: True if the footprint was rounded, False if the 2D rounding failed.
+    """
+    exterior_indices, holes_indices = get_exterior_and_hole_loops(obj)
+    co = [obj.matrix_world @ v.co for v in obj.data.vertices]
+    holes = [[(co[i].x, co[i].y) for i in hole] for hole in holes_indices]
+
+    rounded = rounding.round_footprint(exterior_coords, holes, width=width, segments=segments)
+    if rounded is None:
+        print("⚠ 2D rounding produced an invalid footprint.")
+        return False
+
+    xy, faces = rounding.triangulate_polygon(rounded)
+    z = min(c.z for c in co)
+    replace_mesh_geometry(obj, np.column_stack([xy, np.full(len(xy), z)]), faces)
+    return True
+
+
+### function: clip_to_rounded_footprint ###
+def clip_to_rounded_footprint(obj, exterior_coords, width=2, segments=4):
+    """
+    Rounds the corners of a finished building by clipping it in 2D against the rounded
+    footprint, instead of intersecting it with a beveled prism.
+
+    Returns:
+        bool: True if the building was clipped, False if the 2D rounding failed.
+    """
+    rounded = rounding.round_footprint(exterior_coords, width=width, segments=segments)
+    if rounded is None:
+        print("⚠ 2D rounding produced an invalid footprint.")
+        return False
+
+    vertices, faces = get_mesh_arrays(obj)
+    vertices, faces = rounding.clip_building_2d(vertices, faces, rounded)
+    if len(faces) == 0:
+        print("⚠ 2D rounding produced an empty mesh.")
+        return False
+
+    replace_mesh_geometry(obj, vertices, faces)
+    return True
+
+
+### function: apply_manifold_boolean ###
+def apply_manifold_boolean(obj_a, obj_b, operation):
+    """
+    Computes a boolean with the manifold engine and writes the result into obj_a.
+
+    Returns:
+        bool: True on success, False if the boolean has to be computed by Blender.
+    """
+    try:
+        vertices_a, faces_a = get_mesh_arrays(obj_a)
+        vertices_b, faces_b = get_mesh_arrays(obj_b)
+        vertices, faces = manifold_boolean(vertices_a, faces_a, vertices_b, faces_b, operation)
+    except Exception as e:
+        BOOLEAN_STATS['manifold_failed'] += 1
+        print(f"⚠ Manifold boolean ({operation}) failed: {e}")
+        if BOOLEAN_SETTINGS['fallback']:
+            return False
+        raise
+
+    replace_mesh_geometry(obj_a, vertices, faces)
+    BOOLEAN_STATS['manifold'] += 1
+    return True
+
+
 ### function: apply_boolean_difference ###
 def apply_boolean_difference(obj_target, obj_cutter, modifier_name="Boolean_Diff"):
     if obj_target.type != 'MESH' or obj_cutter.type != 'MESH':
         raise TypeError("Entrambi gli oggetti devono essere mesh.")
+    check_deadline("a boolean difference")
+
+    if BOOLEAN_SETTINGS['backend'] == 'manifold' and apply_manifold_boolean(obj_target, obj_cutter, 'difference'):
+        return obj_target
+    BOOLEAN_STATS['blender'] += 1
 
     bpy.context.view_layer.objects.active = obj_target
     obj_target.select_set(True)
@@ -334,6 +517,11 @@ def apply_boolean_intersect(obj_a, obj_b, apply=True):
     if obj_a is None or obj_b is None:
         print("Entrambi gli oggetti devono essere specificati.")
         return
+    check_deadline("a boolean intersection")
+
+    if apply and BOOLEAN_SETTINGS['backend'] == 'manifold' and apply_manifold_boolean(obj_a, obj_b, 'intersect'):
+        return
+    BOOLEAN_STATS['blender'] += 1
 
     bpy.context.view_layer.objects.active = obj_a
     bpy.ops.object.select_all(action='DESELECT')
@@ -845,10 +1033,62 @@ def count_mesh_points(obj):
         return -1
 
 
+### function: create_mesh_from_arrays ###
+def create_mesh_from_arrays(name, vertices, faces):
+    """
+    Creates a mesh object from NumPy vertex and face arrays.
+
+    Args:
+        name (str): Name of the new object.
+        vertices (np.ndarray): (N, 3) array of vertex coordinates.
+        faces (np.ndarray): (M, K) array of face vertex indices.
+
+    Returns:
+        bpy.types.Object: The newly created mesh object.
+    """
+    mesh = bpy.data.meshes.new(name + "_mesh")
+    mesh.from_pydata(np.asarray(vertices).tolist(), [], np.asarray(faces).tolist())
+    mesh.update()
+
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.collection.objects.link(obj)
+
+    return obj
+
+
 ### function: duplicate_object ###
 def duplicate_object(obj, new_name):
     obj_copy = obj.copy()
     obj_copy.data = obj.data.copy()
     obj_copy.name = new_name
     bpy.context.collection.objects.link(obj_copy)
-    return obj_copy
\ No newline at end of file
+    return obj_copy
+
+
+### function: get_mesh_arrays ###
+def get_mesh_arrays(obj):
+    """
+    Extracts world-space vertices and triangles of a mesh object as NumPy arrays,
+    so that the mesh can be serialized without Blender.
+
+    Args:
+        obj (bpy.types.Object): The mesh object.
+
+    Returns:
+        tuple: ((N, 3) float64 vertices, (M, 3) int64 triangle indices).
+    """
+    mesh = obj.data
+    mesh.calc_loop_triangles()
+
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+    vertices = co.reshape(-1, 3).astype(np.float64)
+
+    tris = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get('vertices', tris)
+    faces = tris.reshape(-1, 3).astype(np.int64)
+
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    vertices = vertices @ matrix[:3, :3].T + matrix[:3, 3]
+
+    return vertices, faces
@@ -0,0 +1,108 @@
+import numpy as np
+
+
+OPERATIONS = ('difference', 'intersect', 'union')
+
+
+class BooleanError(Exception):
+    """
+    Raised when the manifold engine cannot compute a boolean (non-manifold input, empty result...).
+    """
+    pass
+
+
+### function: _import_manifold ###
+def _import_manifold():
+    try:
+        import manifold3d
+    except ImportError as e:
+        raise ImportError("The 'manifold' boolean backend requires the 'manifold3d' package.") from e
+    return manifold3d
+
+
+### function: weld_vertices ###
+def weld_vertices(vertices, faces, tolerance=1e-6):
+    """
+    Merges the vertices closer than the tolerance and drops the degenerate triangles,
+    since the manifold engine requires closed meshes with shared vertices.
+
+    Args:
+        vertices (np.ndarray): (N, 3) vertices.
+        faces (np.ndarray): (M, 3) triangle indices.
+        tolerance (float): Size of the welding grid.
+
+    Returns:
+        tuple: (vertices, faces) welded.
+    """
+    keys = np.rint(np.asarray(vertices, dtype=np.float64) / tolerance).astype(np.int64)
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    faces = inverse.reshape(-1)[np.asarray(faces, dtype=np.int64)]
+
+    degenerate = (faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | (faces[:, 0] == faces[:, 2])
+    return np.asarray(vertices, dtype=np.float64)[first], faces[~degenerate]
+
+
+### function: _to_manifold ###
+def _to_manifold(manifold3d, vertices, faces, origin):
+    vertices, faces = weld_vertices(vertices - origin, faces)
+
+    # Double precision meshes are only available in recent manifold3d versions
+    if hasattr(manifold3d, 'Mesh64'):
+        mesh = manifold3d.Mesh64(vert_properties=np.ascontiguousarray(vertices, dtype=np.float64),
+                                 tri_verts=np.ascontiguousarray(faces, dtype=np.uint64))
+    else:
+        mesh = manifold3d.Mesh(vert_properties=np.ascontiguousarray(vertices, dtype=np.float32),
+                               tri_verts=np.ascontiguousarray(faces, dtype=np.uint32))
+
+    solid = manifold3d.Manifold(mesh)
+    if solid.status() != manifold3d.Error.NoError:
+        raise BooleanError(f"invalid input mesh ({solid.status()})")
+    return solid
+
+
+### function: manifold_boolean ###
+def manifold_boolean(vertices_a, faces_a, vertices_b, faces_b, operation='difference'):
+    """
+    Computes a boolean between two closed triangle meshes with the manifold engine,
+    working on NumPy arrays only (no Blender involved).
+
+    Coordinates are shifted to a local origin before the computation, so that
+    georeferenced or tile-relative coordinates keep their precision.
+
+    Args:
+        vertices_a, faces_a (np.ndarray): Mesh A, (N, 3) vertices and (M, 3) triangles.
+        vertices_b, faces_b (np.ndarray): Mesh B.
+        operation (str): 'difference' (A - B), 'intersect' or 'union'.
+
+    Returns:
+        tuple: ((K, 3) float64 vertices, (L, 3) int64 triangles) of the result.
+
+    Raises:
+        BooleanError: If an input is not a valid manifold or the result is empty.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unsupported boolean operation: {operation}")
+    if len(faces_a) == 0 or len(faces_b) == 0:
+        raise BooleanError("empty input mesh")
+
+    manifold3d = _import_manifold()
+    origin = np.asarray(vertices_a, dtype=np.float64).mean(axis=0)
+
+    solid_a = _to_manifold(manifold3d, vertices_a, faces_a, origin)
+    solid_b = _to_manifold(manifold3d, vertices_b, faces_b, origin)
+
+    if operation == 'difference':
+        result = solid_a - solid_b
+    elif operation == 'intersect':
+        result = solid_a ^ solid_b
+    else:
+        result = solid_a + solid_b
+
+    if result.is_empty():
+        raise BooleanError("empty result")
+
+    mesh = result.to_mesh64() if hasattr(result, 'to_mesh64') else result.to_mesh()
+    vertices = np.asarray(mesh.vert_properties, dtype=np.float64)[:, :3] + origin
+    faces = np.asarray(mesh.tri_verts, dtype=np.int64)
+
+    return vertices, faces
@@ -0,0 +1,187 @@
+import numpy as np
+
+
+# Volume of a building over footprint area x height: 1 for a flat roof, about 0.5-1 for the pitched ones
+DEFAULT_VOLUME_RANGE = (0.3, 1.1)
+
+# Above this number of triangles the self-intersection test is skipped
+MAX_SELF_INTERSECTION_FACES = 20000
+
+
+### function: weld_vertices ###
+def weld_vertices(vertices, faces, tolerance=1e-5):
+    """
+    Merges the vertices closer than the tolerance (snapped to a grid) and drops the
+    triangles that become degenerate, so that the topology checks see shared edges.
+
+    Returns:
+        tuple: ((K, 3) vertices, (M', 3) triangles).
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+
+    _, first, inverse = np.unique(np.round(vertices / tolerance).astype(np.int64), axis=0,
+                                  return_index=True, return_inverse=True)
+    faces = inverse.reshape(-1)[faces]
+    valid = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 2] != faces[:, 0])
+    return vertices[first], faces[valid]
+
+
+### function: edge_defects ###
+def edge_defects(faces):
+    """
+    Counts the edges breaking a closed, consistently oriented 2-manifold: every
+    edge must be shared by exactly two triangles, traversed in opposite directions.
+
+    Returns:
+        dict: 'boundary' (one triangle), 'non_manifold' (more than two) and 'inconsistent'
+        (same direction in both triangles) edge counts.
+    """
+    directed = faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    _, counts = np.unique(np.sort(directed, axis=1), axis=0, return_counts=True)
+    _, directed_counts = np.unique(directed, axis=0, return_counts=True)
+    return {
+        'boundary': int(np.count_nonzero(counts == 1)),
+        'non_manifold': int(np.count_nonzero(counts > 2)),
+        'inconsistent': int(np.count_nonzero(directed_counts > 1)),
+    }
+
+
+### function: signed_volume ###
+def signed_volume(vertices, faces):
+    """
+    Volume enclosed by a closed mesh (divergence theorem), negative if the normals point inwards.
+    """
+    tri = vertices[faces]
+    return float(np.einsum('ij,ij->i', tri[:, 0], np.cross(tri[:, 1], tri[:, 2])).sum() / 6.0)
+
+
+### function: projected_area ###
+def projected_area(vertices, faces):
+    """
+    Area of the downward-facing triangles projected on the XY plane (the footprint of
+    a closed building mesh, holes excluded).
+    """
+    tri = vertices[faces]
+    cross_z = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])[:, 2]
+    return float(-cross_z[cross_z < 0].sum() / 2.0)
+
+
+### function: _segments_cross_triangles ###
+def _segments_cross_triangles(p, q, a, b, c, eps=1e-7):
+    """
+    Möller–Trumbore test of K segments against K triangles, strict: touching (shared
+    points, segment ends on the triangle) and coplanar configurations do not count.
+    """
+    d = q - p
+    e1, e2 = b - a, c - a
+    h = np.cross(d, e2)
+    det = np.einsum('ij,ij->i', e1, h)
+    valid = np.abs(det) > eps * np.linalg.norm(d, axis=1) * np.linalg.norm(e1, axis=1)
+    inv = np.where(valid, 1.0 / np.where(valid, det, 1.0), 0.0)
+
+    s = p - a
+    u = inv * np.einsum('ij,ij->i', s, h)
+    qv = np.cross(s, e1)
+    v = inv * np.einsum('ij,ij->i', d, qv)
+    t = inv * np.einsum('ij,ij->i', e2, qv)
+    return valid & (u > eps) & (v > eps) & (u + v < 1 - eps) & (t > eps) & (t < 1 - eps)
+
+
+### function: count_self_intersections ###
+def count_self_intersections(vertices, faces, block=512):
+    """
+    Counts the pairs of triangles crossing each other. Candidate pairs are found by
+    bounding box overlap (in blocks of rows, to bound the memory), pairs sharing a
+    vertex are skipped, and the remaining ones get an exact edge/triangle test in
+    both directions.
+
+    Returns:
+        int: Number of intersecting triangle pairs.
+    """
+    tri = vertices[faces]
+    lo, hi = tri.min(axis=1), tri.max(axis=1)
+    n = len(faces)
+
+    intersections = 0
+    for start in range(0, n, block):
+        rows = np.arange(start, min(start + block, n))
+        overlap = np.all((lo[rows, None] <= hi[None]) & (hi[rows, None] >= lo[None]), axis=2)
+        overlap &= rows[:, None] < np.arange(n)[None]
+        i, j = np.nonzero(overlap)
+        i = rows[i]
+        if len(i) == 0:
+            continue
+
+        shared = (faces[i][:, :, None] == faces[j][:, None, :]).any(axis=(1, 2))
+        i, j = i[~shared], j[~shared]
+        if len(i) == 0:
+            continue
+
+        hit = np.zeros(len(i), dtype=bool)
+        for first, second in ((i, j), (j, i)):
+            a, b, c = (np.repeat(tri[second][:, k], 3, axis=0) for k in range(3))
+            p = tri[first].reshape(-1, 3)
+            q = tri[first][:, [1, 2, 0]].reshape(-1, 3)
+            hit |= _segments_cross_triangles(p, q, a, b, c).reshape(-1, 3).any(axis=1)
+        intersections += int(np.count_nonzero(hit))
+
+    return intersections
+
+
+### function: check_mesh ###
+def check_mesh(vertices, faces, footprint_area=None, height=None, volume_range=DEFAULT_VOLUME_RANGE,
+               self_intersections=True):
+    """
+    Quality checks of a building mesh: watertightness, consistent and outward
+    winding, volume against footprint area x height, and self-intersections.
+
+    Args:
+        vertices (np.ndarray): (N, 3) vertices.
+        faces (np.ndarray): (M, 3) triangle indices.
+        footprint_area (float, optional): Area of the footprint (default: projected area of the mesh).
+        height (float, optional): Height of the building (default: Z extent of the mesh).
+        volume_range (tuple): Accepted (min, max) of volume / (footprint_area * height).
+        self_intersections (bool): Run the self-intersection test.
+
+    Returns:
+        dict: The flags and measures, with 'issues' (names of the failed checks) and 'passed'.
+    """
+    vertices, faces = weld_vertices(vertices, faces)
+    report = {'faces': int(len(faces))}
+    if len(faces) == 0:
+        report.update(issues=['empty'], passed=False)
+        return report
+
+    defects = edge_defects(faces)
+    volume = signed_volume(vertices, faces)
+    if footprint_area is None:
+        footprint_area = projected_area(vertices, faces)
+    if height is None:
+        height = float(vertices[:, 2].max() - vertices[:, 2].min())
+    reference = footprint_area * height
+
+    report.update(
+        watertight=defects['boundary'] == 0 and defects['non_manifold'] == 0,
+        consistent_winding=defects['inconsistent'] == 0,
+        inverted=volume < 0,
+        volume=round(volume, 3),
+        volume_ratio=round(abs(volume) / reference, 3) if reference > 0 else None,
+    )
+    if self_intersections and len(faces) <= MAX_SELF_INTERSECTION_FACES:
+        report['self_intersections'] = count_self_intersections(vertices, faces)
+
+    issues = []
+    if not report['watertight']:
+        issues.append('not_watertight')
+    if not report['consistent_winding']:
+        issues.append('inconsistent_winding')
+    if report['inverted']:
+        issues.append('inverted')
+    if report['volume_ratio'] is not None and not volume_range[0] <= report['volume_ratio'] <= volume_range[1]:
+        issues.append('volume')
+    if report.get('self_intersections'):
+        issues.append('self_intersecting')
+
+    report.update(issues=issues, passed=not issues)
+    return report
@@ -1,16 +1,27 @@
 import os
-import laspy
 import numpy as np
-import trimesh
 import sys
-from shapely.geometry import Point, Polygon
-from shapely.strtree import STRtree  # usa pygeos sotto il cofano
 
+from io_utils.las_catalog import LasCatalog, is_las_catalog
+from io_utils.point_store import PointStore, is_point_store
+from io_utils.las_records import LasRecords
+
+
+def load_las_points(las_path, x_offset, y_offset, memory_budget=2 * 1024 ** 3):
+    """
+    Loads the point cloud: a single LAS file is read in memory as raw integer
+    records (LasRecords), a point store (see build_point_store.py) is memory-mapped and a directory or
+    glob pattern of tiles is opened as a LasCatalog, read lazily.
+    """
+    if is_point_store(las_path):
+        return PointStore(las_path)
+    if is_las_catalog(las_path):
+        return LasCatalog(las_path, memory_budget)
+
+    import laspy  # heavy, only needed once the footprints are read
 
-def load_las_points(las_path, x_offset, y_offset):
     las = laspy.read(las_path)
-    points = np.vstack((las.x, las.y, las.z)).T  # Nx3 array
-    return points
+    return LasRecords.from_las(las)
 
 
 def get_mesh_bbox_2d_trimesh(mesh):
@@ -22,12 +33,7 @@ def get_mesh_bbox_2d_trimesh(mesh):
 
 
 def filter_points_in_bbox_trimesh(points, mesh):
-    minx, miny, maxx, maxy = get_mesh_bbox_2d_trimesh(mesh)
-    mask = (
-        (points[:, 0] >= minx) & (points[:, 0] <= maxx) &
-        (points[:, 1] >= miny) & (points[:, 1] <= maxy)
-    )
-    return points[mask]
+    return points_in_bbox(points, *get_mesh_bbox_2d_trimesh(mesh))
 
 
 # def filter_points_in_polygon(points, polygon: Polygon, buffer_dist=1):
@@ -71,10 +77,16 @@ def get_min_max_height(points):
 
 def get_min_max_z_from_filtered_points(filtered):
     if filtered.shape[0] == 0:
+        return get_min_max_z_from_range(None)
+
+    return get_min_max_z_from_range((filtered[:, 2].min(), filtered[:, 2].max()))
+
+
+def get_min_max_z_from_range(z_range):
+    if z_range is None:
         return 10, 0  # Default value
 
-    z_min = filtered[:, 2].min()
-    z_max = filtered[:, 2].max()
+    z_min, z_max = z_range
 
     # Se l'altezza è troppo bassa, impostala a z_min + 2
     if (z_max - z_min) < 2:
@@ -84,14 +96,116 @@ def get_min_max_z_from_filtered_points(filtered):
 
 
 def get_min_max_las(las_points, tmp_path_bbox, x_offset, y_offset, i):
+    import trimesh
+
     mesh = trimesh.load(tmp_path_bbox)
     mesh.apply_translation([x_offset, y_offset, 0])
 
     # polygon = get_2d_polygon_from_trimesh(mesh)
     # filtered = filter_points_in_polygon(las_points, polygon)
 
-    filtered = filter_points_in_bbox_trimesh(las_points, mesh)
+    z_min, z_max = get_min_max_z_from_range(z_range_in_bbox(las_points, *get_mesh_bbox_2d_trimesh(mesh)))
+
+    return z_min, z_max
+
+
+def get_min_max_for_footprint(las_points, exterior, x_offset, y_offset):
+    """
+    Returns the height range of the points inside the bounding box of a footprint,
+    raised to at least 2 m (see get_min_max_z_from_range).
 
-    z_min, z_max = get_min_max_z_from_filtered_points(filtered)
+    Args:
+        las_points: Point cloud (see points_in_bbox).
+        exterior (list of tuple): Exterior ring of the footprint (shifted coordinates).
+        x_offset (float): Offset along X axis.
+        y_offset (float): Offset along Y axis.
 
-    return z_min, z_max
\ No newline at end of file
+    Returns:
+        tuple: (z_min, z_max).
+    """
+    coords = np.asarray(exterior, dtype=np.float64)[:, :2]
+    minx, miny = coords.min(axis=0) + (x_offset, y_offset)
+    maxx, maxy = coords.max(axis=0) + (x_offset, y_offset)
+
+    return get_min_max_z_from_range(z_range_in_bbox(las_points, minx, miny, maxx, maxy))
+
+
+def las_fingerprint(las_points, exterior, x_offset, y_offset, decimals=2):
+    """
+    Summarizes the points under a footprint (bounding box), to detect the buildings
+    whose point cloud changed between two deliveries.
+
+    Returns:
+        list: [count, z_min, z_max, z_mean] (heights rounded to `decimals`), [0] without points.
+    """
+    coords = np.asarray(exterior, dtype=np.float64)[:, :2]
+    minx, miny = coords.min(axis=0) + (x_offset, y_offset)
+    maxx, maxy = coords.max(axis=0) + (x_offset, y_offset)
+
+    z = points_in_bbox(las_points, minx, miny, maxx, maxy)[:, 2]
+    if len(z) == 0:
+        return [0]
+    return [int(len(z)), round(float(z.min()), decimals), round(float(z.max()), decimals),
+            round(float(z.mean()), decimals)]
+
+
+def points_in_bbox(las_points, minx, miny, maxx, maxy):
+    """
+    Returns the points falling inside a 2D bounding box (world coordinates).
+
+    Args:
+        las_points (np.ndarray | LasRecords | LasCatalog | PointStore): (N, 3) array of point cloud
+            coordinates, raw records of a LAS file, catalog of LAS tiles or point store.
+        minx, miny, maxx, maxy (float): Bounding box.
+
+    Returns:
+        np.ndarray: (M, 3) array of the points inside the bounding box.
+    """
+    if isinstance(las_points, (LasRecords, LasCatalog, PointStore)):
+        return las_points.points_in_bbox(minx, miny, maxx, maxy)
+
+    mask = (
+        (las_points[:, 0] >= minx) & (las_points[:, 0] <= maxx) &
+        (las_points[:, 1] >= miny) & (las_points[:, 1] <= maxy)
+    )
+    return las_points[mask]
+
+
+def z_range_in_bbox(las_points, minx, miny, maxx, maxy):
+    """
+    Returns the height range of the points inside a 2D bounding box (world coordinates).
+    Raw LAS records answer in integer space, without converting the points.
+
+    Args:
+        las_points: Point cloud (see points_in_bbox).
+        minx, miny, maxx, maxy (float): Bounding box.
+
+    Returns:
+        tuple | None: (z_min, z_max), None if no point falls inside the box.
+    """
+    if isinstance(las_points, (LasRecords, LasCatalog)):
+        return las_points.z_range_in_bbox(minx, miny, maxx, maxy)
+
+    filtered = points_in_bbox(las_points, minx, miny, maxx, maxy)
+    if len(filtered) == 0:
+        return None
+    return filtered[:, 2].min(), filtered[:, 2].max()
+
+
+def footprints_bounds(polygons, x_offset, y_offset, margin=0.0):
+    """
+    Returns the 2D bounding box (world coordinates) of a set of footprints.
+
+    Args:
+        polygons (list of dict): Footprints with shifted 'exterior' coordinates.
+        x_offset (float): Offset along X axis.
+        y_offset (float): Offset along Y axis.
+        margin (float): Distance added on every side.
+
+    Returns:
+        tuple: (minx, miny, maxx, maxy).
+    """
+    coords = np.concatenate([np.asarray(p['exterior'], dtype=np.float64)[:, :2] for p in polygons])
+    minx, miny = coords.min(axis=0) + (x_offset - margin, y_offset - margin)
+    maxx, maxy = coords.max(axis=0) + (x_offset + margin, y_offset + margin)
+    return minx, miny, maxx, maxy
@@ -0,0 +1,174 @@
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+from shapely.geometry.polygon import orient
+
+from modeling.rounding import triangulate_polygon
+
+
+### function: footprint_polygon ###
+def footprint_polygon(exterior, holes=()):
+    """
+    Builds the 2D shapely polygon of a footprint, exterior counterclockwise and holes clockwise.
+    """
+    exterior = np.asarray(exterior, dtype=np.float64)[:, :2]
+    holes = [np.asarray(h, dtype=np.float64)[:, :2] for h in holes]
+    return orient(Polygon(exterior, holes), sign=1.0)
+
+
+### function: build_prism ###
+def build_prism(polygon, z_min, z_max):
+    """
+    Extrudes a footprint into a closed prism (LOD1 block) with NumPy only: constrained
+    Delaunay caps and one quad per ring edge.
+
+    Args:
+        polygon (Polygon): Footprint, exterior counterclockwise and holes clockwise (see footprint_polygon).
+        z_min (float): Height of the bottom face.
+        z_max (float): Height of the top face.
+
+    Returns:
+        tuple: ((N, 3) vertices, (M, 3) triangles), outward oriented.
+    """
+    xy, cap_faces = triangulate_polygon(polygon)
+    if len(cap_faces) == 0:
+        return np.empty((0, 3)), np.empty((0, 3), dtype=np.int64)
+
+    # Ring vertices are cap vertices too: look them up instead of duplicating them
+    xy = [tuple(p) for p in xy]
+    lookup = {p: i for i, p in enumerate(xy)}
+
+    rings = []
+    for ring in [polygon.exterior] + list(polygon.interiors):
+        idx = []
+        for p in map(tuple, np.asarray(ring.coords)[:-1]):
+            if p not in lookup:
+                lookup[p] = len(xy)
+                xy.append(p)
+            idx.append(lookup[p])
+        rings.append(np.array(idx, dtype=np.int64))
+
+    xy = np.asarray(xy)
+    n = len(xy)
+
+    walls = []
+    for idx in rings:
+        a, b = idx, np.roll(idx, -1)
+        # Bottom vertices are 0..n-1, top vertices n..2n-1
+        walls.append(np.column_stack([a, b, b + n]))
+        walls.append(np.column_stack([a, b + n, a + n]))
+
+    vertices = np.vstack([np.column_stack([xy, np.full(n, z_min)]),
+                          np.column_stack([xy, np.full(n, z_max)])])
+    faces = np.concatenate([cap_faces[:, ::-1], cap_faces + n] + walls)
+
+    return vertices, faces
+
+
+### function: _cap_triangles ###
+def _cap_triangles(polygons):
+    """
+    Constrained Delaunay triangulation of many footprints in one call.
+
+    Invalid footprints get no triangle. If GEOS still fails on the batch, the
+    footprints are triangulated one by one and the failing ones are skipped.
+
+    Returns:
+        tuple: ((T, 3, 2) counterclockwise triangle corners, (T,) index of the footprint of every triangle).
+    """
+    polygons = np.where(shapely.is_valid(polygons), polygons, None)
+    if hasattr(shapely, 'constrained_delaunay_triangles'):
+        try:
+            tris, owner = shapely.get_parts(shapely.constrained_delaunay_triangles(polygons), return_index=True)
+        except shapely.errors.GEOSException:
+            parts = []
+            for i, polygon in enumerate(polygons):
+                try:
+                    parts.append(shapely.get_parts(shapely.constrained_delaunay_triangles(polygon)))
+                except shapely.errors.GEOSException:
+                    parts.append(np.empty(0, dtype=object))
+            tris = np.concatenate(parts) if parts else np.empty(0, dtype=object)
+            owner = np.repeat(np.arange(len(polygons)), [len(p) for p in parts])
+    else:
+        tris, owner = shapely.get_parts(shapely.delaunay_triangles(polygons), return_index=True)
+        inside = shapely.contains_properly(polygons[owner], shapely.centroid(tris))
+        tris, owner = tris[inside], owner[inside]
+
+    corners = shapely.get_coordinates(shapely.get_exterior_ring(tris)).reshape(len(tris), 4, 2)[:, :3]
+    v0, v1, v2 = corners[:, 0], corners[:, 1], corners[:, 2]
+    cw = ((v1[:, 0] - v0[:, 0]) * (v2[:, 1] - v0[:, 1]) - (v1[:, 1] - v0[:, 1]) * (v2[:, 0] - v0[:, 0])) < 0
+    corners[cw] = corners[cw][:, ::-1]
+    return corners, owner
+
+
+### function: build_prisms ###
+def build_prisms(polygons, z_min, z_max):
+    """
+    Extrudes many footprints into closed prisms at once: same meshes as build_prism,
+    but the caps of all the footprints are triangulated in a single GEOS call and the
+    walls are built from the ragged array of all the ring coordinates. Python only
+    loops to slice the result per building.
+
+    Args:
+        polygons (sequence of Polygon): Footprints, exterior counterclockwise and holes clockwise.
+        z_min (array-like): (K,) height of the bottom faces.
+        z_max (array-like): (K,) height of the top faces.
+
+    Returns:
+        list of tuple: ((N, 3) vertices, (M, 3) triangles) of every footprint, outward oriented;
+        empty arrays for the invalid footprints and those that could not be triangulated.
+    """
+    polygons = np.asarray(polygons, dtype=object)
+    z_min = np.asarray(z_min, dtype=np.float64)
+    z_max = np.asarray(z_max, dtype=np.float64)
+    count = len(polygons)
+
+    corners, cap_owner = _cap_triangles(polygons)
+
+    # Closed rings (exterior first): consecutive coordinates of the same ring are the wall edges
+    rings, ring_owner = shapely.get_rings(polygons, return_index=True)
+    ring_coords, ring_id = shapely.get_coordinates(rings, return_index=True)
+    ring_owner = ring_owner[ring_id]
+
+    # Vertices shared by caps and walls, numbered building by building: (building, x, y) rows sorted by building
+    keys = np.vstack([np.column_stack([np.repeat(cap_owner, 3), corners.reshape(-1, 2)]),
+                      np.column_stack([ring_owner, ring_coords])])
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    vertex_owner = unique[:, 0].astype(np.int64)
+    first = np.searchsorted(vertex_owner, np.arange(count + 1))
+    sizes = np.diff(first)
+
+    # Building b stores its bottom vertices then its top ones from 2 * first[b]: the bottom copy
+    # of the 2D vertex g is g + first[b], the top one g + first[b] + sizes[b]
+    cap = inverse[:3 * len(cap_owner)].reshape(-1, 3) + first[cap_owner, None]
+    ring = inverse[3 * len(cap_owner):]
+
+    edge = (ring_id[:-1] == ring_id[1:]) & (ring[:-1] != ring[1:])
+    wall_owner = ring_owner[:-1][edge]
+    a, b = ring[:-1][edge] + first[wall_owner], ring[1:][edge] + first[wall_owner]
+    cap_size, wall_size = sizes[cap_owner, None], sizes[wall_owner]
+
+    # Reversed bottom cap, top cap and one quad per ring edge, bottom to top
+    faces = np.concatenate([cap[:, ::-1], cap + cap_size,
+                            np.column_stack([a, b, b + wall_size]),
+                            np.column_stack([a, b + wall_size, a + wall_size])])
+    owner = np.concatenate([cap_owner, cap_owner, wall_owner, wall_owner])
+
+    order = np.argsort(owner, kind='stable')
+    faces, owner = faces[order], owner[order]
+    face_first = np.searchsorted(owner, np.arange(count + 1))
+
+    xy = unique[:, 1:]
+    bottom = np.arange(len(xy)) + first[vertex_owner]
+    top = bottom + sizes[vertex_owner]
+    vertices = np.empty((2 * len(xy), 3))
+    vertices[bottom, :2], vertices[bottom, 2] = xy, z_min[vertex_owner]
+    vertices[top, :2], vertices[top, 2] = xy, z_max[vertex_owner]
+    vertex_first = 2 * first
+
+    has_cap = np.zeros(count, dtype=bool)
+    has_cap[cap_owner] = True
+    empty = (np.empty((0, 3)), np.empty((0, 3), dtype=np.int64))
+    return [(vertices[vertex_first[i]:vertex_first[i + 1]], faces[face_first[i]:face_first[i + 1]] - vertex_first[i])
+            if has_cap[i] else empty for i in range(count)]
@@ -0,0 +1,207 @@
+import os
+import sys
+import math
+import hashlib
+import numpy as np
+from collections import OrderedDict
+
+#######################################################
+# Adds the root project in the Python path
+#######################################################
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_dir)
+#######################################################
+
+from modeling.min_bounding_rect import minBoundingRect
+
+
+### function: _open_ring ###
+def _open_ring(coords):
+    ring = np.asarray(coords, dtype=np.float64).reshape(len(coords), -1)[:, :2]
+    if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+        ring = ring[:-1]
+    return ring
+
+
+### function: _canonical_ring_start ###
+def _canonical_ring_start(ring):
+    """
+    Rolls a quantized ring so that it starts from its lexicographically smallest vertex.
+    """
+    start = np.lexsort((ring[:, 1], ring[:, 0]))[0]
+    return np.roll(ring, -start, axis=0)
+
+
+class FootprintFrame:
+    """
+    Rigid 2D transformation (plus a vertical shift) between the world coordinates of
+    a footprint and its canonical frame: centered on its minimum bounding rectangle,
+    rotated to the rectangle axes and with the base at z = 0.
+    """
+
+    def __init__(self, center, angle, z_base):
+        self.center = np.asarray(center, dtype=np.float64)
+        self.angle = angle
+        self.z_base = z_base
+
+        cos_a, sin_a = math.cos(angle), math.sin(angle)
+        self.rotation = np.array([[cos_a, sin_a], [-sin_a, cos_a]])
+
+    def to_canonical(self, vertices):
+        out = np.array(vertices, dtype=np.float64)
+        out[:, :2] = (out[:, :2] - self.center) @ self.rotation.T
+        out[:, 2] -= self.z_base
+        return out
+
+    def to_world(self, vertices):
+        out = np.array(vertices, dtype=np.float64)
+        out[:, :2] = out[:, :2] @ self.rotation + self.center
+        out[:, 2] += self.z_base
+        return out
+
+
+### function: canonicalize_footprint ###
+def canonicalize_footprint(exterior, holes, z_base, precision=0.01):
+    """
+    Brings a footprint to its canonical form, so that footprints differing only by
+    a translation and a rotation get the same representation.
+
+    The footprint is translated to the center of its minimum bounding rectangle and
+    rotated to the rectangle angle. Since that angle is only defined modulo 90 degrees,
+    the four axis-aligned rotations are quantized and the smallest one is kept.
+    Every quantized ring starts from its smallest vertex and the holes are sorted.
+
+    Args:
+        exterior (list of tuple): Exterior ring coordinates.
+        holes (list of list of tuple): Hole ring coordinates.
+        z_base (float): Height of the base of the building.
+        precision (float): Quantization step of the canonical coordinates.
+
+    Returns:
+        tuple: (FootprintFrame, bytes) the canonical frame and the quantized footprint.
+    """
+    ext = _open_ring(exterior)
+    rings = [ext] + [_open_ring(h) for h in holes]
+
+    from scipy.spatial import ConvexHull
+
+    hull = ext[ConvexHull(ext).vertices]
+    rect_angle, _, _, _, center, _ = minBoundingRect(np.vstack([hull, hull[:1]]))
+
+    best = None
+    for k in range(4):
+        frame = FootprintFrame(center, rect_angle + k * math.pi / 2, z_base)
+        quantized = []
+        for ring in rings:
+            local = (ring - frame.center) @ frame.rotation.T
+            quantized.append(_canonical_ring_start(np.rint(local / precision).astype(np.int64)))
+
+        holes_sorted = sorted(r.tobytes() for r in quantized[1:])
+        shape = b"|".join([quantized[0].tobytes()] + holes_sorted)
+        if best is None or shape < best[1]:
+            best = (frame, shape)
+
+    return best
+
+
+### function: roof_cache_key ###
+def roof_cache_key(shape, roof_type, height, round_edges, precision=0.01, variant=""):
+    """
+    Builds the cache key of a roof from its canonical footprint and its parameters.
+    The variant describes the other modeling options affecting the geometry.
+    """
+    digest = hashlib.sha1(shape)
+    digest.update(f"|{roof_type}|{int(round(height / precision))}|{bool(round_edges)}|{variant}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class RoofCache:
+    """
+    LRU cache of finished roof meshes, stored in the canonical frame of their footprint.
+
+    Entries live in memory (up to max_entries) and, if cache_dir is given, also on disk
+    as .npz files, so that they survive worker recycling and can be shared between runs.
+
+    Args:
+        max_entries (int): Maximum number of meshes kept in memory.
+        cache_dir (str, optional): Folder of the persistent cache.
+    """
+
+    def __init__(self, max_entries=1024, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evicted'] += 1
+
+    def get(self, key):
+        """
+        Returns the cached (vertices, faces) of a key, None on a miss.
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return self.entries[key]
+
+        if self.cache_dir and os.path.exists(self._disk_path(key)):
+            try:
+                with np.load(self._disk_path(key)) as data:
+                    entry = (data['vertices'], data['faces'])
+                self._remember(key, entry)
+                self.stats['disk_hits'] += 1
+                return entry
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠ Unreadable roof cache entry {key}: {e}")
+
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, key, vertices, faces):
+        """
+        Stores the canonical vertices and the faces of a finished roof.
+        """
+        entry = (np.asarray(vertices, dtype=np.float64), np.asarray(faces, dtype=np.int64))
+        self._remember(key, entry)
+        self.stats['stored'] += 1
+
+        if self.cache_dir:
+            path = self._disk_path(key)
+            tmp_path = path + ".tmp.npz"
+            np.savez(tmp_path, vertices=entry[0], faces=entry[1])
+            os.replace(tmp_path, path)
+
+
+### function: cache_hit_rates ###
+def cache_hit_rates(counters):
+    """
+    Computes the hit rates from the accumulated roof cache counters.
+
+    Args:
+        counters (dict): Values of 'hits', 'disk_hits' and 'misses'.
+
+    Returns:
+        dict: Lookups and hit rates (in percent).
+    """
+    hits = counters.get('hits', 0)
+    disk_hits = counters.get('disk_hits', 0)
+    lookups = hits + disk_hits + counters.get('misses', 0)
+    if lookups == 0:
+        return {'lookups': 0}
+
+    return {
+        'lookups': lookups,
+        'hit_rate_percent': round(100.0 * (hits + disk_hits) / lookups, 2),
+        'disk_hit_rate_percent': round(100.0 * disk_hits / lookups, 2),
+    }
@@ -0,0 +1,338 @@
+import os
+import sys
+import math
+import numpy as np
+import shapely
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+#######################################################
+# Adds the root project in the Python path
+#######################################################
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_dir)
+#######################################################
+
+import modeling.pointcloud_ops as pointcloud_ops
+from io_utils.las_catalog import LasCatalog, morton_codes
+from io_utils.point_store import PointStore
+
+
+ROOF_CLASSES = ('flat', 'gabled', 'hip', 'pyramid')
+
+# Cells of the grid binning the points before they are gathered under the footprints
+GATHER_CELL_SIZE = 10.0
+
+# Aspect bins, in the frame of the minimum rotated rectangle (u = long axis)
+BIN_PLUS_U, BIN_PLUS_V, BIN_MINUS_U, BIN_MINUS_V = range(4)
+
+
+### function: is_roof_missing ###
+def is_roof_missing(roof):
+    """
+    Checks whether the roof attribute of a footprint is missing (None, NaN or empty).
+    """
+    if roof is None:
+        return True
+    if isinstance(roof, float) and math.isnan(roof):
+        return True
+    return isinstance(roof, str) and roof.strip() == ""
+
+
+### function: get_rectangle_frames ###
+def get_rectangle_frames(geoms):
+    """
+    Computes, for all the footprints at once, the frame of their minimum rotated rectangle.
+
+    Args:
+        geoms (np.ndarray): Array of shapely polygons.
+
+    Returns:
+        tuple: (centers (N, 2), angles (N,), long sides (N,), short sides (N,)),
+               where the angle is the direction of the long side.
+    """
+    rects = shapely.minimum_rotated_rectangle(geoms)
+    corners = shapely.get_coordinates(shapely.get_exterior_ring(rects)).reshape(len(geoms), 5, 2)[:, :4]
+
+    edge_a = corners[:, 1] - corners[:, 0]
+    edge_b = corners[:, 2] - corners[:, 1]
+    len_a = np.linalg.norm(edge_a, axis=1)
+    len_b = np.linalg.norm(edge_b, axis=1)
+
+    a_is_long = len_a >= len_b
+    long_edge = np.where(a_is_long[:, None], edge_a, edge_b)
+
+    centers = corners.mean(axis=1)
+    angles = np.arctan2(long_edge[:, 1], long_edge[:, 0])
+    long_sides = np.maximum(len_a, len_b)
+    short_sides = np.minimum(len_a, len_b)
+
+    return centers, angles, long_sides, short_sides
+
+
+### function: classify_batch ###
+def classify_batch(points, owner, centers, angles, long_sides, short_sides,
+                   cell_size=0.5, flat_slope_deg=10.0, min_cells=8):
+    """
+    Classifies the roofs of a batch of footprints from their points, all at once.
+
+    The points of every footprint are rasterized (max Z per cell) on a grid aligned
+    with its minimum rotated rectangle. Slopes and downslope directions are computed
+    with central differences over the ragged set of grids, then the histogram of
+    directions of the sloped cells decides the roof type:
+    - few sloped cells: flat,
+    - slopes facing the two long sides: gabled,
+    - slopes facing all four sides: pyramid if the footprint is almost square, hip otherwise.
+
+    Args:
+        points (np.ndarray): (N, 3) points of all the footprints (coordinates relative to a common origin).
+        owner (np.ndarray): (N,) index of the footprint each point belongs to.
+        centers, angles, long_sides, short_sides: Frames returned by get_rectangle_frames.
+        cell_size (float): Size of the raster cells.
+        flat_slope_deg (float): Cells with a smaller slope are considered flat.
+        min_cells (int): Minimum number of cells with a valid slope to classify a footprint.
+
+    Returns:
+        list: Roof type of each footprint, None if there are not enough points.
+    """
+    n = len(centers)
+    if n == 0:
+        return []
+
+    # Grid of each footprint
+    nu = np.ceil(long_sides / cell_size).astype(np.int64) + 1
+    nv = np.ceil(short_sides / cell_size).astype(np.int64) + 1
+    cells_per_footprint = nu * nv
+    offsets = np.concatenate([[0], np.cumsum(cells_per_footprint)[:-1]])
+    total_cells = int(cells_per_footprint.sum())
+
+    # Points in the local frame of their footprint
+    cos_a, sin_a = np.cos(angles[owner]), np.sin(angles[owner])
+    dx = points[:, 0] - centers[owner, 0]
+    dy = points[:, 1] - centers[owner, 1]
+    u = dx * cos_a + dy * sin_a + long_sides[owner] / 2.0
+    v = -dx * sin_a + dy * cos_a + short_sides[owner] / 2.0
+
+    iu = np.clip(np.floor(u / cell_size).astype(np.int64), 0, nu[owner] - 1)
+    iv = np.clip(np.floor(v / cell_size).astype(np.int64), 0, nv[owner] - 1)
+
+    # Highest point of each cell
+    grid = np.full(total_cells, -np.inf)
+    np.maximum.at(grid, offsets[owner] + iu * nv[owner] + iv, points[:, 2])
+    grid[np.isinf(grid)] = np.nan
+
+    # Central differences on the ragged grids
+    cell_owner = np.repeat(np.arange(n), cells_per_footprint)
+    local = np.arange(total_cells) - offsets[cell_owner]
+    cu, cv = local // nv[cell_owner], local % nv[cell_owner]
+    cell_nv = nv[cell_owner]
+
+    inner_u = (cu > 0) & (cu < nu[cell_owner] - 1)
+    inner_v = (cv > 0) & (cv < cell_nv - 1)
+    cells = np.arange(total_cells)
+
+    gu = np.full(total_cells, np.nan)
+    gv = np.full(total_cells, np.nan)
+    iu_cells, iv_cells = cells[inner_u], cells[inner_v]
+    gu[iu_cells] = (grid[iu_cells + cell_nv[inner_u]] - grid[iu_cells - cell_nv[inner_u]]) / (2 * cell_size)
+    gv[iv_cells] = (grid[iv_cells + 1] - grid[iv_cells - 1]) / (2 * cell_size)
+
+    valid = np.isfinite(gu) & np.isfinite(gv)
+    slope = np.hypot(gu, gv)
+    sloped = valid & (slope > math.tan(math.radians(flat_slope_deg)))
+
+    # Downslope direction, quantized on the 4 sides of the rectangle
+    aspect = np.where(valid, np.arctan2(-gv, -gu), 0.0)
+    bins = np.mod(np.rint(aspect / (math.pi / 2)), 4).astype(np.int64)
+
+    n_valid = np.bincount(cell_owner[valid], minlength=n)
+    n_sloped = np.bincount(cell_owner[sloped], minlength=n)
+    hist = np.bincount(cell_owner[sloped] * 4 + bins[sloped], minlength=n * 4).reshape(n, 4).astype(np.float64)
+    hist /= np.maximum(n_sloped, 1)[:, None]
+
+    sloped_fraction = n_sloped / np.maximum(n_valid, 1)
+    long_sides_fraction = hist[:, BIN_PLUS_V] + hist[:, BIN_MINUS_V]
+    short_sides_fraction = hist[:, BIN_PLUS_U] + hist[:, BIN_MINUS_U]
+    all_sides = hist.min(axis=1) > 0.1
+    balanced = hist.min(axis=1) > 0.5 * hist.max(axis=1)
+    squarish = long_sides < 1.2 * short_sides
+
+    roof_types = np.where(
+        sloped_fraction < 0.35, 'flat',
+        np.where(long_sides_fraction > 0.8, 'gabled',
+                 np.where(all_sides & balanced & squarish, 'pyramid',
+                          np.where(all_sides, 'hip',
+                                   np.where(long_sides_fraction >= short_sides_fraction, 'gabled', 'hip'))))
+    )
+
+    return [str(r) if n_valid[i] >= min_cells else None for i, r in enumerate(roof_types)]
+
+
+class PointGrid:
+    """
+    Points binned once on a regular grid, sorted by row-major cell key, so that the
+    points of many footprints are gathered together: the cell rows under every
+    bounding box are found with a single searchsorted, and the candidates are tested
+    against their footprint with one vectorized contains_xy.
+
+    Args:
+        points (np.ndarray): (N, 3) points, in the coordinates of the footprints.
+        bounds (tuple): (minx, miny, maxx, maxy) of the footprints to gather; other points are dropped.
+        cell_size (float): Size of the grid cells.
+    """
+
+    def __init__(self, points, bounds, cell_size=GATHER_CELL_SIZE):
+        minx, miny, maxx, maxy = bounds
+        self.origin = np.array([minx, miny])
+        self.cell_size = cell_size
+        self.cols = int((maxx - minx) // cell_size) + 1
+
+        inside = (points[:, 0] >= minx) & (points[:, 0] <= maxx) & (points[:, 1] >= miny) & (points[:, 1] <= maxy)
+        points = points[inside]
+        keys = self._keys(points[:, 0], points[:, 1])
+        order = np.argsort(keys, kind='stable')
+        self.keys, self.points = keys[order], points[order]
+
+    def _cells(self, x, y):
+        ix = ((np.asarray(x) - self.origin[0]) // self.cell_size).astype(np.int64)
+        iy = ((np.asarray(y) - self.origin[1]) // self.cell_size).astype(np.int64)
+        return ix, iy
+
+    def _keys(self, x, y):
+        ix, iy = self._cells(x, y)
+        return iy * self.cols + ix
+
+    def gather(self, geoms):
+        """
+        Gathers the points inside a batch of footprints.
+
+        Args:
+            geoms (np.ndarray): Array of shapely polygons.
+
+        Returns:
+            tuple: ((M, 3) points, (M,) index of their footprint in geoms), grouped by footprint.
+        """
+        bounds = shapely.bounds(geoms)
+        ix0, iy0 = self._cells(bounds[:, 0], bounds[:, 1])
+        ix1, iy1 = self._cells(bounds[:, 2], bounds[:, 3])
+
+        # One [first, last] key range per row of cells under each bounding box
+        rows_per_footprint = iy1 - iy0 + 1
+        row_owner = np.repeat(np.arange(len(geoms)), rows_per_footprint)
+        first_row = np.cumsum(rows_per_footprint) - rows_per_footprint
+        rows = iy0[row_owner] + np.arange(len(row_owner)) - first_row[row_owner]
+        ranges = np.searchsorted(self.keys, np.concatenate([rows * self.cols + ix0[row_owner],
+                                                            rows * self.cols + ix1[row_owner] + 1]))
+        starts, ends = np.split(ranges, 2)
+
+        # Ragged gather of the runs
+        lengths = ends - starts
+        run_start = np.cumsum(lengths) - lengths
+        candidates = np.repeat(starts - run_start, lengths) + np.arange(int(lengths.sum()))
+        owner = np.repeat(row_owner, lengths)
+
+        points = self.points[candidates]
+        inside = shapely.contains_xy(geoms[owner], points[:, 0], points[:, 1])
+        return points[inside], owner[inside]
+
+
+### function: _chunk_grids ###
+def _chunk_grids(las_points, geoms, x_offset, y_offset, chunk_size):
+    """
+    Yields the points of the footprints chunk by chunk, with the grid they are gathered
+    from. An in-memory cloud is cropped and binned once; the indexed sources (point
+    store, LAS tiles) are queried on the bounding box of each chunk.
+    """
+    def world_query(bounds):
+        minx, miny, maxx, maxy = bounds
+        points = pointcloud_ops.points_in_bbox(las_points, minx + x_offset, miny + y_offset,
+                                               maxx + x_offset, maxy + y_offset)
+        return points - (x_offset, y_offset, 0.0)
+
+    indexed = isinstance(las_points, (PointStore, LasCatalog))
+    grid = None
+    if not indexed:
+        bounds = shapely.total_bounds(geoms)
+        grid = PointGrid(world_query(bounds), bounds)
+
+    for start in range(0, len(geoms), chunk_size):
+        chunk = geoms[start:start + chunk_size]
+        if indexed:
+            bounds = shapely.total_bounds(chunk)
+            grid = PointGrid(world_query(bounds), bounds)
+        yield start, grid.gather(chunk)
+
+
+### function: _classify_chunk ###
+def _classify_chunk(job):
+    return classify_batch(*job['args'], **job['kwargs'])
+
+
+### function: classify_missing_roofs ###
+def classify_missing_roofs(polygons, las_points, x_offset, y_offset,
+                           cell_size=0.5, flat_slope_deg=10.0, workers=1, chunk_size=500):
+    """
+    Assigns a roof type (flat, gabled, hip, pyramid) to the footprints without
+    a 'roof' attribute, using the already loaded point cloud.
+
+    Args:
+        polygons (list): List of polygon dictionaries with 'exterior', 'holes' and 'roof'.
+        las_points: Point cloud data already loaded in memory.
+        x_offset (float): Offset along X axis.
+        y_offset (float): Offset along Y axis.
+        cell_size (float): Size of the raster cells used to compute slopes.
+        flat_slope_deg (float): Slope under which a cell is considered flat.
+        workers (int): Number of processes classifying the chunks (1 runs in-process).
+        chunk_size (int): Number of footprints classified in a single batch.
+
+    Returns:
+        dict: Number of footprints assigned to each roof type ('unknown' when not classifiable).
+    """
+    stats = {'classified': 0, 'unknown': 0}
+    stats.update({roof: 0 for roof in ROOF_CLASSES})
+
+    targets = [poly for poly in polygons if is_roof_missing(poly.get('roof'))]
+    if not targets:
+        return stats
+
+    geoms = np.array([shapely.Polygon([c[:2] for c in p['exterior']], [[c[:2] for c in h] for h in p['holes']])
+                      for p in targets])
+
+    # Chunks of neighbouring footprints keep the point queries small
+    centers = shapely.get_coordinates(shapely.centroid(geoms))
+    order = np.argsort(morton_codes(centers, shapely.total_bounds(geoms)), kind='stable')
+    targets, geoms = [targets[i] for i in order], geoms[order]
+    centers, angles, long_sides, short_sides = get_rectangle_frames(geoms)
+
+    def jobs():
+        for start, (points, owner) in _chunk_grids(las_points, geoms, x_offset, y_offset, chunk_size):
+            sl = slice(start, start + chunk_size)
+            yield {
+                'args': (points, owner, centers[sl], angles[sl], long_sides[sl], short_sides[sl]),
+                'kwargs': {'cell_size': cell_size, 'flat_slope_deg': flat_slope_deg},
+            }
+
+    # The chunks are gathered while the workers classify, at most two per worker in flight
+    results = []
+    if workers > 1 and len(targets) > chunk_size:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for job in jobs():
+                pending.append(executor.submit(_classify_chunk, job))
+                if len(pending) >= 2 * workers:
+                    results.append(pending.popleft().result())
+            results += [future.result() for future in pending]
+    else:
+        results = [_classify_chunk(job) for job in jobs()]
+
+    roof_types = [roof for result in results for roof in result]
+    for poly, roof in zip(targets, roof_types):
+        if roof is None:
+            stats['unknown'] += 1
+            continue
+        poly['roof'] = roof
+        poly['roof_source'] = 'classifier'
+        stats['classified'] += 1
+        stats[roof] += 1
+
+    return stats
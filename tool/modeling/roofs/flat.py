@@ -13,7 +13,7 @@ from shapefile.converter import create_mesh_from_polygon
 
 
 ### function: create_flat_roof ###
-def create_flat_roof(base_obj, height, exterior_coords, round_edges=False):
+def create_flat_roof(base_obj, height, exterior_coords, round_edges=False, round_method="fillet2d"):
     """
     Creates a flat roof by extruding the base object upward. Optionally applies 
     edge rounding on the outer perimeter using a bevel modifier.
@@ -23,6 +23,8 @@ def create_flat_roof(base_obj, height, exterior_coords, round_edges=False):
     - height (float): The extrusion height to form the flat roof.
     - exterior_coords (list of tuple): Coordinates of the outer loop for edge rounding.
     - round_edges (bool): If True, apply rounding to the outer edges using a beveled mesh.
+    - round_method (str): 'fillet2d' rounds the footprint in 2D before the extrusion,
+      'bevel' intersects the building with a beveled outline.
 
     Returns:
     - Object: The final modified mesh object with a flat roof.
@@ -30,9 +32,10 @@ def create_flat_roof(base_obj, height, exterior_coords, round_edges=False):
 
     # Prepare base mesh
     blender_ops.merge_close_vertices(base_obj)
+    rounded = round_edges and round_method == "fillet2d" and blender_ops.round_footprint_2d(base_obj, exterior_coords)
     blender_ops.extrude_faces_z(base_obj, height)
 
-    if round_edges:
+    if round_edges and not rounded:
         # Create beveled outline mesh
         round_obj = create_mesh_from_polygon("round_edge", exterior_coords, [])
         blender_ops.merge_close_vertices(round_obj)
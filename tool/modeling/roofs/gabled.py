@@ -30,7 +30,7 @@ def calculate_roof_height(base_length, slope_percent=22):
 
 
 ### function: create_gabled_roof ###
-def create_gabled_roof(base_obj, height, exterior_coords, round_edges=False):
+def create_gabled_roof(base_obj, height, exterior_coords, round_edges=False, round_method="fillet2d"):
     """
     Constructs a gabled roof on the given base mesh by creating a sloped bounding box 
     and cutting it from the extruded base. Optionally applies rounding on the outer edges.
@@ -50,6 +50,8 @@ def create_gabled_roof(base_obj, height, exterior_coords, round_edges=False):
     - height (float): Vertical height for roof extrusion.
     - exterior_coords (list of tuple): Coordinates of the outer loop for rounding.
     - round_edges (bool): Whether to apply a rounded bevel to outer edges.
+    - round_method (str): 'fillet2d' rounds the footprint in 2D before the extrusion,
+      'bevel' intersects the building with a beveled outline.
 
     Returns:
     - bpy.types.Object: The resulting mesh object with the gabled roof.
@@ -71,13 +73,16 @@ def create_gabled_roof(base_obj, height, exterior_coords, round_edges=False):
     blender_ops.align_mesh_to_reference(bbox, height)
     blender_ops.move_mesh_z(bbox, -0.1)
 
+    # Round the footprint once the gable box is defined, so that the ridge does not change
+    rounded = round_edges and round_method == "fillet2d" and blender_ops.round_footprint_2d(base_obj, exterior_coords)
+
     # Extrude the base mesh upward
     blender_ops.extrude_faces_z(base_obj, height)
 
     # Cut the base using the gabled volume
     blender_ops.apply_boolean_difference(base_obj, bbox, modifier_name="Boolean_Diff")
 
-    if round_edges:
+    if round_edges and not rounded:
         # Create and bevel the polygon outline mesh
         round_obj = create_mesh_from_polygon("round_edge", exterior_coords, [])
         blender_ops.merge_close_vertices(round_obj)
@@ -1,7 +1,6 @@
 import bpy
 import os
 import sys
-import subprocess
 
 
 #######################################################
@@ -15,26 +14,16 @@ sys.path.append(parent_dir)
 from io_utils.exporter import export_polygon_to_txt
 from io_utils.importer import import_ply
 import modeling.blender_ops as blender_ops
+from modeling.skeleton import CPP_PATH, run_executable, build_native_lod2
 from shapefile.converter import create_mesh_from_polygon
 
 
-TMP_OUT_MESH = "/tmp/pyramid.ply"
-CPP_PATH = "/app/tool/cpp/build/extrude_skeleton"
-
-
-### function: run_executable ###
-def run_executable(exe_path, args=None):
-    cmd = [exe_path]
-    if args:
-        cmd.extend(args)
-
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-
-    return proc.stdout, proc.stderr, proc.returncode
+TMP_OUT_MESH = os.path.join(blender_ops.TMP_DIR, "pyramid.ply")
 
 
 ### function: create_pyramid_roof ###
-def create_pyramid_roof(base_obj, height, idx, exterior_coords, round_edges=False):
+def create_pyramid_roof(base_obj, height, idx, exterior_coords, round_edges=False, native=False,
+                        round_method="fillet2d"):
     """
     Creates a pyramid roof on top of a base mesh object using an external C++ process.
     If the external process fails, only the base mesh is extruded.
@@ -45,49 +34,64 @@ def create_pyramid_roof(base_obj, height, idx, exterior_coords, round_edges=Fals
     - idx (int): Index used for temporary file naming.
     - exterior_coords (list of tuple): Coordinates of the outer loop (used for edge rounding).
     - round_edges (bool): Whether to round the external edges of the roof.
+    - native (bool): Whether to assemble walls and roof in the C++ process.
+    - round_method (str): 'fillet2d' clips the building in 2D against the rounded footprint,
+      'bevel' intersects it with a beveled outline.
 
     Returns:
     - Object: The final mesh object (either roof + base or just base extruded).
     """
     blender_ops.merge_close_vertices(base_obj)
 
-    # Export base polygon for roof generation
-    txt_path = f"/tmp/input_{idx}.txt"
-    export_polygon_to_txt(base_obj, txt_path)
-
-    # Attempt to generate pyramid roof using external process
-    stdout, stderr, code = run_executable(CPP_PATH, [txt_path, TMP_OUT_MESH, "20.0"])
-
-    if code != 0:
-        print("⚠️ External C++ process failed. Skipping pyramid roof generation.")
-        blender_ops.extrude_faces_z(base_obj, height)
+    if native:
+        # Walls and roof assembled in one step by the C++ process
+        base_extrude_height = build_native_lod2(base_obj, height, idx, "pyramid", 20.0)
+        if base_extrude_height is None:
+            print("⚠️ Native LOD2 assembly failed. Skipping pyramid roof generation.")
+            base_extrude_height = height
+            blender_ops.extrude_faces_z(base_obj, height)
     else:
-        # Import generated pyramid roof mesh
-        try:
-            pyramid_obj = import_ply(TMP_OUT_MESH)
-            blender_ops.clean_tmp_folder()
-            blender_ops.delete_downward_faces(pyramid_obj)
-
-            # Fuse top vertices
-            blender_ops.collapse_top_vertices_to_center(pyramid_obj)
-            blender_ops.merge_close_vertices(pyramid_obj)
-
-            pyramid_height = blender_ops.get_mesh_height(pyramid_obj)
-            base_extrude_height = height - pyramid_height
-            if (base_extrude_height < 0):
-                base_extrude_height = 1.0
-
-            blender_ops.extrude_faces_z(base_obj, base_extrude_height)
-            blender_ops.align_bottom_to_top(pyramid_obj, base_obj)
-            blender_ops.delete_facing_up_faces(base_obj)
-
-            # Join roof with base
-            blender_ops.join_meshes(base_obj, pyramid_obj)
-            blender_ops.merge_close_vertices(base_obj)
-        except:
-            print("⚠️ failed importing geometry.")
-
-    if round_edges:
+        # Export base polygon for roof generation
+        txt_path = os.path.join(blender_ops.TMP_DIR, f"input_{idx}.txt")
+        export_polygon_to_txt(base_obj, txt_path)
+
+        # Attempt to generate pyramid roof using external process
+        stdout, stderr, code = run_executable(CPP_PATH, [txt_path, TMP_OUT_MESH, "20.0"])
+
+        if code != 0:
+            print("⚠️ External C++ process failed. Skipping pyramid roof generation.")
+            base_extrude_height = height
+            blender_ops.extrude_faces_z(base_obj, height)
+        else:
+            # Import generated pyramid roof mesh
+            try:
+                pyramid_obj = import_ply(TMP_OUT_MESH)
+                blender_ops.clean_tmp_folder()
+                blender_ops.delete_downward_faces(pyramid_obj)
+
+                # Fuse top vertices
+                blender_ops.collapse_top_vertices_to_center(pyramid_obj)
+                blender_ops.merge_close_vertices(pyramid_obj)
+
+                pyramid_height = blender_ops.get_mesh_height(pyramid_obj)
+                base_extrude_height = height - pyramid_height
+                if (base_extrude_height < 0):
+                    base_extrude_height = 1.0
+
+                blender_ops.extrude_faces_z(base_obj, base_extrude_height)
+                blender_ops.align_bottom_to_top(pyramid_obj, base_obj)
+                blender_ops.delete_facing_up_faces(base_obj)
+
+                # Join roof with base
+                blender_ops.join_meshes(base_obj, pyramid_obj)
+                blender_ops.merge_close_vertices(base_obj)
+            except:
+                print("⚠️ failed importing geometry.")
+                base_extrude_height = height
+
+    rounded = round_edges and round_method == "fillet2d" and blender_ops.clip_to_rounded_footprint(base_obj, exterior_coords)
+
+    if round_edges and not rounded:
         round_obj = create_mesh_from_polygon("round_edge", exterior_coords, [])
         blender_ops.merge_close_vertices(round_obj)
         blender_ops.limited_dissolve_all_faces(round_obj)
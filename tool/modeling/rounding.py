@@ -0,0 +1,236 @@
+import math
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+
+### function: _open_ring_2d ###
+def _open_ring_2d(coords):
+    ring = np.asarray(coords, dtype=np.float64).reshape(len(coords), -1)[:, :2]
+    if len(ring) > 1 and np.allclose(ring[0], ring[-1]):
+        ring = ring[:-1]
+    return ring
+
+
+### function: dissolve_straight_vertices ###
+def dissolve_straight_vertices(ring, angle_limit=0.01):
+    """
+    Removes the vertices where the ring turns less than angle_limit (radians),
+    as the limited dissolve applied before the bevel does.
+
+    Args:
+        ring (np.ndarray): (N, 2) open ring.
+        angle_limit (float): Minimum turning angle of a kept vertex.
+
+    Returns:
+        np.ndarray: The ring without the straight vertices.
+    """
+    while len(ring) > 3:
+        to_prev = np.roll(ring, 1, axis=0) - ring
+        to_next = np.roll(ring, -1, axis=0) - ring
+        turn = np.pi - np.abs(np.arctan2(to_prev[:, 0] * to_next[:, 1] - to_prev[:, 1] * to_next[:, 0],
+                                         (to_prev * to_next).sum(axis=1)))
+        straight = np.flatnonzero(turn < angle_limit)
+        if straight.size == 0:
+            break
+
+        # Neighbours are re-evaluated at the next iteration
+        keep = np.ones(len(ring), dtype=bool)
+        for i in straight:
+            if keep[i - 1] and keep[(i + 1) % len(ring)]:
+                keep[i] = False
+        if keep.sum() < 3:
+            break
+        ring = ring[keep]
+
+    return ring
+
+
+### function: fillet_ring ###
+def fillet_ring(ring, width=2.0, segments=4, default_value=1.0, angle_limit=0.01):
+    """
+    Rounds the convex corners of a ring in 2D, reproducing the vertex bevel used by
+    the Blender rounding (bevel weights, width, segments, profile 0.5, clamp overlap).
+
+    The weight of each corner follows compute_custom_vertex_attribute: 1 if half of its
+    shortest edge is longer than default_value, (half edge / default_value) - 0.05 otherwise.
+    The bevel offset (width * weight) is clamped to half of the adjacent edges, and the
+    corner is replaced by a quarter superellipse of the given number of segments, which
+    is a circular arc for right angles. Concave corners are kept, since the rounding
+    only removes material.
+
+    Args:
+        ring (list of tuple): Ring coordinates (2D or 3D).
+        width (float): Bevel width.
+        segments (int): Number of segments of each rounded corner.
+        default_value (float): Reference length of the bevel weights.
+        angle_limit (float): Turning angle under which a vertex is dissolved first.
+
+    Returns:
+        np.ndarray: (K, 2) rounded open ring.
+    """
+    ring = dissolve_straight_vertices(_open_ring_2d(ring), angle_limit)
+    n = len(ring)
+
+    prev_pts = np.roll(ring, 1, axis=0)
+    next_pts = np.roll(ring, -1, axis=0)
+    len_prev = np.linalg.norm(prev_pts - ring, axis=1)
+    len_next = np.linalg.norm(next_pts - ring, axis=1)
+    half_min = np.minimum(len_prev, len_next) / 2.0
+
+    weight = np.where(default_value < half_min, 1.0, np.maximum(half_min / default_value - 0.05, 0.0))
+    offset = np.minimum(width * weight, half_min)
+
+    # Convex corners of the ring, whatever its orientation
+    signed_area = np.sum(ring[:, 0] * next_pts[:, 1] - next_pts[:, 0] * ring[:, 1]) / 2.0
+    cross = (ring[:, 0] - prev_pts[:, 0]) * (next_pts[:, 1] - ring[:, 1]) - \
+            (ring[:, 1] - prev_pts[:, 1]) * (next_pts[:, 0] - ring[:, 0])
+    convex = cross * np.sign(signed_area) > 0
+
+    t = np.linspace(0.0, math.pi / 2, segments + 1)
+    rounded = []
+    for i in range(n):
+        if not convex[i] or offset[i] <= 1e-9:
+            rounded.append(ring[i][None, :])
+            continue
+
+        a = (prev_pts[i] - ring[i]) / len_prev[i] * offset[i]
+        b = (next_pts[i] - ring[i]) / len_next[i] * offset[i]
+        rounded.append(ring[i] + a + b - np.outer(np.cos(t), b) - np.outer(np.sin(t), a))
+
+    return np.concatenate(rounded)
+
+
+### function: round_footprint ###
+def round_footprint(exterior, holes=(), width=2.0, segments=4):
+    """
+    Builds the footprint with rounded exterior corners.
+
+    Returns:
+        Polygon: The rounded footprint (holes unchanged), None if it is not valid.
+    """
+    rounded = fillet_ring(exterior, width, segments)
+    poly = Polygon(rounded, [_open_ring_2d(h) for h in holes])
+    if not poly.is_valid or poly.is_empty:
+        return None
+    return poly
+
+
+### function: triangulate_polygon ###
+def triangulate_polygon(poly):
+    """
+    Triangulates a polygon (with holes) with a constrained Delaunay triangulation.
+
+    Returns:
+        tuple: ((N, 2) vertices, (M, 3) counterclockwise triangles).
+    """
+    if hasattr(shapely, 'constrained_delaunay_triangles'):
+        tris = shapely.get_parts(shapely.constrained_delaunay_triangles(poly))
+    else:
+        tris = shapely.get_parts(shapely.delaunay_triangles(poly))
+        tris = tris[shapely.contains_properly(poly, shapely.centroid(tris))]
+
+    if len(tris) == 0:
+        return np.empty((0, 2)), np.empty((0, 3), dtype=np.int64)
+
+    corners = shapely.get_coordinates(shapely.get_exterior_ring(tris)).reshape(len(tris), 4, 2)[:, :3]
+    vertices, inverse = np.unique(corners.reshape(-1, 2), axis=0, return_inverse=True)
+    faces = inverse.reshape(-1, 3)
+
+    # Counterclockwise orientation
+    v0, v1, v2 = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+    cw = ((v1[:, 0] - v0[:, 0]) * (v2[:, 1] - v0[:, 1]) - (v1[:, 1] - v0[:, 1]) * (v2[:, 0] - v0[:, 0])) < 0
+    faces[cw] = faces[cw][:, ::-1]
+
+    return vertices, faces
+
+
+### function: weld_mesh ###
+def weld_mesh(vertices, faces, tolerance=1e-6):
+    """
+    Merges the vertices closer than the tolerance and drops the degenerate triangles.
+    """
+    keys = np.rint(vertices / tolerance).astype(np.int64)
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    faces = inverse.reshape(-1)[faces]
+    degenerate = (faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | (faces[:, 0] == faces[:, 2])
+    return vertices[first], faces[~degenerate]
+
+
+### function: clip_building_2d ###
+def clip_building_2d(vertices, faces, clip_polygon, ground_z=None):
+    """
+    Clips a building against a 2D footprint, as the intersection with a vertical prism
+    would, without any 3D boolean.
+
+    The building is treated as walls plus a roof that is a height field over the
+    footprint: the roof triangles are clipped in 2D and lifted back on their planes,
+    then the walls are rebuilt from the boundary of the clipped roof down to the ground
+    and the bottom is the roof projected on the ground.
+
+    Args:
+        vertices (np.ndarray): (N, 3) vertices of the closed building.
+        faces (np.ndarray): (M, 3) triangles.
+        clip_polygon (Polygon): Footprint to clip against (e.g. the rounded footprint).
+        ground_z (float, optional): Height of the ground (default: lowest vertex).
+
+    Returns:
+        tuple: ((K, 3) vertices, (L, 3) triangles) of the clipped closed building.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    if ground_z is None:
+        ground_z = vertices[:, 2].min()
+
+    tri = vertices[faces]
+    normal = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    normal_length = np.linalg.norm(normal, axis=1)
+    roof = normal[:, 2] > 1e-6 * np.maximum(normal_length, 1e-12)
+    tri, normal = tri[roof], normal[roof]
+
+    geoms = shapely.polygons(tri[:, :, :2])
+    inside = shapely.within(geoms, clip_polygon)
+
+    roof_tris = [tri[inside]]
+    pieces = shapely.intersection(geoms[~inside], clip_polygon)
+    for piece, source, n in zip(pieces, tri[~inside], normal[~inside]):
+        for part in shapely.get_parts(piece):
+            if part.geom_type != 'Polygon' or part.area <= 0:
+                continue
+            xy, part_faces = triangulate_polygon(part)
+            if len(part_faces) == 0:
+                continue
+
+            # Back on the plane of the source triangle
+            z = source[0, 2] - (n[0] * (xy[:, 0] - source[0, 0]) + n[1] * (xy[:, 1] - source[0, 1])) / n[2]
+            roof_tris.append(np.column_stack([xy, z])[part_faces])
+
+    roof_tris = np.concatenate(roof_tris)
+    if len(roof_tris) == 0:
+        return np.empty((0, 3)), np.empty((0, 3), dtype=np.int64)
+
+    roof_vertices, roof_faces = weld_mesh(roof_tris.reshape(-1, 3), np.arange(len(roof_tris) * 3).reshape(-1, 3))
+    n_roof = len(roof_vertices)
+
+    # Boundary edges: directed edges without their opposite
+    edges = np.concatenate([roof_faces[:, [0, 1]], roof_faces[:, [1, 2]], roof_faces[:, [2, 0]]])
+    edge_keys = edges[:, 0] * n_roof + edges[:, 1]
+    boundary = edges[~np.isin(edge_keys, edges[:, 1] * n_roof + edges[:, 0])]
+
+    # Ground vertices, indexed after the roof ones
+    ground_vertices = roof_vertices.copy()
+    ground_vertices[:, 2] = ground_z
+    a, b = boundary[:, 0], boundary[:, 1]
+    walls = np.concatenate([
+        np.column_stack([a + n_roof, b + n_roof, b]),
+        np.column_stack([a + n_roof, b, a]),
+    ])
+    bottom = roof_faces[:, ::-1] + n_roof
+
+    all_vertices = np.vstack([roof_vertices, ground_vertices])
+    all_faces = np.concatenate([roof_faces, walls, bottom])
+    used = np.unique(all_faces)
+    remap = np.full(len(all_vertices), -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+
+    return all_vertices[used], remap[all_faces]
@@ -0,0 +1,176 @@
+import bpy
+import os
+import sys
+import time
+import signal
+import subprocess
+
+
+#######################################################
+# Adds the root project in the Python path
+#######################################################
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_dir)
+#######################################################
+
+
+from io_utils.exporter import export_polygon_to_txt
+from io_utils.importer import import_ply
+import modeling.blender_ops as blender_ops
+import io_utils.budget as budget
+
+
+CPP_PATH = "/app/tool/cpp/build/extrude_skeleton"
+
+# Wall-clock (seconds) and address space (MB) limits of every run of the C++ executable, 0 disables
+SKELETON_LIMITS = {'timeout': 60.0, 'memory_mb': 4096}
+
+# Runs of the C++ executable, accumulated in the run summary
+SKELETON_STATS = {'calls': 0, 'failed': 0, 'timeouts': 0, 'memory_errors': 0, 'deadline_cutoffs': 0, 'seconds': 0.0}
+
+
+class SkeletonLimitExceeded(RuntimeError):
+    """
+    Raised when the C++ executable is killed for exceeding its time or memory limit,
+    so that the building gets the flat fallback.
+    """
+
+
+### function: set_skeleton_limits ###
+def set_skeleton_limits(timeout=60.0, memory_mb=4096):
+    """
+    Sets the limits of the C++ executable for the run.
+
+    Args:
+        timeout (float): Seconds after which the process is killed (0: no limit).
+        memory_mb (float): Maximum address space of the process in MB (0: no limit).
+    """
+    SKELETON_LIMITS['timeout'] = timeout
+    SKELETON_LIMITS['memory_mb'] = memory_mb
+
+
+### function: _limit_memory ###
+def _limit_memory(pid, memory_mb):
+    """
+    Caps the address space of the started process. prlimit is applied from the parent
+    instead of a preexec_fn, which is unsafe with the writer threads running.
+    """
+    try:
+        import resource
+        limit = int(memory_mb * 1024 ** 2)
+        resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, AttributeError, OSError) as e:
+        print(f"⚠️ Cannot limit the memory of the C++ process: {e}")
+
+
+### function: run_executable ###
+def run_executable(exe_path, args=None):
+    """
+    Runs the C++ executable within the limits of SKELETON_LIMITS. The process gets its
+    own process group, killed as a whole when the timeout or the deadline of the
+    time budget expires.
+
+    Returns:
+        tuple: (stdout, stderr, return code).
+
+    Raises:
+        SkeletonLimitExceeded: If the process ran out of time or memory.
+        DeadlineExceeded: If the time budget of the building is exhausted.
+    """
+    cmd = [exe_path]
+    if args:
+        cmd.extend(args)
+
+    timeout = SKELETON_LIMITS['timeout'] or None
+    memory_mb = SKELETON_LIMITS['memory_mb']
+
+    budget.check_deadline("the straight skeleton")
+    remaining = budget.remaining_seconds()
+    cut_by_deadline = remaining is not None and (timeout is None or remaining < timeout)
+    if cut_by_deadline:
+        timeout = remaining
+
+    SKELETON_STATS['calls'] += 1
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, start_new_session=True)
+    if memory_mb:
+        _limit_memory(proc.pid, memory_mb)
+
+    try:
+        stdout, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        proc.communicate()
+        SKELETON_STATS['seconds'] += time.perf_counter() - start
+        if cut_by_deadline:
+            SKELETON_STATS['deadline_cutoffs'] += 1
+            raise budget.DeadlineExceeded(f"C++ process killed at the deadline, after {timeout:.3g} s")
+        SKELETON_STATS['timeouts'] += 1
+        raise SkeletonLimitExceeded(f"C++ process killed after {timeout:g} s")
+
+    SKELETON_STATS['seconds'] += time.perf_counter() - start
+    if proc.returncode != 0:
+        SKELETON_STATS['failed'] += 1
+        # Allocations beyond RLIMIT_AS fail: the uncaught std::bad_alloc aborts the process
+        if memory_mb and "bad_alloc" in stderr:
+            SKELETON_STATS['memory_errors'] += 1
+            raise SkeletonLimitExceeded(f"C++ process out of memory (limit {memory_mb:g} MB)")
+
+    return stdout, stderr, proc.returncode
+
+
+### function: parse_wall_height ###
+def parse_wall_height(stdout):
+    for line in stdout.splitlines():
+        if line.startswith("WALL_HEIGHT"):
+            return float(line.split()[1])
+    return None
+
+
+### function: build_native_lod2 ###
+def build_native_lod2(base_obj, height, idx, roof_type, max_height):
+    """
+    Builds the complete closed building (bottom, walls and roof) in the C++ process
+    and replaces the mesh of the base object with it, so that no Blender operation
+    is needed to assemble walls and roof.
+
+    Args:
+        base_obj (bpy.types.Object): The flattened footprint mesh (at ground height, close vertices merged).
+        height (float): Total height of the building.
+        idx (int): Index used for temporary file naming.
+        roof_type (str): 'hip', 'pyramid' or 'gabled-L'.
+        max_height (float): Maximum height of the straight skeleton.
+
+    Returns:
+        float: Height of the walls, None if the C++ process failed.
+    """
+    txt_path = os.path.join(blender_ops.TMP_DIR, f"input_{idx}.txt")
+    out_path = os.path.join(blender_ops.TMP_DIR, f"lod2_{idx}.ply")
+    export_polygon_to_txt(base_obj, txt_path)
+
+    ground_z = min(v.co.z for v in base_obj.data.vertices)
+    stdout, stderr, code = run_executable(CPP_PATH, ["--lod2", txt_path, out_path, str(max_height),
+                                                     repr(ground_z), repr(height), roof_type])
+    if code != 0:
+        print(f"⚠️ External C++ process failed: {stderr.strip()}")
+        return None
+
+    try:
+        lod2_obj = import_ply(out_path)
+    except Exception as e:
+        print(f"⚠️ failed importing geometry: {e}")
+        return None
+
+    # The footprint keeps its object (name, transform), only the mesh data is swapped
+    old_mesh = base_obj.data
+    base_obj.data = lod2_obj.data
+    bpy.data.objects.remove(lod2_obj, do_unlink=True)
+    bpy.data.meshes.remove(old_mesh)
+
+    blender_ops.clean_tmp_folder()
+
+    wall_height = parse_wall_height(stdout)
+    return wall_height if wall_height is not None else height
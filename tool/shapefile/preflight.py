@@ -0,0 +1,154 @@
+import numpy as np
+import shapely
+
+
+### function: _ragged_rings ###
+def _ragged_rings(polygons):
+    """
+    Flattens the rings of all footprints into contiguous arrays.
+
+    Returns:
+        tuple: (coords (N, 2), ring_of_coord (N,), polygon_of_ring (R,), is_exterior (R,))
+    """
+    coords, ring_of_coord, polygon_of_ring, is_exterior = [], [], [], []
+
+    ring_id = 0
+    for poly_id, poly in enumerate(polygons):
+        for ring_pos, ring in enumerate([poly['exterior']] + list(poly['holes'])):
+            ring_coords = np.asarray(ring, dtype=np.float64).reshape(len(ring), -1)[:, :2] if len(ring) else np.empty((0, 2))
+            if len(ring_coords) and not np.array_equal(ring_coords[0], ring_coords[-1]):
+                ring_coords = np.vstack([ring_coords, ring_coords[:1]])
+
+            coords.append(ring_coords)
+            ring_of_coord.append(np.full(len(ring_coords), ring_id))
+            polygon_of_ring.append(poly_id)
+            is_exterior.append(ring_pos == 0)
+            ring_id += 1
+
+    return (np.concatenate(coords) if coords else np.empty((0, 2)),
+            np.concatenate(ring_of_coord) if ring_of_coord else np.empty(0, dtype=int),
+            np.asarray(polygon_of_ring, dtype=int),
+            np.asarray(is_exterior, dtype=bool))
+
+
+### function: preflight_footprints ###
+def preflight_footprints(polygons, min_area=1.0, min_edge_length=0.001, max_vertices=1000):
+    """
+    Validates all the footprints at once before the expensive roof generation.
+
+    The checks are vectorized over all rings (shapely 2 predicates and NumPy
+    reductions over the ragged coordinate arrays):
+    - validity (self-intersections, invalid holes),
+    - orientation (CCW exterior, CW holes, as expected by CGAL),
+    - area, minimum edge length and vertex count.
+
+    Wrongly oriented rings are fixed in place. Hopeless footprints keep their
+    requested roof in 'roof_requested' and are routed straight to the flat path,
+    with the reason stored in 'preflight'.
+
+    Args:
+        polygons (list): List of polygon dictionaries with 'exterior', 'holes' and 'roof'.
+        min_area (float): Minimum footprint area.
+        min_edge_length (float): Minimum edge length (edges shorter than this collapse
+                                 when close vertices are merged).
+        max_vertices (int): Maximum number of vertices (0 disables the check).
+
+    Returns:
+        dict: Counters describing the preflight results.
+    """
+    stats = {
+        'checked': len(polygons),
+        'reoriented': 0,
+        'routed_flat': 0,
+        'invalid': 0,
+        'too_small': 0,
+        'short_edges': 0,
+        'too_few_vertices': 0,
+        'too_many_vertices': 0,
+    }
+    if not polygons:
+        return stats
+
+    coords, ring_of_coord, polygon_of_ring, is_exterior = _ragged_rings(polygons)
+    num_rings = len(polygon_of_ring)
+
+    # Rings with less than 4 coordinates (3 vertices + closing one) cannot even be built
+    ring_coord_count = np.bincount(ring_of_coord, minlength=num_rings)
+    buildable = np.ones(len(polygons), dtype=bool)
+    buildable[polygon_of_ring[ring_coord_count < 4]] = False
+
+    # Build all the buildable geometries in one call and check their validity
+    valid = np.zeros(len(polygons), dtype=bool)
+    area = np.zeros(len(polygons))
+    if buildable.any():
+        ring_kept = buildable[polygon_of_ring]
+        coord_kept = ring_kept[ring_of_coord]
+        new_ring_ids = np.cumsum(ring_kept) - 1
+        new_poly_ids = np.cumsum(buildable) - 1
+
+        rings = shapely.linearrings(coords[coord_kept], indices=new_ring_ids[ring_of_coord[coord_kept]])
+        geoms = shapely.polygons(rings, indices=new_poly_ids[polygon_of_ring[ring_kept]])
+        valid[buildable] = shapely.is_valid(geoms)
+        area[buildable] = shapely.area(geoms)
+
+    # Segments between consecutive coordinates of the same ring
+    same_ring = ring_of_coord[1:] == ring_of_coord[:-1]
+    seg_start, seg_end = coords[:-1][same_ring], coords[1:][same_ring]
+    seg_ring = ring_of_coord[:-1][same_ring]
+
+    # Signed area (shoelace) and minimum edge length of each ring
+    cross = seg_start[:, 0] * seg_end[:, 1] - seg_end[:, 0] * seg_start[:, 1]
+    signed_area = np.bincount(seg_ring, weights=cross, minlength=num_rings) / 2.0
+
+    edge_length = np.linalg.norm(seg_end - seg_start, axis=1)
+    ring_min_edge = np.full(num_rings, np.inf)
+    np.minimum.at(ring_min_edge, seg_ring, edge_length)
+
+    poly_min_edge = np.full(len(polygons), np.inf)
+    np.minimum.at(poly_min_edge, polygon_of_ring, ring_min_edge)
+
+    # Number of distinct vertices (closing vertex excluded)
+    ring_vertices = np.bincount(seg_ring, minlength=num_rings)
+    poly_vertices = np.bincount(polygon_of_ring, weights=ring_vertices, minlength=len(polygons)).astype(int)
+    exterior_vertices = ring_vertices[is_exterior]
+
+    # Fix orientation: CCW exterior, CW holes
+    wrong_orientation = np.where(is_exterior, signed_area < 0, signed_area > 0)
+    hole_position = np.zeros(num_rings, dtype=int)
+    for ring_id in np.flatnonzero(~is_exterior):
+        hole_position[ring_id] = hole_position[ring_id - 1] + 1 if not is_exterior[ring_id - 1] else 0
+
+    for ring_id in np.flatnonzero(wrong_orientation):
+        poly = polygons[polygon_of_ring[ring_id]]
+        if is_exterior[ring_id]:
+            poly['exterior'] = list(reversed(poly['exterior']))
+        else:
+            holes = list(poly['holes'])
+            holes[hole_position[ring_id]] = list(reversed(holes[hole_position[ring_id]]))
+            poly['holes'] = holes
+    stats['reoriented'] = int(np.unique(polygon_of_ring[wrong_orientation]).size)
+
+    # Hopeless footprints
+    reasons = [
+        ('invalid', ~valid),
+        ('too_small', area < min_area),
+        ('short_edges', poly_min_edge < min_edge_length),
+        ('too_few_vertices', exterior_vertices < 3),
+        ('too_many_vertices', (poly_vertices > max_vertices) if max_vertices else np.zeros(len(polygons), dtype=bool)),
+    ]
+
+    for name, mask in reasons:
+        stats[name] = int(mask.sum())
+
+    for i, poly in enumerate(polygons):
+        failed = [name for name, mask in reasons if mask[i]]
+        if not failed:
+            continue
+
+        poly['preflight'] = ",".join(failed)
+        if poly.get('roof') != 'flat':
+            poly['roof_requested'] = poly.get('roof')
+            poly['roof'] = 'flat'
+            stats['routed_flat'] += 1
+
+    return stats
@@ -1,16 +1,53 @@
-import geopandas as gpd
+import struct
+
+
+### function: read_shapefile_bounds ###
+def read_shapefile_bounds(shapefile_path):
+    """
+    Reads the bounding box stored in the header of a .shp file, without loading
+    any geometry nor geopandas.
+
+    Args:
+        shapefile_path (str): Path to the .shp file.
+
+    Returns:
+        tuple: (minx, miny, maxx, maxy).
+    """
+    with open(shapefile_path, 'rb') as f:
+        header = f.read(100)
+
+    if len(header) < 100 or struct.unpack(">i", header[:4])[0] != 9994:
+        raise ValueError(f"Not a valid shapefile: {shapefile_path}")
+
+    # Xmin, Ymin, Xmax, Ymax (little endian doubles) at byte 36
+    return struct.unpack("<4d", header[36:68])
 
 
 ### function: read_shapefile_polygons ###
-def read_shapefile_polygons(shapefile_path):
+def read_shapefile_polygons(shapefile_path, bbox=None):
     """
     Legge shapefile e restituisce:
     - lista di dict con: { 'exterior': [...], 'holes': [...], 'roof': ..., 'height': ... }
     - offset (x_offset, y_offset)
 
     Le coordinate vengono normalizzate e viene gestita l'assenza della quota Z.
+
+    With bbox (minx, miny, maxx, maxy), only the features whose centroid falls in
+    [minx, maxx) x [miny, maxy) are kept, so that adjacent tiles never share a building.
     """
-    gdf = gpd.read_file(shapefile_path)
+    import geopandas as gpd  # slow to import: only loaded when a shapefile is read
+
+    if bbox is None:
+        gdf = gpd.read_file(shapefile_path)
+    else:
+        minx, miny, maxx, maxy = bbox
+        gdf = gpd.read_file(shapefile_path, bbox=tuple(bbox))
+        centroids = gdf.geometry.centroid
+        gdf = gdf[(centroids.x >= minx) & (centroids.x < maxx) & (centroids.y >= miny) & (centroids.y < maxy)]
+
+    if gdf.empty:
+        return [], (0.0, 0.0)
+
     polygons = []
 
     # Calcolo offset
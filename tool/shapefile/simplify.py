@@ -0,0 +1,217 @@
+import math
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+
+### function: remove_collinear_vertices ###
+def remove_collinear_vertices(ring, tolerance=0.01):
+    """
+    Removes the vertices lying (almost) on the line through their neighbours.
+
+    Args:
+        ring (np.ndarray): (N, 3) open ring (closing vertex excluded).
+        tolerance (float): Maximum distance of a vertex from the line through its neighbours.
+
+    Returns:
+        np.ndarray: The ring without collinear vertices.
+    """
+    while len(ring) > 3:
+        prev_pts = np.roll(ring[:, :2], 1, axis=0)
+        next_pts = np.roll(ring[:, :2], -1, axis=0)
+
+        base = next_pts - prev_pts
+        base_length = np.linalg.norm(base, axis=1)
+        rel = ring[:, :2] - prev_pts
+        cross = np.abs(base[:, 0] * rel[:, 1] - base[:, 1] * rel[:, 0])
+        distance = np.where(base_length > 0, cross / np.maximum(base_length, 1e-12), np.linalg.norm(rel, axis=1))
+
+        candidates = np.flatnonzero(distance < tolerance)
+        if candidates.size == 0:
+            break
+
+        # Remove non-adjacent vertices only, neighbours are re-evaluated at the next iteration
+        keep = np.ones(len(ring), dtype=bool)
+        for i in candidates:
+            if keep[i - 1] and keep[(i + 1) % len(ring)]:
+                keep[i] = False
+        if keep.sum() < 3:
+            break
+        ring = ring[keep]
+
+    return ring
+
+
+### function: snap_orthogonal_angles ###
+def snap_orthogonal_angles(ring, angle, tolerance_deg=3.0):
+    """
+    Makes the edges that are almost parallel to the main axes of the building
+    exactly parallel, so that near-orthogonal corners become orthogonal.
+
+    Args:
+        ring (np.ndarray): (N, 3) open ring (closing vertex excluded).
+        angle (float): Direction of the main axis of the building (radians).
+        tolerance_deg (float): Maximum deviation from an axis for an edge to be snapped.
+
+    Returns:
+        np.ndarray: The snapped ring.
+    """
+    cos_a, sin_a = math.cos(angle), math.sin(angle)
+    rot = np.array([[cos_a, sin_a], [-sin_a, cos_a]])
+    local = ring[:, :2] @ rot.T
+
+    edges = np.roll(local, -1, axis=0) - local
+    edge_angle = np.degrees(np.arctan2(edges[:, 1], edges[:, 0])) % 90.0
+    deviation = np.minimum(edge_angle, 90.0 - edge_angle)
+    horizontal = np.abs(edges[:, 0]) >= np.abs(edges[:, 1])
+
+    n = len(local)
+    for i in np.flatnonzero(deviation < tolerance_deg):
+        j = (i + 1) % n
+        axis = 1 if horizontal[i] else 0
+        mean = (local[i, axis] + local[j, axis]) / 2.0
+        local[i, axis] = mean
+        local[j, axis] = mean
+
+    snapped = ring.copy()
+    snapped[:, :2] = local @ rot
+    return snapped
+
+
+### function: _ring_array ###
+def _ring_array(coords):
+    ring = np.asarray(coords, dtype=np.float64)
+    if ring.shape[1] == 2:
+        ring = np.column_stack([ring, np.zeros(len(ring))])
+    if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+        ring = ring[:-1]
+    return ring
+
+
+### function: _ring_list ###
+def _ring_list(ring):
+    closed = np.vstack([ring, ring[:1]])
+    return [tuple(float(c) for c in v) for v in closed]
+
+
+### function: simplify_footprint ###
+def simplify_footprint(exterior, holes, tolerance=0.05, collinear_tolerance=0.01, snap_angle_deg=3.0):
+    """
+    Simplifies a footprint before modeling: collinear-vertex removal, Douglas-Peucker
+    with topology preservation and snapping of near-orthogonal angles. Each step is
+    kept only if the footprint stays valid.
+
+    Args:
+        exterior (list of tuple): Exterior ring coordinates.
+        holes (list of list of tuple): Hole ring coordinates.
+        tolerance (float): Douglas-Peucker tolerance (0 disables the step).
+        collinear_tolerance (float): Distance under which a vertex is considered collinear.
+        snap_angle_deg (float): Angle tolerance for orthogonal snapping (0 disables the step).
+
+    Returns:
+        tuple: (exterior, holes) simplified, in the same format as the input.
+    """
+    rings = [_ring_array(exterior)] + [_ring_array(h) for h in holes]
+    if any(len(r) < 3 for r in rings):
+        return exterior, holes
+
+    # Z of each vertex, to restore it after the 2D simplification
+    z_lookup = {(x, y): z for ring in rings for x, y, z in ring}
+    default_z = rings[0][0, 2]
+
+    # 1. Collinear vertices
+    rings = [remove_collinear_vertices(r, collinear_tolerance) for r in rings]
+    poly = Polygon(rings[0][:, :2], [r[:, :2] for r in rings[1:]])
+    if not poly.is_valid:
+        return exterior, holes
+
+    # 2. Douglas-Peucker, preserving topology
+    if tolerance > 0:
+        simplified = shapely.simplify(poly, tolerance, preserve_topology=True)
+        if simplified.geom_type == 'Polygon' and simplified.is_valid and not simplified.is_empty:
+            poly = simplified
+
+    rings = [np.array([(x, y, z_lookup.get((x, y), default_z)) for x, y in ring.coords[:-1]])
+             for ring in [poly.exterior] + list(poly.interiors)]
+
+    # 3. Orthogonal snapping, in the frame of the minimum rotated rectangle
+    if snap_angle_deg > 0:
+        rect = np.asarray(shapely.minimum_rotated_rectangle(poly).exterior.coords)
+        edge = rect[1] - rect[0]
+        angle = math.atan2(edge[1], edge[0])
+
+        snapped = [snap_orthogonal_angles(r, angle, snap_angle_deg) for r in rings]
+        snapped_poly = Polygon(snapped[0][:, :2], [r[:, :2] for r in snapped[1:]])
+        if snapped_poly.is_valid and abs(snapped_poly.area - poly.area) <= 0.01 * poly.area:
+            rings = snapped
+
+    return _ring_list(rings[0]), [_ring_list(r) for r in rings[1:]]
+
+
+### function: count_vertices ###
+def count_vertices(poly):
+    return sum(len(_ring_array(r)) for r in [poly['exterior']] + list(poly['holes']))
+
+
+### function: simplify_footprints ###
+def simplify_footprints(polygons, tolerance=0.05, collinear_tolerance=0.01, snap_angle_deg=3.0):
+    """
+    Simplifies all the footprints in place, storing the original vertex count
+    in 'vertices_before'.
+
+    Returns:
+        dict: Vertex counts before and after the simplification.
+    """
+    before, after, simplified = 0, 0, 0
+
+    for poly in polygons:
+        poly['vertices_before'] = count_vertices(poly)
+        poly['exterior'], poly['holes'] = simplify_footprint(poly['exterior'], poly['holes'], tolerance,
+                                                             collinear_tolerance, snap_angle_deg)
+        vertices_after = count_vertices(poly)
+
+        before += poly['vertices_before']
+        after += vertices_after
+        simplified += int(vertices_after < poly['vertices_before'])
+
+    return {
+        'simplified': simplified,
+        'vertices_before': before,
+        'vertices_after': after,
+        'vertex_reduction_percent': round(100.0 * (before - after) / before, 2) if before else 0.0,
+    }
+
+
+### function: estimate_speedup ###
+def estimate_speedup(timings):
+    """
+    Estimates the per-building speedup given by the simplification, fitting
+    the recorded building times against the vertex count (time = a + b * vertices)
+    and comparing the prediction for the original and the simplified footprints.
+
+    Args:
+        timings (list): Timing records with 'seconds', 'vertices' and 'vertices_before'.
+
+    Returns:
+        dict: Mean per-building time and mean estimated speedup, empty if not enough data.
+    """
+    records = [t for t in timings if t.get('vertices_before')]
+    if len(records) < 2:
+        return {}
+
+    seconds = np.array([t['seconds'] for t in records])
+    vertices = np.array([t['vertices'] for t in records], dtype=np.float64)
+    vertices_before = np.array([t['vertices_before'] for t in records], dtype=np.float64)
+
+    if np.ptp(vertices) == 0:
+        return {'mean_building_seconds': round(float(seconds.mean()), 4)}
+
+    slope, intercept = np.polyfit(vertices, seconds, 1)
+    predicted_after = np.maximum(intercept + slope * vertices, 1e-6)
+    predicted_before = np.maximum(intercept + slope * vertices_before, 1e-6)
+
+    return {
+        'mean_building_seconds': round(float(seconds.mean()), 4),
+        'seconds_per_vertex': round(float(slope), 6),
+        'estimated_speedup': round(float(np.mean(predicted_before / predicted_after)), 3),
+    }